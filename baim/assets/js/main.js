@@ -50,6 +50,6 @@
 (function(){
   async function loadJSON(path){ try{ const r = await fetch(path); if(!r.ok) return null; return await r.json(); }catch(e){return null} }
   async function loadNews(){ const data = await loadJSON('data/news.json'); const container = document.getElementById('newsList'); if(!container) return; container.innerHTML=''; if(!data){ container.innerHTML='<div class="meta">Tidak ada berita.</div>'; return } data.slice(0,12).forEach(item=>{ const art=document.createElement('article'); art.className='card'; art.innerHTML=`<div class="meta">${item.date} • ${item.category}</div><h4>${item.title}</h4><p class="meta">${item.excerpt}</p><a href="${item.url||'#'}" class="meta">Baca Selanjutnya »</a>`; container.appendChild(art); }); }
-  async function loadGallery(){ const data = await loadJSON('data/gallery.json'); const el = document.getElementById('galleryGrid'); if(!el) return; el.innerHTML=''; if(!data){ el.innerHTML='<div class="meta">Tidak ada gambar.</div>'; return } data.slice(0,24).forEach(img=>{ const a=document.createElement('a'); a.href=img.src; a.target='_blank'; a.className='card'; a.style.padding='0'; a.innerHTML=`<img src="${img.src}" alt="${img.caption||''}" style="width:100%;height:160px;object-fit:cover;border-radius:12px"/>`; el.appendChild(a); }); }
+  async function loadGallery(){ const data = await loadJSON('data/gallery.json'); const el = document.getElementById('galleryGrid'); if(!el) return; el.innerHTML=''; if(!data){ el.innerHTML='<div class="meta">Tidak ada gambar.</div>'; return } data.slice(0,24).forEach(img=>{ const a=document.createElement('a'); a.href=img.src; a.target='_blank'; a.className='card'; a.style.padding='0'; a.innerHTML=`<img src="${img.src}" alt="${img.caption||''}" loading="lazy" decoding="async" style="width:100%;height:160px;object-fit:cover;border-radius:12px"/>`; el.appendChild(a); }); }
   document.addEventListener('DOMContentLoaded', ()=>{ loadNews(); loadGallery(); });
 })();
@@ -1,9 +1,17 @@
-from flask import Flask, render_template
+from flask import Flask, render_template, request
+import assets
+import content
+import images
+
 app = Flask(__name__)
+images.init_app(app)
+assets.init_app(app)
+content.init_app(app)
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    latest = content.news.page(1, 3)["items"]
+    return render_template('index.html', latest=latest)
 
 @app.route('/about')
 def about():
@@ -11,11 +19,15 @@ def about():
 
 @app.route('/news')
 def news():
-    return render_template('news.html')
+    q = request.args.get('q', '')
+    category = request.args.get('category', '')
+    result = content.news.page(request.args.get('page', 1, type=int), content.NEWS_PER_PAGE, q, category)
+    return render_template('news.html', result=result, q=q, category=category)
 
 @app.route('/gallery')
 def gallery():
-    return render_template('gallery.html')
+    result = content.gallery.page(request.args.get('page', 1, type=int), content.GALLERY_PER_PAGE)
+    return render_template('gallery.html', result=result)
 
 @app.route('/achievements')
 def achievements():
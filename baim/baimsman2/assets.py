@@ -0,0 +1,83 @@
+"""
+Bundled CSS/JS for the baimsman2 app.
+
+tools/buildassets.py writes hashed bundles plus static/dist/manifest.json:
+
+    python ../../tools/buildassets.py baimsman2
+
+base.html calls asset_styles() / asset_scripts(). With a manifest they inline
+the page's critical CSS, load the full bundle without blocking render and
+defer the script; without one they fall back to the plain source files.
+"""
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from flask import before_render_template, g, request, url_for
+from markupsafe import Markup, escape
+
+ROOT = Path(__file__).parent
+MANIFEST = ROOT / "static" / "dist" / "manifest.json"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+_lock = threading.Lock()
+_manifest: Tuple[Optional[int], Optional[Dict]] = (None, None)
+
+
+def manifest() -> Optional[Dict]:
+    """The build manifest, re-read whenever the file changes; None if it was never built."""
+    global _manifest
+    try:
+        mtime = MANIFEST.stat().st_mtime_ns
+    except OSError:
+        return None
+    if _manifest[0] != mtime:
+        with _lock:
+            try:
+                _manifest = (mtime, json.loads(MANIFEST.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                return None
+    return _manifest[1]
+
+
+def _remember(sender, template, context, **extra) -> None:
+    # the first template rendered is the page; base.html is only extended
+    if "asset_template" not in g:
+        g.asset_template = template.name
+
+
+def asset_styles() -> Markup:
+    built = manifest()
+    if not built:
+        return Markup('<link rel="stylesheet" href="%s">') % url_for("static", filename="css/style.css")
+    href = escape(url_for("static", filename=built["css"]))
+    critical = built.get("critical", {}).get(g.get("asset_template"), "")
+    parts = []
+    if critical:
+        # minified CSS from our own stylesheet; only a closing tag could break out
+        parts.append("<style>%s</style>" % critical.replace("</", "<\\/"))
+    parts.append(f'<link rel="preload" href="{href}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">')
+    parts.append(f'<noscript><link rel="stylesheet" href="{href}"></noscript>')
+    return Markup("\n  ".join(parts))
+
+
+def asset_scripts() -> Markup:
+    built = manifest()
+    src = url_for("static", filename=built["js"] if built else "js/main.js")
+    return Markup('<script defer src="%s"></script>') % src
+
+
+def _cacheHeaders(response):
+    # bundle names carry their content hash, so they never change in place
+    path = request.path
+    if path.startswith("/static/dist/") and not path.endswith(".json") and response.status_code == 200:
+        response.headers["Cache-Control"] = IMMUTABLE
+    return response
+
+
+def init_app(app) -> None:
+    before_render_template.connect(_remember, app)
+    app.add_template_global(asset_styles)
+    app.add_template_global(asset_scripts)
+    app.after_request(_cacheHeaders)
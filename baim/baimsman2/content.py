@@ -0,0 +1,183 @@
+"""
+News and gallery listings for the baimsman2 app.
+
+data/news.json and data/gallery.json are parsed once into an in-memory index
+(newest first, per-category lists, lowercased search text) and re-parsed only
+when the file's mtime or size changes. Pages are sliced server-side, so the
+HTML and the JSON API only ever carry one page:
+
+    GET /api/news?page=2&per_page=12&q=mpls&category=Event
+    GET /api/gallery?page=1
+"""
+import json
+import re
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import Blueprint, jsonify, request, url_for
+
+ROOT = Path(__file__).parent
+DATA_DIR = ROOT / "data"
+NEWS_PER_PAGE = 12
+GALLERY_PER_PAGE = 24
+MAX_PER_PAGE = 50
+
+MONTHS = {
+    "januari": 1, "februari": 2, "maret": 3, "april": 4, "mei": 5, "juni": 6,
+    "juli": 7, "agustus": 8, "september": 9, "oktober": 10, "november": 11, "desember": 12,
+}
+
+bp = Blueprint("content", __name__)
+
+
+def parseDate(text: str) -> Optional[date]:
+    """'30 Juli 2025' or '2025-07-30'; None when neither matches."""
+    text = (text or "").strip()
+    m = re.fullmatch(r"(\d{4})-(\d{1,2})-(\d{1,2})", text)
+    if m:
+        y, mo, d = map(int, m.groups())
+    else:
+        m = re.fullmatch(r"(\d{1,2})\s+([A-Za-z]+)\s+(\d{4})", text)
+        if not m or m.group(2).lower() not in MONTHS:
+            return None
+        d, mo, y = int(m.group(1)), MONTHS[m.group(2).lower()], int(m.group(3))
+    try:
+        return date(y, mo, d)
+    except ValueError:
+        return None
+
+
+class Listing:
+    """Immutable parsed snapshot of one data file; a reload builds a new one."""
+    __slots__ = ("key", "items", "byCategory", "text")
+
+    def __init__(self, key: Tuple[int, int], items: List[Dict[str, Any]]):
+        self.key = key
+        self.items: Tuple[Dict[str, Any], ...] = tuple(items)
+        byCategory: Dict[str, List[int]] = {}
+        for i, item in enumerate(self.items):
+            byCategory.setdefault(item.get("category", ""), []).append(i)
+        self.byCategory: Dict[str, Tuple[int, ...]] = {k: tuple(v) for k, v in byCategory.items()}
+        self.text: Tuple[str, ...] = tuple(
+            " ".join(str(item.get(f, "")) for f in ("title", "excerpt", "caption", "category")).lower()
+            for item in self.items
+        )
+
+    def select(self, q: str = "", category: str = "") -> List[int]:
+        positions = self.byCategory.get(category, ()) if category else range(len(self.items))
+        terms = q.lower().split()
+        if terms:
+            positions = [i for i in positions if all(t in self.text[i] for t in terms)]
+        return list(positions)
+
+
+class Collection:
+    def __init__(self, path: Path, normalize: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]], sort: bool = False):
+        self.path = path
+        self.normalize = normalize
+        self.sort = sort
+        self._lock = threading.Lock()
+        self._listing: Optional[Listing] = None
+
+    def _stat(self) -> Tuple[int, int]:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return (0, 0)
+        return (st.st_mtime_ns, st.st_size)
+
+    def listing(self) -> Listing:
+        key = self._stat()
+        listing = self._listing
+        if listing is not None and listing.key == key:
+            return listing
+        with self._lock:
+            if self._listing is not None and self._listing.key == key:
+                return self._listing
+            try:
+                raw = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                if key != (0, 0):
+                    print(f"[Content] {self.path.name} unreadable: {e}")
+                raw = []
+            items = [n for n in (self.normalize(r) for r in raw if isinstance(r, dict)) if n]
+            if self.sort:
+                # newest first; undated items keep their file order at the end
+                items.sort(key=lambda it: it["_date"] or date.min, reverse=True)
+            self._listing = Listing(key, items)
+            return self._listing
+
+    def page(self, page: int = 1, perPage: int = NEWS_PER_PAGE, q: str = "", category: str = "") -> Dict[str, Any]:
+        listing = self.listing()
+        positions = listing.select(q.strip(), category.strip())
+        total = len(positions)
+        pages = max(1, -(-total // perPage))
+        page = min(max(1, page), pages)
+        start = (page - 1) * perPage
+        return {
+            "items": [listing.items[i] for i in positions[start:start + perPage]],
+            "page": page,
+            "pages": pages,
+            "total": total,
+            "categories": sorted(c for c in listing.byCategory if c),
+        }
+
+
+def _newsItem(raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    title = str(raw.get("title", "")).strip()
+    if not title:
+        return None
+    when = parseDate(str(raw.get("date", "")))
+    return {
+        "title": title,
+        "date": str(raw.get("date", "")),
+        "iso": when.isoformat() if when else None,
+        "category": str(raw.get("category", "")).strip(),
+        "excerpt": str(raw.get("excerpt", "")),
+        "url": raw.get("url") or "#",
+        "_date": when,
+    }
+
+
+def _galleryItem(raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    src = str(raw.get("src", ""))
+    if not src:
+        return None
+    # gallery.json stores paths relative to the app root ("static/img/...")
+    return {"file": src.removeprefix("static/"), "caption": str(raw.get("caption", ""))}
+
+
+news = Collection(DATA_DIR / "news.json", _newsItem, sort=True)
+gallery = Collection(DATA_DIR / "gallery.json", _galleryItem)
+
+
+def _args(default: int) -> Tuple[int, int, str, str]:
+    page = request.args.get("page", 1, type=int) or 1
+    perPage = request.args.get("per_page", default, type=int) or default
+    return page, min(max(1, perPage), MAX_PER_PAGE), request.args.get("q", ""), request.args.get("category", "")
+
+
+def _public(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in item.items() if not k.startswith("_")}
+
+
+@bp.route("/api/news")
+def apiNews():
+    page, perPage, q, category = _args(NEWS_PER_PAGE)
+    result = news.page(page, perPage, q, category)
+    result["items"] = [_public(it) for it in result["items"]]
+    return jsonify(result)
+
+
+@bp.route("/api/gallery")
+def apiGallery():
+    page, perPage, q, category = _args(GALLERY_PER_PAGE)
+    result = gallery.page(page, perPage, q, category)
+    result["items"] = [{**it, "src": url_for("static", filename=it["file"])} for it in result["items"]]
+    return jsonify(result)
+
+
+def init_app(app) -> None:
+    app.register_blueprint(bp)
@@ -0,0 +1,200 @@
+"""
+Responsive image derivatives for the baimsman2 app.
+
+Originals stay in static/img. Resized WebP copies are written to a
+content-addressed cache (CACHE_DIR/<ab>/<sha>-<width>.webp, where sha is the
+hash of the original bytes), either lazily by the /img route or ahead of time:
+
+    python images.py            # pre-build every derivative for static/img
+
+Templates call responsive_img(...) to get <img srcset sizes loading="lazy">.
+Without Pillow installed the helper falls back to the original file.
+"""
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple, List
+
+from flask import Blueprint, abort, redirect, request, send_file, url_for
+from markupsafe import Markup, escape
+
+try:
+    from PIL import Image
+except ImportError:  # optional: serve originals when Pillow is missing
+    Image = None
+
+ROOT = Path(__file__).parent
+STATIC_DIR = ROOT / "static"
+CACHE_DIR = ROOT / "cache" / "img"
+WIDTHS = (160, 320, 640, 960, 1280)
+QUALITY = 78
+SOURCE_EXTS = {".png", ".jpg", ".jpeg", ".webp"}
+
+bp = Blueprint("images", __name__)
+
+_lock = threading.Lock()
+# (path, mtime_ns, size) -> (sha, width, height), least recently used first; an edited
+# original gets a new key, so the bound also drops entries for versions no longer on disk
+SOURCES_MAX = 512
+_sourcesLock = threading.Lock()
+_sources: "OrderedDict[Tuple[str, int, int], Tuple[str, int, int]]" = OrderedDict()
+
+
+def _source(filename: str) -> Optional[Path]:
+    path = (STATIC_DIR / filename).resolve()
+    if STATIC_DIR.resolve() not in path.parents or not path.is_file():
+        return None
+    if path.suffix.lower() not in SOURCE_EXTS:
+        return None
+    return path
+
+
+def describe(path: Path) -> Tuple[str, int, int]:
+    """Content hash and pixel size of an original, memoized by mtime/size."""
+    st = path.stat()
+    key = (str(path), st.st_mtime_ns, st.st_size)
+    info = _sources.get(key)
+    if info is not None:
+        try:
+            _sources.move_to_end(key)
+        except KeyError:  # evicted by another thread meanwhile
+            pass
+    else:
+        sha = hashlib.sha256(path.read_bytes()).hexdigest()
+        width = height = 0
+        if Image is not None:
+            try:
+                with Image.open(path) as im:
+                    width, height = im.size
+            except Exception:
+                pass
+        info = (sha, width, height)
+        with _sourcesLock:
+            _sources[key] = info
+            while len(_sources) > SOURCES_MAX:
+                _sources.popitem(last=False)
+    return info
+
+
+def widthsFor(path: Path) -> List[int]:
+    """Derivative widths worth generating: never upscale past the original."""
+    _, width, _ = describe(path)
+    if not width:
+        return []
+    return [w for w in WIDTHS if w < width] + [min(width, WIDTHS[-1])]
+
+
+def derivative(path: Path, width: int) -> Optional[Path]:
+    """Return the cached WebP for `path` at `width`, rendering it on first use."""
+    if Image is None:
+        return None
+    sha, srcWidth, srcHeight = describe(path)
+    if not srcWidth:
+        return None
+    width = min(width, srcWidth)
+    out = CACHE_DIR / sha[:2] / f"{sha}-{width}.webp"
+    if out.exists():
+        return out
+    with _lock:
+        if out.exists():
+            return out
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with Image.open(path) as im:
+            if im.mode not in ("RGB", "RGBA"):
+                im = im.convert("RGBA" if "transparency" in im.info or im.mode in ("LA", "P") else "RGB")
+            height = max(1, round(srcHeight * width / srcWidth))
+            if width != srcWidth:
+                im = im.resize((width, height), Image.LANCZOS)
+            # unique per render: other worker processes may be encoding the same file
+            tmp = out.with_name(f".{out.stem}-{os.getpid()}-{os.urandom(4).hex()}.tmp")
+            try:
+                im.save(tmp, "WEBP", quality=QUALITY, method=6)
+                os.replace(tmp, out)
+            finally:
+                tmp.unlink(missing_ok=True)
+    return out
+
+
+@bp.route("/img/<int:width>/<path:filename>")
+def resized(width: int, filename: str):
+    path = _source(filename)
+    if path is None:
+        abort(404)
+    allowed = widthsFor(path) if Image is not None else []
+    if allowed and width not in allowed:
+        # only the srcset widths are ever rendered, so arbitrary widths cannot fill the cache
+        nearest = next((w for w in allowed if w >= width), allowed[-1])
+        # only the cache-buster is carried over; other args are not part of the URL scheme
+        version = request.args.get("v")
+        return redirect(url_for("images.resized", width=nearest, filename=filename, v=version), 301)
+    out = derivative(path, width)
+    if out is None:
+        return redirect(url_for("static", filename=filename))
+    if width >= describe(path)[1] and out.stat().st_size >= path.stat().st_size:
+        # re-encoding did not beat the original at full size; ship the original bytes
+        out = path
+    # the URL carries ?v=<hash> from responsive_img, so the response never changes
+    return send_file(out, max_age=365 * 24 * 3600, conditional=True)
+
+
+def responsive_img(filename: str, alt: str = "", sizes: str = "100vw", cls: str = "", eager: bool = False, **attrs) -> Markup:
+    """
+    <img> with a WebP srcset of cached derivatives. Use eager=True for the
+    above-the-fold logo/hero so it is not lazily deferred.
+    """
+    path = _source(filename)
+    common = {"alt": alt, "class": cls or None, "loading": None if eager else "lazy", "decoding": "async", **attrs}
+    src = url_for("static", filename=filename)
+    if path is None or Image is None:
+        return _tag({"src": src, **common})
+    sha = describe(path)[0]
+    widths = widthsFor(path)
+    if not widths:
+        return _tag({"src": src, **common})
+    version = sha[:12]
+    srcset = ", ".join(f"{url_for('images.resized', width=w, filename=filename, v=version)} {w}w" for w in widths)
+    return _tag({
+        "src": url_for("images.resized", width=widths[min(1, len(widths) - 1)], filename=filename, v=version),
+        "srcset": srcset,
+        "sizes": sizes,
+        **common,
+    })
+
+
+def _tag(attrs: Dict[str, object]) -> Markup:
+    parts = [f'{k}="{escape(v)}"' for k, v in attrs.items() if v is not None]
+    return Markup(f"<img {' '.join(parts)}>")
+
+
+def init_app(app) -> None:
+    app.register_blueprint(bp)
+    app.add_template_global(responsive_img)
+
+
+def build(root: Path = STATIC_DIR / "img") -> int:
+    """Pre-render every derivative under `root`; returns how many files were written or found."""
+    if Image is None:
+        print("Pillow is not installed; nothing to build.")
+        return 0
+    count = 0
+    for path in sorted(root.rglob("*")):
+        if path.suffix.lower() not in SOURCE_EXTS or not path.is_file():
+            continue
+        try:
+            widths = widthsFor(path)
+        except Exception as e:
+            print(f"| skip {path.name}: {e}")
+            continue
+        for w in widths:
+            derivative(path, w)
+            count += 1
+        print(f"| {path.relative_to(root)}: {', '.join(map(str, widths)) or 'unreadable'}")
+    print(f"| {count} derivatives in {CACHE_DIR}")
+    return count
+
+
+if __name__ == "__main__":
+    build(Path(sys.argv[1]) if len(sys.argv) > 1 else STATIC_DIR / "img")
@@ -1,29 +1,46 @@
 from flask import Flask
-from config import ROOT, SESSION_LIFETIME_DAYS, DB_FILE
+from config import ROOT, SESSION_LIFETIME_DAYS
 import os
 from datetime import timedelta
 #   from routes.admin import bp as admin_bp
 from routes.api import bp as api_bp
 from routes.site import bp as site_bp
 from errors import register_error_handlers
-from dbapi import GLOBALSCHEMA, DButils
-from sqlite3 import Connection as sqlite
+from utils import wib
+import maintenance
+import profiling
+import rendercache
+import sites
+import tracing
+import warmup
 
 def create_app():
-    db = sqlite(DB_FILE)
     app = Flask(__name__, static_folder=str(ROOT / 'web/static'), template_folder=str(ROOT / 'web/templates'))
     app.config['JSON_SORT_KEYS'] = False
     app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-change-me')
     app.permanent_session_lifetime = timedelta(days=SESSION_LIFETIME_DAYS)
 
+    # first, so the request span and profile cover the other hooks
+    tracing.init_app(app)
+    profiling.init_app(app)
+    # picks the site by Host and syncs it on its first request
+    sites.init_app(app)
+
     #app.register_blueprint(admin_bp)
     app.register_blueprint(api_bp)
     app.register_blueprint(site_bp)
 
     register_error_handlers(app)
+    rendercache.init_app(app)
+    # dates are stored as epoch seconds and shown in WIB: {{ a.created_ts|wib }}
+    app.add_template_filter(wib)
+    warmup.init_app(app)
+    maintenance.init_app(app)
     
-    with app.app_context():
-        DButils.syncAll()
-        DButils.close() 
+    # a single site is synced and warmed up before serving, as always;
+    # with several, each one waits for its first request
+    if sites.single():
+        with app.app_context():
+            sites.ensureSynced(sites.current(), wait=True)
 
     return app
\ No newline at end of file
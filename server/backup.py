@@ -0,0 +1,304 @@
+"""
+Online backups of the content directory.
+
+Each backup of a site is a directory <backupDir>/<YYYYmmdd-HHMMSS>/ holding
+(backupDir is BACKUP_DIR, or BACKUP_DIR/<site> when several sites are configured):
+  data.db          copied with SQLite's online backup API, BACKUP_PAGES_PER_STEP
+                   pages at a time with a short sleep in between, so readers and
+                   writers keep going while it runs
+  login.json,      validated copies of the JSON mirrors
+  teachers.json
+  pages/, packs/,  hard links to the live files (a copy when linking is not
+  media/           possible); safe because writers replace files instead of
+                   rewriting them, packs are append-only and media files are
+                   never modified
+  manifest.json    row counts, checksums and timings, written last
+
+It is built under a dot-prefixed name and renamed into place when complete, so
+a listed backup is always a finished one.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import (CONTENT_BACKEND, BACKUP_KEEP,
+                    BACKUP_PAGES_PER_STEP, BACKUP_STEP_SLEEP, BACKUP_MAX_RESTARTS, BACKUP_FILES_PER_STEP, BACKUP_INTERVAL_HOURS)
+from contentstore import DirStore
+from utils import storeDay
+import sites
+
+STAMP = "%Y%m%d-%H%M%S"
+TABLES = ("reads", "users", "teachers")
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _counts(conn: sqlite3.Connection) -> Dict[str, int]:
+    counts = {}
+    for table in TABLES:
+        try:
+            counts[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        except sqlite3.OperationalError:
+            counts[table] = 0
+    return counts
+
+
+class _Restarted(Exception):
+    pass
+
+
+def copyDatabase(dest: Path, pages: int = BACKUP_PAGES_PER_STEP, pause: float = BACKUP_STEP_SLEEP) -> Dict[str, Any]:
+    """
+    Online copy in small steps with a pause between them. In WAL mode a step is
+    just a read transaction, so it never blocks writers; the pauses keep the I/O
+    from crowding out requests. A write from another connection restarts the
+    copy, so after BACKUP_MAX_RESTARTS the rest is done in one step instead.
+    """
+    steps = restarts = 0
+    last = None
+
+    def progress(status, remaining, total):
+        nonlocal steps, restarts, last
+        steps += 1
+        if last is not None and remaining > last:
+            restarts += 1
+            if restarts > BACKUP_MAX_RESTARTS:
+                raise _Restarted()
+        last = remaining
+        time.sleep(pause)
+
+    src = sqlite3.connect(sites.current().dbFile, timeout=30)
+    dst = sqlite3.connect(dest)
+    try:
+        try:
+            src.backup(dst, pages=pages, progress=progress)
+        except _Restarted:
+            src.backup(dst, pages=-1)
+        # the copy stands alone: no -wal next to it, smaller file
+        dst.execute("PRAGMA journal_mode = DELETE")
+        counts = _counts(dst)
+    finally:
+        dst.close()
+        src.close()
+    return {"steps": steps, "restarts": restarts, "counts": counts, "bytes": dest.stat().st_size, "sha256": _sha256(dest)}
+
+
+def copyJSON(src: Path, dest: Path, attempts: int = 5) -> Optional[str]:
+    """Copy a JSON mirror only once it parses; returns its checksum, or None if it does not exist."""
+    for _ in range(attempts):
+        try:
+            data = src.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            json.loads(data)
+        except ValueError:
+            # caught a writer that predates atomic replaces; try again shortly
+            time.sleep(0.1)
+            continue
+        dest.write_bytes(data)
+        return hashlib.sha256(data).hexdigest()
+    raise ValueError(f"{src} never parsed as JSON")
+
+
+def linkTree(src: Path, dest: Path, perStep: int = BACKUP_FILES_PER_STEP, pause: float = BACKUP_STEP_SLEEP) -> Dict[str, int]:
+    stats = {"files": 0, "linked": 0, "copied": 0, "bytes": 0}
+    if not src.exists():
+        return stats
+    for path in src.rglob("*"):
+        if not path.is_file() or path.name.startswith("."):
+            continue
+        target = dest / path.relative_to(src)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(path, target)
+            stats["linked"] += 1
+        except FileNotFoundError:
+            continue  # deleted since the walk saw it
+        except OSError:
+            shutil.copy2(path, target)
+            stats["copied"] += 1
+        stats["files"] += 1
+        stats["bytes"] += target.stat().st_size
+        if stats["files"] % perStep == 0:
+            time.sleep(pause)
+    return stats
+
+
+def _claim(root: Path, stamp: str) -> Tuple[Path, Path]:
+    """
+    (final, work) directories for a new backup, the work one created. A backup already
+    started or finished in the same second (scheduler and an admin run) gets stamp-2, -3, ...
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    n = 1
+    while True:
+        name = stamp if n == 1 else f"{stamp}-{n}"
+        n += 1
+        work = root / f".{name}"
+        try:
+            work.mkdir()
+        except FileExistsError:
+            continue
+        # checked after claiming: a concurrent run may have just renamed its work dir to this name
+        if (root / name).exists():
+            work.rmdir()
+            continue
+        return root / name, work
+
+
+def create(root: Optional[Path] = None) -> Path:
+    """Take a backup of the current site and apply retention; returns the finished backup directory."""
+    site = sites.current()
+    root = root or site.backupDir
+    started = time.perf_counter()
+    final, work = _claim(root, datetime.now().strftime(STAMP))
+    name = final.name
+    try:
+        manifest: Dict[str, Any] = {"name": name, "created": time.time()}
+        t = time.perf_counter()
+        manifest["db"] = copyDatabase(work / "data.db")
+        manifest["db"]["seconds"] = round(time.perf_counter() - t, 3)
+        manifest["json"] = {src.name: copyJSON(src, work / src.name) for src in (site.loginJSON, site.teacherJSON)}
+        t = time.perf_counter()
+        manifest["pages"] = linkTree(site.pageDir, work / "pages")
+        manifest["packs"] = linkTree(site.packDir, work / "packs")
+        manifest["media"] = linkTree(site.mediaDir, work / "media")
+        manifest["filesSeconds"] = round(time.perf_counter() - t, 3)
+        manifest["seconds"] = round(time.perf_counter() - started, 3)
+        (work / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        os.rename(work, final)
+    except BaseException:
+        shutil.rmtree(work, ignore_errors=True)
+        raise
+    prune(root)
+    print(f"[Backup] {name}: {manifest['db']['bytes']} db bytes in {manifest['db']['steps']} steps, "
+          f"{manifest['pages']['files'] + manifest['packs']['files']} files, {manifest['seconds']}s")
+    return final
+
+
+def backups(root: Optional[Path] = None) -> List[Path]:
+    """Finished backups of the current site (or in `root`), newest first."""
+    root = root or sites.current().backupDir
+    if not root.exists():
+        return []
+    found = [p for p in root.iterdir() if p.is_dir() and not p.name.startswith(".") and (p / "manifest.json").exists()]
+    return sorted(found, key=lambda p: p.name, reverse=True)
+
+
+def latest(root: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    found = backups(root)
+    if not found:
+        return None
+    return json.loads((found[0] / "manifest.json").read_text(encoding="utf-8"))
+
+
+def due(root: Optional[Path] = None) -> bool:
+    if BACKUP_INTERVAL_HOURS is None:
+        return False
+    last = latest(root)
+    return last is None or time.time() - last["created"] >= BACKUP_INTERVAL_HOURS * 3600
+
+
+def prune(root: Optional[Path] = None, keep: int = BACKUP_KEEP) -> List[str]:
+    root = root or sites.current().backupDir
+    removed = []
+    for old in backups(root)[keep:]:
+        shutil.rmtree(old)
+        removed.append(old.name)
+    # leftovers of interrupted runs
+    if root.exists():
+        for stale in root.glob(".*"):
+            if stale.is_dir() and time.time() - stale.stat().st_mtime > 24 * 3600:
+                shutil.rmtree(stale, ignore_errors=True)
+    return removed
+
+
+def verify(path: Path) -> Dict[str, Any]:
+    """
+    Check that a backup would restore: the database passes integrity_check and
+    matches the manifest, the JSON copies parse, and every article has a body.
+    """
+    manifest = json.loads((path / "manifest.json").read_text(encoding="utf-8"))
+    problems: List[str] = []
+    db = path / "data.db"
+    if _sha256(db) != manifest["db"]["sha256"]:
+        problems.append("data.db checksum differs from manifest")
+    conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+    try:
+        integrity = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        if integrity != "ok":
+            problems.append(f"integrity_check: {integrity}")
+        counts = _counts(conn)
+        if counts != manifest["db"]["counts"]:
+            problems.append(f"row counts {counts} != manifest {manifest['db']['counts']}")
+        missing = _missingBodies(conn, path)
+        if missing:
+            problems.append(f"{len(missing)} articles without a body, e.g. {missing[:3]}")
+    finally:
+        conn.close()
+    for name, digest in manifest["json"].items():
+        if digest is None:
+            continue
+        try:
+            data = (path / name).read_bytes()
+            json.loads(data)
+        except (OSError, ValueError) as e:
+            problems.append(f"{name}: {e}")
+            continue
+        if hashlib.sha256(data).hexdigest() != digest:
+            problems.append(f"{name} checksum differs from manifest")
+    return {"name": path.name, "ok": not problems, "problems": problems, "counts": counts}
+
+
+def _missingBodies(conn: sqlite3.Connection, path: Path) -> List[str]:
+    """Articles whose body the configured CONTENT_BACKEND could not find in this backup."""
+    if CONTENT_BACKEND == "pack":
+        rows = conn.execute(
+            "SELECT r.uuid, p.pack FROM reads r LEFT JOIN packindex p ON p.uuid = r.uuid"
+        ).fetchall()
+        return [uid for uid, pack in rows if pack is None or not (path / "packs" / f"pack-{pack:06d}.dat").exists()]
+    store = DirStore(path / "pages")
+    missing = []
+    try:
+        rows = conn.execute("SELECT uuid, created, created_day FROM reads").fetchall()
+    except sqlite3.OperationalError:  # taken before migration 11
+        rows = conn.execute("SELECT uuid, created, NULL FROM reads").fetchall()
+    for uid, created, day in rows:
+        try:
+            if store.path(uid, day or storeDay(created)).exists():
+                continue
+        except ValueError:
+            pass
+        missing.append(uid)
+    return missing
+
+
+def restore(path: Path, target: Path) -> Dict[str, Any]:
+    """Copy a verified backup into `target` (an empty or new directory) laid out like USERDATA."""
+    result = verify(path)
+    if not result["ok"]:
+        raise ValueError(f"backup {path.name} failed verification: {result['problems']}")
+    target.mkdir(parents=True, exist_ok=True)
+    if any(target.iterdir()):
+        raise FileExistsError(f"{target} is not empty")
+    shutil.copy2(path / "data.db", target / "data.db")
+    for name in ("login.json", "teachers.json"):
+        if (path / name).exists():
+            shutil.copy2(path / name, target / name)
+    for sub in ("pages", "packs", "media"):
+        if (path / sub).exists():
+            shutil.copytree(path / sub, target / sub)
+    return result
@@ -0,0 +1,139 @@
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from tracing import span
+
+# dict slot + key tuple + value tuple, roughly; keeps many tiny entries honest against the budget
+ENTRY_OVERHEAD = 160
+
+
+class ByteLRU:
+    """
+    LRU cache of bytes values bounded by total size rather than entry count.
+    Values larger than `maxItem` are never stored. With `compressAbove` set,
+    values at least that long are zlib-compressed when it saves space; the
+    budget counts stored (compressed) bytes plus a fixed per-entry overhead.
+    """
+
+    def __init__(self, budget: int, maxItem: Optional[int] = None, name: str = "cache",
+                 compressAbove: Optional[int] = None, level: int = 6):
+        self.name = name
+        self.budget = budget
+        self.maxItem = maxItem if maxItem is not None else budget // 4
+        self.compressAbove = compressAbove
+        self.level = level
+        # key -> (compressed?, stored bytes, raw length)
+        self._data: "OrderedDict[Hashable, Tuple[bool, bytes, int]]" = OrderedDict()
+        self._bytes = 0
+        self._raw = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0
+        self.compressed = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    @staticmethod
+    def _cost(entry: Tuple[bool, bytes, int]) -> int:
+        return len(entry[1]) + ENTRY_OVERHEAD
+
+    def _drop(self, entry: Tuple[bool, bytes, int]) -> None:
+        self._bytes -= self._cost(entry)
+        self._raw -= entry[2]
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with span("cache.get", "cache", cache=self.name) as s:
+            with self._lock:
+                entry = self._data.get(key)
+                if entry is None:
+                    self.misses += 1
+                    s.note(hit=False)
+                    return None
+                self._data.move_to_end(key)
+                self.hits += 1
+            packed, blob, _ = entry
+            s.note(hit=True, bytes=entry[2])
+            return zlib.decompress(blob) if packed else blob
+
+    def set(self, key: Hashable, value: bytes) -> bool:
+        size = len(value)
+        packed = False
+        blob = value
+        if self.compressAbove is not None and size >= self.compressAbove:
+            squeezed = zlib.compress(value, self.level)
+            if len(squeezed) < size:
+                packed, blob = True, squeezed
+        entry = (packed, blob, size)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._drop(old)
+            if len(blob) > self.maxItem:
+                self.rejected += 1
+                return False
+            self._data[key] = entry
+            self._bytes += self._cost(entry)
+            self._raw += size
+            self.compressed += packed
+            while self._bytes > self.budget and self._data:
+                _, evicted = self._data.popitem(last=False)
+                self._drop(evicted)
+                self.evictions += 1
+            return True
+
+    def delete(self, key: Hashable) -> bool:
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is None:
+                return False
+            self._drop(old)
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self._raw = 0
+
+    def keys(self, limit: Optional[int] = None) -> List[Hashable]:
+        """Keys from most to least recently used."""
+        with self._lock:
+            keys = list(reversed(self._data))
+        return keys[:limit] if limit is not None else keys
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "rawBytes": self._raw,
+                "budget": self.budget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRatio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "rejected": self.rejected,
+                "compressed": self.compressed,
+            }
+
+
+class JSONLRU(ByteLRU):
+    """ByteLRU for JSON-serializable values; each get returns a fresh copy."""
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        raw = super().get(key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key: Hashable, value: Any) -> bool:
+        return super().set(key, json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
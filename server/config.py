@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from datetime import timezone, timedelta
 
@@ -8,10 +9,121 @@ TEACHERJSON = USERDATA / "teachers.json"
 LOGINJSON = USERDATA / "login.json"
 DB_FILE = USERDATA / "data.db"
 PAGEDIR = USERDATA / "pages"
+PACKDIR = USERDATA / "packs"
 PREVIEWLIMIT = 10
 PREVIEWWORD = 200
 
+# Sites served by this process (see sites.py), picked by the request's Host header.
+# Each root is laid out like USERDATA and synced on the site's first request; "*" in
+# hosts makes a site the fallback for unknown hosts. cacheShare scales every cache
+# byte budget below for that site. With a single site, paths stay as above.
+SITES = {
+    "default": {"root": USERDATA, "hosts": ["*"], "cacheShare": 1.0},
+}
+
+# Article body backend: "dir" (one .md per article under PAGEDIR) or "pack" (mmap'd pack files under PACKDIR)
+CONTENT_BACKEND = "dir"
+PACK_MAX_BYTES = 64 * 1024 * 1024
+
+# Related reads (TF-IDF, needs numpy): neighbours kept per article, terms kept per article,
+# and the corpus growth ratio that forces a full rebuild instead of incremental patches
+RELATED_TOPK = 5
+RELATED_MAX_TERMS = 200
+RELATED_REBUILD_DRIFT = 0.2
+
+# Rendered HTML caches (bytes)
+PAGECACHE_BYTES = 32 * 1024 * 1024
+FRAGMENTCACHE_BYTES = 8 * 1024 * 1024
+# Article bodies for ReadsAPI.read: byte budget per worker, and the body size
+# from which entries are stored zlib-compressed
+READCACHE_BYTES = 16 * 1024 * 1024
+READCACHE_COMPRESS_ABOVE = 2048
+# Listing pages (ReadsAPI.pageList) cache budget. With METAINDEX, pages without a
+# text query are served from an in-memory metadata snapshot instead.
+LISTCACHE_BYTES = 4 * 1024 * 1024
+METAINDEX = True
+
+# Concurrent cache misses for one key wait this long (seconds) for the query already
+# running before failing with 503. With stale-while-revalidate, listings keep being
+# served from the previous content generation for up to STALE_MAX_SECONDS after a
+# change while one background refresh runs.
+SINGLEFLIGHT_TIMEOUT = 10
+STALE_WHILE_REVALIDATE = True
+STALE_MAX_SECONDS = 30
+# Seconds between checks of the shared content generation: a worker notices reads written
+# by another process (and drops its caches) at most this long after the write.
+GENERATION_POLL_SECONDS = 1.0
+
+# Warm-up after sync: listing pages and newest reads rendered when there is no snapshot.
+# HOTKEYS_FILE keeps the hottest cached URLs across restarts (None disables it).
+WARMUP_PAGES = 3
+WARMUP_READS = 30
+WARMUP_SNAPSHOT_KEYS = 200
+HOTKEYS_FILE = USERDATA / "hotkeys.json"
+
+# View counters: seconds between batched flushes per worker, days of hourly
+# buckets kept, and the default size of the most-read lists
+VIEWS_FLUSH_SECONDS = 10
+VIEWS_KEEP_DAYS = 35
+POPULAR_LIMIT = 10
+
+# Feeds and sitemaps: items in /feed.xml and /atom.xml, URLs per /sitemap-N.xml shard,
+# and the byte budget for their cached bodies
+FEED_ITEMS = 30
+SITEMAP_SHARD_SIZE = 5000
+FEEDCACHE_BYTES = 16 * 1024 * 1024
+
+# SQLite maintenance (per worker, only while no request is in flight): seconds between
+# checks and of quiet before a pass; WAL sizes for a passive and a truncating checkpoint;
+# PRAGMA optimize interval; free-page share and count that trigger an incremental vacuum
+# of at most VACUUM_STEP_PAGES pages; rows kept in maintenance_log
+MAINT_TICK_SECONDS = 60
+MAINT_IDLE_SECONDS = 2
+WAL_PASSIVE_BYTES = 4 * 1024 * 1024
+WAL_TRUNCATE_BYTES = 64 * 1024 * 1024
+OPTIMIZE_EVERY_SECONDS = 3600
+VACUUM_FREE_RATIO = 0.1
+VACUUM_MIN_FREE_PAGES = 1000
+VACUUM_STEP_PAGES = 2000
+MAINT_HISTORY_KEEP = 500
+
+# Backups (see backup.py): destination, how many are kept, every how many hours the
+# maintenance scheduler takes one (None disables), database pages copied per step and
+# the pause after each step (and after every BACKUP_FILES_PER_STEP linked files),
+# and how many restarts caused by concurrent writes before the copy finishes in one step
+BACKUP_DIR = USERDATA.parent / "backups"
+BACKUP_KEEP = 7
+BACKUP_INTERVAL_HOURS = 24
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP = 0.02
+BACKUP_FILES_PER_STEP = 500
+BACKUP_MAX_RESTARTS = 3
+
+# Tracing (see tracing.py): share of requests traced at random, where Chrome trace-event
+# JSON files go (None disables saving) and how many are kept, the event cap per trace,
+# and whether DButils.syncAll is traced at startup. Admins can force a trace with X-Trace: 1.
+TRACE_SAMPLE = 0.0
+TRACE_DIR = USERDATA / "traces"
+TRACE_KEEP = 200
+TRACE_MAX_EVENTS = 50000
+TRACE_SYNC = False
+
+# On-demand profiling (see profiling.py): where .prof files go, how many are kept, and
+# how many functions the text report lists
+PROFILE_DIR = USERDATA / "profiles"
+PROFILE_KEEP = 50
+PROFILE_TOP = 40
+
+# Media uploads (see media.py): largest accepted file, bytes read and hashed per step
+# while streaming to disk, and the browser cache lifetime of /media/ URLs (immutable)
+MEDIA_MAX_BYTES = 20 * 1024 * 1024
+MEDIA_CHUNK_BYTES = 256 * 1024
+MEDIA_MAX_AGE = 365 * 24 * 3600
+
 ADMIN_REGISTER_TOKEN = "sman2cikpus@admin"
+# Bearer token for scripted admin calls (X-Admin-Token header), taken from the environment
+# only; unset disables header auth and admin endpoints need an admin session
+ADMIN_API_TOKEN = os.environ.get("SMANDA_ADMIN_TOKEN") or None
 
 # Session lifetime (days) when 'remember me' is checked
 SESSION_LIFETIME_DAYS = 30
@@ -19,4 +131,6 @@ SESSION_LIFETIME_DAYS = 30
 
 # timezone placeholder if needed elsewhere
 UTC = timezone.utc
-WIB = timezone(timedelta(hours=7), "WIB")
\ No newline at end of file
+WIB = timezone(timedelta(hours=7), "WIB")
+# zone assumed for frontmatter dates written without one (ReadsAPI.add writes UTC)
+NAIVE_TZ = UTC
\ No newline at end of file
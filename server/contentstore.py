@@ -0,0 +1,356 @@
+import fcntl
+import mmap
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Iterator, Tuple, Dict, List
+
+from config import PAGEDIR, PACKDIR, PACK_MAX_BYTES, CONTENT_BACKEND
+from utils import atomicWrite
+import sites
+
+PACKSCHEMA = """
+CREATE TABLE IF NOT EXISTS packindex (
+    uuid TEXT PRIMARY KEY,
+    pack INTEGER,
+    offset INTEGER,
+    length INTEGER,
+    mtime REAL
+);
+"""
+
+# record: header (magic, uuid length, body length, write time), uuid (utf-8), body.
+# RPK1 records from older packs have a fixed 36-byte ascii uuid and are still read.
+_HEADER = struct.Struct("<4sHId")
+_MAGIC = b"RPK2"
+_HEADER_V1 = struct.Struct("<4s36sId")
+_MAGIC_V1 = b"RPK1"
+_UUID_MAX = 1024
+_PACKNAME = re.compile(r"^pack-(\d{6})\.dat$")
+_DAY = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class DirStore:
+    """One markdown file per article under PAGEDIR/YYYY/MM/DD/."""
+    name = "dir"
+
+    def __init__(self, root: Path = PAGEDIR):
+        self.root = Path(root)
+
+    def initSchema(self, connection: sqlite3.Connection) -> None:
+        pass
+
+    def exists(self) -> bool:
+        return self.root.exists()
+
+    def path(self, uid: str, day: str) -> Path:
+        # day is reads.created_day (YYYY-MM-DD), stored at import: nothing is parsed per read
+        if not day or not _DAY.match(day):
+            raise ValueError(f"no YYYY-MM-DD day: {day!r}")
+        return self.root / day[:4] / day[5:7] / day[8:10] / f"{uid}.md"
+
+    def get(self, connection: sqlite3.Connection, uid: str, day: str) -> Optional[str]:
+        fpath = self.path(uid, day)
+        if not fpath.exists():
+            return None
+        return fpath.read_text(encoding="utf-8")
+
+    def put(self, connection: sqlite3.Connection, uid: str, text: str, day: str) -> None:
+        fpath = self.path(uid, day)
+        fpath.parent.mkdir(parents=True, exist_ok=True)
+        atomicWrite(fpath, text)
+
+    def delete(self, connection: sqlite3.Connection, uid: str, day: str) -> bool:
+        fpath = self.path(uid, day)
+        if not fpath.exists():
+            return False
+        fpath.unlink()
+        return True
+
+    def changed(self, connection: sqlite3.Connection) -> Iterator[Tuple[str, str, Optional[str]]]:
+        """
+        Yield (uuid, text, day) for every article on disk, day being the YYYY/MM/DD folder
+        it was found in (None elsewhere); the directory layout has no change index.
+        """
+        for file in self.root.rglob("*.md"):
+            parts = file.relative_to(self.root).parts[:-1]
+            day = "-".join(parts) if len(parts) == 3 else None
+            yield file.stem, file.read_text(encoding="utf-8"), day if day and _DAY.match(day) else None
+
+
+class PackStore:
+    """
+    Append-only pack files with an offset index in SQLite.
+    Reads are served as slices of a shared read-only mmap per pack.
+    """
+    name = "pack"
+
+    def __init__(self, root: Path = PACKDIR, maxBytes: int = PACK_MAX_BYTES):
+        self.root = Path(root)
+        self.maxBytes = maxBytes
+        self._maps: Dict[int, Tuple[object, mmap.mmap]] = {}
+        self._lock = threading.Lock()
+
+    # --- layout ---
+
+    def initSchema(self, connection: sqlite3.Connection) -> None:
+        connection.executescript(PACKSCHEMA)
+
+    def exists(self) -> bool:
+        return self.root.exists()
+
+    def _packPath(self, num: int) -> Path:
+        return self.root / f"pack-{num:06d}.dat"
+
+    def packs(self) -> List[int]:
+        if not self.root.exists():
+            return []
+        nums = []
+        for p in self.root.iterdir():
+            m = _PACKNAME.match(p.name)
+            if m:
+                nums.append(int(m.group(1)))
+        return sorted(nums)
+
+    def _currentPack(self) -> int:
+        nums = self.packs()
+        if not nums:
+            return 1
+        last = nums[-1]
+        if self._packPath(last).stat().st_size >= self.maxBytes:
+            return last + 1
+        return last
+
+    # --- mmap handling ---
+
+    def _map(self, num: int, need: int) -> Optional[mmap.mmap]:
+        """Return an mmap of pack `num` covering at least `need` bytes, remapping if the pack grew."""
+        with self._lock:
+            cached = self._maps.get(num)
+            if cached and len(cached[1]) >= need:
+                return cached[1]
+            if cached:
+                self._unmap(num)
+            fpath = self._packPath(num)
+            if not fpath.exists() or fpath.stat().st_size < need:
+                return None
+            f = open(fpath, "rb")
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[num] = (f, m)
+            return m
+
+    def _unmap(self, num: int) -> None:
+        cached = self._maps.pop(num, None)
+        if cached:
+            f, m = cached
+            m.close()
+            f.close() # type: ignore
+
+    def close(self) -> None:
+        with self._lock:
+            for num in list(self._maps):
+                self._unmap(num)
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """
+        Store-wide lock across workers: appends and compaction both pick pack numbers
+        and compaction deletes packs, so they must never overlap.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / "pack.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # --- records ---
+
+    @staticmethod
+    def _header(uid: str, length: int, mtime: float) -> bytes:
+        raw = uid.encode("utf-8")
+        if not raw or len(raw) > _UUID_MAX:
+            raise ValueError(f"uuid must be 1-{_UUID_MAX} bytes: {uid!r}")
+        return _HEADER.pack(_MAGIC, len(raw), length, mtime) + raw
+
+    def _append(self, uid: str, data: bytes, mtime: float) -> Tuple[int, int]:
+        """Append one record to the current pack, returns (pack, body offset). Call under _exclusive()."""
+        header = self._header(uid, len(data), mtime)
+        num = self._currentPack()
+        with open(self._packPath(num), "ab") as f:
+            f.seek(0, os.SEEK_END)
+            start = f.tell()
+            f.write(header)
+            f.write(data)
+            f.flush()
+        return num, start + len(header)
+
+    def get(self, connection: sqlite3.Connection, uid: str, day: str = "") -> Optional[str]:
+        row = connection.execute(
+            "SELECT pack, offset, length FROM packindex WHERE uuid = ?", (uid,)
+        ).fetchone()
+        if not row:
+            return None
+        num, offset, length = row[0], row[1], row[2]
+        m = self._map(num, offset + length)
+        if m is None:
+            return None
+        return m[offset:offset + length].decode("utf-8")
+
+    def put(self, connection: sqlite3.Connection, uid: str, text: str, day: str = "") -> None:
+        data = text.encode("utf-8")
+        mtime = time.time()
+        # indexed before the lock is released, so compaction never drops an unindexed record
+        with self._exclusive():
+            num, offset = self._append(uid, data, mtime)
+            connection.execute(
+                "INSERT OR REPLACE INTO packindex (uuid, pack, offset, length, mtime) VALUES (?, ?, ?, ?, ?)",
+                (uid, num, offset, len(data), mtime),
+            )
+            connection.commit()
+
+    def delete(self, connection: sqlite3.Connection, uid: str, day: str = "") -> bool:
+        cursor = connection.execute("DELETE FROM packindex WHERE uuid = ?", (uid,))
+        connection.commit()
+        return cursor.rowcount > 0
+
+    def changed(self, connection: sqlite3.Connection) -> Iterator[Tuple[str, str, Optional[str]]]:
+        """Yield (uuid, text, None) only for records written after the last import of that uuid."""
+        rows = connection.execute(
+            """
+            SELECT p.uuid FROM packindex p
+            LEFT JOIN reads r ON r.uuid = p.uuid
+            WHERE r.uuid IS NULL OR p.mtime > r.mtime
+            """
+        ).fetchall()
+        for row in rows:
+            text = self.get(connection, row[0])
+            if text is not None:
+                yield row[0], text, None
+
+    # --- maintenance ---
+
+    def scanPack(self, num: int) -> Iterator[Tuple[str, int, int, float]]:
+        """Walk the records of one pack, yields (uuid, body offset, length, mtime)."""
+        fpath = self._packPath(num)
+        size = fpath.stat().st_size
+        with open(fpath, "rb") as f:
+            pos = 0
+            while pos + 4 <= size:
+                f.seek(pos)
+                magic = f.read(4)
+                f.seek(pos)
+                if magic == _MAGIC and pos + _HEADER.size <= size:
+                    _, uidLen, length, mtime = _HEADER.unpack(f.read(_HEADER.size))
+                    uid = f.read(uidLen).decode("utf-8", "replace")
+                    body = pos + _HEADER.size + uidLen
+                elif magic == _MAGIC_V1 and pos + _HEADER_V1.size <= size:
+                    _, rawUid, length, mtime = _HEADER_V1.unpack(f.read(_HEADER_V1.size))
+                    uid = rawUid.decode("ascii").rstrip("\x00")
+                    body = pos + _HEADER_V1.size
+                else:
+                    print(f"[Pack] Corrupt record in {fpath.name} at {pos}, stopping scan")
+                    break
+                if body + length > size:
+                    print(f"[Pack] Truncated record in {fpath.name} at {pos}")
+                    break
+                yield uid, body, length, mtime
+                pos = body + length
+
+    def rebuildIndex(self, connection: sqlite3.Connection) -> int:
+        """Recreate packindex from the pack files; the newest record per uuid wins."""
+        latest: Dict[str, Tuple[int, int, int, float]] = {}
+        for num in self.packs():
+            for uid, offset, length, mtime in self.scanPack(num):
+                prev = latest.get(uid)
+                if prev is None or mtime >= prev[3]:
+                    latest[uid] = (num, offset, length, mtime)
+        connection.execute("DELETE FROM packindex")
+        connection.executemany(
+            "INSERT INTO packindex (uuid, pack, offset, length, mtime) VALUES (?, ?, ?, ?, ?)",
+            [(uid, *rec) for uid, rec in latest.items()],
+        )
+        connection.commit()
+        return len(latest)
+
+    def stats(self, connection: sqlite3.Connection) -> Dict[int, Dict[str, int]]:
+        """Live vs on-disk bytes per pack."""
+        live = {row[0]: row[1] for row in connection.execute(
+            "SELECT pack, SUM(length + LENGTH(CAST(uuid AS BLOB))) + COUNT(*) * ? FROM packindex GROUP BY pack",
+            (_HEADER.size,),
+        )}
+        return {
+            num: {"size": self._packPath(num).stat().st_size, "live": int(live.get(num, 0))}
+            for num in self.packs()
+        }
+
+    def compact(self, connection: sqlite3.Connection, minDeadRatio: float = 0.25) -> Dict[str, int]:
+        """
+        Copy live records out of packs with at least `minDeadRatio` garbage into a fresh pack,
+        repoint the index in one transaction, then drop the old packs. Puts from any worker
+        wait for the whole pass, so nothing is appended to a pack that is about to go.
+        """
+        with self._exclusive():
+            stats = self.stats(connection)
+            victims = [
+                num for num, s in stats.items()
+                if s["size"] and (s["size"] - s["live"]) / s["size"] >= minDeadRatio
+            ]
+            if not victims:
+                return {"packs": 0, "reclaimed": 0}
+
+            target = (self.packs()[-1] + 1) if self.packs() else 1
+            moved = []
+            # victims with a record that could not be copied are kept, so the index never
+            # points into a deleted pack
+            kept = set()
+            copied: Dict[int, int] = {}
+            with open(self._packPath(target), "ab") as out:
+                for num in victims:
+                    rows = connection.execute(
+                        "SELECT uuid, offset, length, mtime FROM packindex WHERE pack = ? ORDER BY offset", (num,)
+                    ).fetchall()
+                    for uid, offset, length, mtime in rows:
+                        m = self._map(num, offset + length)
+                        if m is None:
+                            print(f"[Pack] {uid} not readable in pack {num}, keeping that pack")
+                            kept.add(num)
+                            continue
+                        header = self._header(uid, length, mtime)
+                        start = out.tell()
+                        out.write(header)
+                        out.write(m[offset:offset + length])
+                        moved.append((target, start + len(header), uid, num))
+                        copied[num] = copied.get(num, 0) + len(header) + length
+                out.flush()
+                os.fsync(out.fileno())
+
+            connection.executemany(
+                "UPDATE packindex SET pack = ?, offset = ? WHERE uuid = ? AND pack = ?", moved
+            )
+            connection.commit()
+
+            victims = [num for num in victims if num not in kept]
+            reclaimed = sum(stats[num]["size"] - copied.get(num, 0) for num in victims)
+
+            with self._lock:
+                for num in victims:
+                    self._unmap(num)
+            for num in victims:
+                self._packPath(num).unlink(missing_ok=True)
+
+        print(f"[Pack] Compacted {len(victims)} pack(s), reclaimed {reclaimed} bytes")
+        return {"packs": len(victims), "reclaimed": reclaimed}
+
+
+_stores = sites.local(lambda site: PackStore(site.packDir) if CONTENT_BACKEND == "pack" else DirStore(site.pageDir))
+
+def getStore():
+    """The current site's content backend, selected by CONTENT_BACKEND."""
+    return _stores.instance()
@@ -1,47 +1,100 @@
 from datetime import datetime, timezone
-from typing import Optional, List, Dict, Any
-from utils import text_snippet
-from config import DB_FILE, PAGEDIR, PREVIEWLIMIT, PREVIEWWORD, LOGINJSON, TEACHERJSON
+from typing import Optional, List, Dict, Any, Callable, Iterable
+from utils import text_snippet, atomicWrite, parseDate, normalizeDate, normalizeMonth, monthRange, storeDay
+from config import PREVIEWLIMIT, PREVIEWWORD, READCACHE_BYTES, READCACHE_COMPRESS_ABOVE, WIB
+from config import LISTCACHE_BYTES, SINGLEFLIGHT_TIMEOUT, STALE_WHILE_REVALIDATE, STALE_MAX_SECONDS, METAINDEX, TRACE_SYNC
+from config import GENERATION_POLL_SECONDS
 import time
 import json
 from pathlib import Path
 import uuid as uuid
 import sqlite3
 import re
-from flask import g as flask_g
+from flask import g as flask_g, current_app
 import hashlib
-from functools import lru_cache
+from contentstore import getStore
+from textindex import TextIndex
+from suggest import getSuggest
+from related import getRelated
+from migrations import migrate
+from deltasync import deltaSync
+from bytecache import JSONLRU
+from singleflight import SingleFlight
+from metaindex import MetaIndex, sizeOf, FIELDS as LIST_FIELDS
+import profiling
+import tracing
+import sites
 
 db = None
 
-GLOBALSCHEMA = """
-CREATE TABLE IF NOT EXISTS reads (
-    uuid TEXT PRIMARY KEY,
-    title TEXT,
-    creator TEXT,
-    created TEXT,
-    type TEXT,
-    preview TEXT,
-    mtime REAL
-);
-
-CREATE TABLE IF NOT EXISTS users (
-    id TEXT PRIMARY KEY,
-    username TEXT,
-    password TEXT,
-    role TEXT
-);
-
-CREATE TABLE IF NOT EXISTS teachers (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    name TEXT,
-    subject TEXT,
-    bio TEXT,
-    role TEXT,
-    mtime REAL
-);
+_FM_REGEX = re.compile(r"^---\s*(.*?)---\s*(.*)$", re.DOTALL)
+
+# Everything below is per site (sites.local): each site has its own index, caches and generation.
+
+# autocomplete ranking weight per teacher field
+TEACHER_FIELDS = {"name": 4.0, "subject": 2.0, "role": 1.5, "bio": 1.0}
+_teacherIndex = sites.local(lambda site: TextIndex(TEACHER_FIELDS, exact=("name",)))
+
+# ReadsAPI.read results, bounded by bytes so long articles cannot blow up a worker
+_readCache = sites.local(lambda site: JSONLRU(site.budget(READCACHE_BYTES), name="reads", compressAbove=READCACHE_COMPRESS_ABOVE))
+# ReadsAPI.pageList results as {"gen": generation, "value": ...}; older generations are stale, not gone
+_listCache = sites.local(lambda site: JSONLRU(site.budget(LISTCACHE_BYTES), name="lists"))
+# concurrent misses for one key share a single query
+_flights = sites.local(lambda site: SingleFlight(SINGLEFLIGHT_TIMEOUT, name=f"reads-{site.name}"))
+# generation: content_generation as last seen by this worker (any process's write to reads
+# bumps it), cache keys include it; checkedAt: monotonic time of that check; changedAt: time
+# the change was noticed; metaIndex: listing metadata for query-less pages, replaced
+# wholesale, never mutated; teacherStamp: (mtime, size) of teachers.json when _teacherIndex
+# was last in sync with it
+_state = sites.local(lambda site: sites.State(generation=0, checkedAt=0.0, changedAt=0.0, metaIndex=None, teacherStamp=None))
+
+# Facet counters for reads, kept current by triggers so listings never need COUNT(*).
+# facet is one of 'total' (key ''), 'type', 'creator', 'month' (key 'YYYY-MM').
+STATSSCHEMA = """
+CREATE TABLE IF NOT EXISTS reads_stats (
+    facet TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (facet, key)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS reads_stats_ai AFTER INSERT ON reads BEGIN
+    INSERT INTO reads_stats (facet, key, count) VALUES
+        ('total', '', 1),
+        ('type', COALESCE(NEW.type, ''), 1),
+        ('creator', COALESCE(NEW.creator, ''), 1),
+        ('month', {new_month}, 1)
+    ON CONFLICT (facet, key) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS reads_stats_ad AFTER DELETE ON reads BEGIN
+    UPDATE reads_stats SET count = count - 1 WHERE
+        (facet = 'total' AND key = '')
+        OR (facet = 'type' AND key = COALESCE(OLD.type, ''))
+        OR (facet = 'creator' AND key = COALESCE(OLD.creator, ''))
+        OR (facet = 'month' AND key = {old_month});
+    DELETE FROM reads_stats WHERE count <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS reads_stats_au AFTER UPDATE OF type, creator, created_ts ON reads BEGIN
+    UPDATE reads_stats SET count = count - 1 WHERE
+        (facet = 'type' AND key = COALESCE(OLD.type, ''))
+        OR (facet = 'creator' AND key = COALESCE(OLD.creator, ''))
+        OR (facet = 'month' AND key = {old_month});
+    INSERT INTO reads_stats (facet, key, count) VALUES
+        ('type', COALESCE(NEW.type, ''), 1),
+        ('creator', COALESCE(NEW.creator, ''), 1),
+        ('month', {new_month}, 1)
+    ON CONFLICT (facet, key) DO UPDATE SET count = count + 1;
+    DELETE FROM reads_stats WHERE count <= 0;
+END;
 """
 
+# YYYY-MM of created_ts in WIB, the same month as utils.monthOf / monthRange
+_WIB_OFFSET = int(WIB.utcoffset(None).total_seconds())
+_MONTH_SQL = f"COALESCE(strftime('%Y-%m', {{row}}.created_ts + {_WIB_OFFSET}, 'unixepoch'), '')"
+STATSSCHEMA = STATSSCHEMA.format(new_month=_MONTH_SQL.format(row="NEW"), old_month=_MONTH_SQL.format(row="OLD"))
+
 class DButils: # complete
     def __init__(self, dbFile):
         self.dbFile = str(dbFile)
@@ -50,7 +103,7 @@ class DButils: # complete
     def connect() -> sqlite3.Connection:
         """Per-request SQLite connection using flask.g"""
         if not hasattr(flask_g, "_db") or flask_g._db is None:
-            conn = sqlite3.connect(DB_FILE, detect_types=sqlite3.PARSE_DECLTYPES, timeout=30)
+            conn = sqlite3.connect(sites.current().dbFile, detect_types=sqlite3.PARSE_DECLTYPES, timeout=30, factory=tracing.Connection)
             conn.row_factory = sqlite3.Row
             conn.execute("PRAGMA foreign_keys = ON")
             conn.execute("PRAGMA journal_mode = WAL")
@@ -59,12 +112,22 @@ class DButils: # complete
         return flask_g._db
 
     @staticmethod
-    def init_db():
+    def init_db(force: bool = False):
+        """Run pending migrations and the derived schemas; a no-op once done in this process."""
+        site = sites.current()
+        if site.ready and not force:
+            return
         try:
-            with sqlite3.connect(DB_FILE) as conn:
+            with sqlite3.connect(site.dbFile, timeout=30) as conn:
                 conn.row_factory = sqlite3.Row
-                conn.executescript(GLOBALSCHEMA)
+                migrate(conn)
+                conn.executescript(STATSSCHEMA)
+                getStore().initSchema(conn)
+                getRelated().initSchema(conn)
+                if conn.execute("SELECT 1 FROM reads LIMIT 1").fetchone() and not conn.execute("SELECT 1 FROM reads_stats LIMIT 1").fetchone():
+                    ReadsAPI.rebuildStats(conn)
                 conn.commit()
+            site.ready = True
         finally:
             print("DB Initialized")
         
@@ -77,13 +140,15 @@ class DButils: # complete
     @staticmethod
     def syncAll():
         steps = [
-            ("Initialize DB...  ", DButils.init_db),
+            ("Initialize DB...  ", lambda: DButils.init_db(force=True)),
             ("Sync users...     ", UserAPI.sync),
             ("Sync teachers...  ", TeacherAPI.sync),
             ("Import reads...   ", ReadsAPI.importFromDir)]
-        for i, (label, func) in enumerate(steps, 1):
-            print(f"[{i}/{len(steps)}] {label}", end='', flush=True)
-            func()
+        with profiling.job("sync"), tracing.trace("syncAll", enabled=TRACE_SYNC):
+            for i, (label, func) in enumerate(steps, 1):
+                print(f"[{i}/{len(steps)}] {label}", end='', flush=True)
+                with tracing.span(label.strip(" ."), "job"):
+                    func()
         print("Synchronized all data sources.")
         return {"status": "success"}
 
@@ -95,15 +160,79 @@ class DButils: # complete
             flask_g._db = None
 
 class ReadsAPI: # complete
+    _listeners: List[Callable[[List[str]], None]] = []
+
+    @staticmethod
+    def subscribe(fn: Callable[[List[str]], None]) -> Callable[[List[str]], None]:
+        """Register fn(uuids) to be called after reads rows are written."""
+        ReadsAPI._listeners.append(fn)
+        return fn
+
+    @staticmethod
+    def generation() -> int:
+        """
+        This site's content generation, shared by all workers (content_generation is
+        bumped by triggers on reads); cache keys include it. Re-read at most every
+        GENERATION_POLL_SECONDS; a change made by another process drops this worker's
+        in-memory copies of reads.
+        """
+        state = _state.instance()
+        now = time.monotonic()
+        if now - state.checkedAt >= GENERATION_POLL_SECONDS:
+            state.checkedAt = now
+            shared = ReadsAPI._sharedGeneration()
+            if shared is not None and shared != state.generation:
+                ReadsAPI._changedElsewhere(state, shared)
+        return state.generation
+
+    @staticmethod
+    def _sharedGeneration() -> Optional[int]:
+        try:
+            conn = sqlite3.connect(sites.current().dbFile, timeout=30)
+            try:
+                row = conn.execute("SELECT generation FROM content_generation WHERE id = 1").fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error:  # not migrated yet
+            return None
+        return row[0] if row else None
+
+    @staticmethod
+    def _changedElsewhere(state: "sites.State", shared: int) -> None:
+        """Another process wrote reads: which rows is unknown, so drop everything derived from them."""
+        first = state.generation == 0
+        state.generation = shared
+        state.changedAt = time.time()
+        _readCache.clear()
+        index = getSuggest()
+        with index.lock:
+            index.built = False
+        ReadsAPI._rebuildMeta()
+        if not first:
+            print(f"[Reads] {sites.current().name}: content changed by another worker (generation {shared})")
+
+    @staticmethod
+    def _changed(uuids: List[str]) -> None:
+        if not uuids:
+            return
+        state = _state.instance()
+        # this worker's own write: targeted updates below instead of _changedElsewhere
+        shared = ReadsAPI._sharedGeneration()
+        state.generation = shared if shared is not None else state.generation + 1
+        state.checkedAt = time.monotonic()
+        state.changedAt = time.time()
+        for uid in uuids:
+            _readCache.delete(uid)
+        for fn in ReadsAPI._listeners:
+            try:
+                fn(uuids)
+            except Exception as e:
+                print(f"[Reads] change listener {getattr(fn, '__name__', fn)} failed: {e}")
+
     @staticmethod
     def add(title: str="No Title", creator: str = "admin", content: str= "No Content.", type_: str = "article") -> str: # unused
         now = datetime.now(timezone.utc)
         uid = str(uuid.uuid4())
-        date_path = now.strftime("%Y/%m/%d")
-        base = Path(PAGEDIR) / date_path
-        base.mkdir(parents=True, exist_ok=True)
-
-        fpath = base / f"{uid}.md"
 
         md = (
             f"---\n"
@@ -116,20 +245,20 @@ class ReadsAPI: # complete
             f"{content.strip()}\n"
         )
 
-        with open(fpath, "w", encoding="utf-8") as f:
-            f.write(md)
-
         preview = text_snippet(content, 180)
         DButils.init_db()
         connection = DButils.connect()
+        day = storeDay(now.isoformat())
+        getStore().put(connection, uid, md, day)
         connection.execute(
             """
-            INSERT INTO reads (uuid, title, creator, created, type, preview, mtime)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO reads (uuid, title, creator, created, created_ts, created_utc, created_day, type, preview, mtime)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
-            [uid, title, creator, now.isoformat(), type_, preview, now.timestamp()],
+            [uid, title, creator, now.isoformat(), *normalizeDate(now), day, type_, preview, now.timestamp()],
         )
         connection.commit()
+        ReadsAPI._changed([uid])
 
         print( f"Created new read: {title} ({uid})" )
         return uid
@@ -155,80 +284,217 @@ class ReadsAPI: # complete
         return None
 
     @staticmethod
-    @lru_cache(maxsize=512)
-    def pageList(offset: int = 0, limit: int = 10, query: str = "") -> Dict[str, Any]: # complete
+    def pageList(offset: int = 0, limit: int = 10, query: str = "", type_: str = "", month: str = "") -> Dict[str, Any]: # complete
+        """
+        Cached listing page. Concurrent misses for the same key run one query.
+        Right after a change, an outdated entry is served (for at most
+        STALE_MAX_SECONDS) while a background thread refreshes it; the request
+        is flagged so the page caches do not store what was rendered from it.
+        """
+        # one spelling for the cache key, the facet counts and MetaIndex.byMonth
+        month = normalizeMonth(month) if month else ""
+        if METAINDEX and not query:
+            index = _state.metaIndex
+            if index is not None and index.generation == ReadsAPI.generation():
+                items, total = index.page(offset, limit, type_, month)
+                return {"items": [m.asDict() for m in items], "total": total}
+            if index is None:
+                ReadsAPI._rebuildMeta()
+
+        key = (offset, limit, query, type_, month)
+        entry = _listCache.get(key)
+        if entry is not None:
+            if entry["gen"] == ReadsAPI.generation():
+                return entry["value"]
+            if STALE_WHILE_REVALIDATE and time.time() - _state.changedAt < STALE_MAX_SECONDS:
+                app = current_app._get_current_object()
+
+                def refresh():
+                    with app.app_context():
+                        try:
+                            ReadsAPI._loadPageList(*key)
+                        finally:
+                            DButils.close()
+
+                _flights.spawn(("pageList", key), refresh)
+                flask_g.servedStale = True
+                return entry["value"]
+        return _flights.do(("pageList", key), lambda: ReadsAPI._loadPageList(*key))
+
+    @staticmethod
+    def _rebuildMeta(uuids: Optional[List[str]] = None) -> None:
+        """Build a fresh MetaIndex on a background thread and swap it in."""
+        if not METAINDEX:
+            return
+
+        state = _state.instance()
+
+        def build():
+            while True:
+                gen = state.generation
+                conn = sqlite3.connect(sites.current().dbFile, timeout=30)
+                try:
+                    state.metaIndex = MetaIndex.build(conn, gen)
+                finally:
+                    conn.close()
+                if state.generation == gen:
+                    return
+
+        _flights.spawn(("metaindex",), build)
+
+    @staticmethod
+    def _loadPageList(offset: int, limit: int, query: str, type_: str, month: str) -> Dict[str, Any]:
+        gen = ReadsAPI.generation()
         DButils.init_db()
         connection = DButils.connect()
         
-        sql = "SELECT * FROM reads"
+        sql = f"SELECT {', '.join(LIST_FIELDS)} FROM reads"
+        where: List[str] = []
         params: List[Any] = []
 
         if query:
-            sql += " WHERE title LIKE ? OR creator LIKE ?"
+            where.append("(title LIKE ? OR creator LIKE ?)")
             qparam = f"%{query}%"
             params.extend([qparam, qparam])
-        
-        sql_count = "SELECT COUNT(*) FROM reads"
-        if query:
-            sql_count += " WHERE title LIKE ? OR creator LIKE ?"
-
-        # total count
-        cursor = connection.execute(sql_count, params)
-        total = cursor.fetchone()[0]
+        if type_:
+            where.append("type = ?")
+            params.append(type_)
+        if month:
+            # a range on created_ts, so the index serves it
+            span = monthRange(month) or (0, 0)
+            where.append("created_ts >= ? AND created_ts < ?")
+            params.extend(span)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+
+        # total count: a single facet (or none) is answered from reads_stats
+        if not query and not (type_ and month):
+            facet, key = ("type", type_) if type_ else ("month", month) if month else ("total", "")
+            row = connection.execute("SELECT count FROM reads_stats WHERE facet = ? AND key = ?", (facet, key)).fetchone()
+            total = row[0] if row else 0
+        else:
+            sql_count = "SELECT COUNT(*) FROM reads WHERE " + " AND ".join(where)
+            cursor = connection.execute(sql_count, params)
+            total = cursor.fetchone()[0]
 
-        sql += " ORDER BY created DESC LIMIT ? OFFSET ?"
+        sql += " ORDER BY created_ts DESC, uuid DESC LIMIT ? OFFSET ?"
         params.extend([limit, offset])
 
         cursor = connection.execute(sql, params)
         rows = cursor.fetchall()
 
-        return {
+        result = {
             "items": [dict(row) for row in rows],
             "total": total
         }
+        _listCache.set((offset, limit, query, type_, month), {"gen": gen, "value": result})
+        return result
+
+    @staticmethod
+    def facets() -> Dict[str, Any]: # complete
+        """Counts per type/creator/month plus the overall total, straight from reads_stats."""
+        connection = DButils.connect()
+        out: Dict[str, Any] = {"total": 0, "type": {}, "creator": {}, "month": {}}
+        for row in connection.execute("SELECT facet, key, count FROM reads_stats"):
+            if row[0] == "total":
+                out["total"] = row[2]
+            elif row[0] in out:
+                out[row[0]][row[1]] = row[2]
+        out["month"] = dict(sorted(out["month"].items(), reverse=True))
+        return out
+
+    @staticmethod
+    def rebuildStats(connection: sqlite3.Connection) -> None:
+        """Recount reads_stats from scratch (first run on an existing database, or repair)."""
+        month = _MONTH_SQL.format(row="reads")
+        connection.execute("DELETE FROM reads_stats")
+        connection.execute("INSERT INTO reads_stats (facet, key, count) SELECT 'total', '', COUNT(*) FROM reads")
+        connection.execute("INSERT INTO reads_stats (facet, key, count) SELECT 'type', COALESCE(type, ''), COUNT(*) FROM reads GROUP BY 1, 2")
+        connection.execute("INSERT INTO reads_stats (facet, key, count) SELECT 'creator', COALESCE(creator, ''), COUNT(*) FROM reads GROUP BY 1, 2")
+        connection.execute(f"INSERT INTO reads_stats (facet, key, count) SELECT 'month', {month}, COUNT(*) FROM reads GROUP BY 1, 2")
+        connection.execute("DELETE FROM reads_stats WHERE count <= 0")
     
+    @staticmethod
+    def parseFront(text: str, uid: str) -> Any:
+        """Split a stored article into (meta, body); meta falls back to import defaults."""
+        meta = {"uuid": uid, "title": uid, "creator": "imported", "type": "article", "date": datetime.now(timezone.utc).isoformat()}
+        m = _FM_REGEX.match(text)
+        body = text
+        if m:
+            front, body = m.groups()
+            for line in front.splitlines():
+                if ":" in line:
+                    k, v = line.split(":", 1)
+                    meta[k.strip()] = v.strip()
+        return meta, body
+
     @staticmethod
     def importFromDir() -> bool:
-        dirPath = Path(PAGEDIR)
-        if not dirPath.exists():
-            print("[Import] Directory does not exist:", dirPath)
+        store = getStore()
+        if not store.exists():
+            print("[Import] Content store does not exist:", store.root)
             return False
 
-        fmRegex = re.compile(r"^---\s*(.*?)---\s*(.*)$", re.DOTALL)
+        with profiling.job("import"):
+            return ReadsAPI._importFromDir(store)
 
+    @staticmethod
+    def _importFromDir(store) -> bool:
         connection = DButils.connect()
-        for file in dirPath.rglob("*.md"):
-            text = file.read_text(encoding="utf-8")
-            meta = {"uuid": file.stem, "title": file.stem, "creator": "imported", "type": "article", "date": datetime.now(timezone.utc).isoformat()}
-            
-            m = fmRegex.match(text)
-            body = text
-            if m:
-                front, body = m.groups()
-                for line in front.splitlines():
-                    if ":" in line:
-                        k, v = line.split(":", 1)
-                        meta[k.strip()] = v.strip()
-            
+        changed = []
+        for fileUid, text, fileDay in tracing.spanned(store.changed(connection), "store.read", "io"):
+            meta, body = ReadsAPI.parseFront(text, fileUid)
+            changed.append(meta["uuid"])
+
             preview = text_snippet(body, 180)
             now = datetime.now(timezone.utc)
+            # parsed here once; requests only ever see created_ts / created_utc
+            if parseDate(meta["date"]) is not None:
+                createdTs, createdUtc = normalizeDate(meta["date"])
+            else:
+                # unparseable: keep the stamp of the first import (as migration 9 falls back to
+                # mtime) so the article does not jump to the top of listings on every sync
+                row = connection.execute(
+                    "SELECT created_ts, created_utc FROM reads WHERE uuid = ?", (meta["uuid"],)
+                ).fetchone()
+                if row and row[0] is not None:
+                    createdTs, createdUtc = row[0], row[1]
+                else:
+                    createdTs, createdUtc = normalizeDate(None, now)
+            # where the body is filed; reads use this instead of re-reading the created text
+            createdDay = fileDay or storeDay(meta["date"], createdTs)
 
             connection.execute(
+                # upsert rather than OR REPLACE: REPLACE deletes without firing the reads_stats triggers
                 """
-                INSERT OR REPLACE INTO reads
-                (uuid, title, creator, created, type, preview, mtime)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO reads
+                (uuid, title, creator, created, created_ts, created_utc, created_day, type, preview, mtime)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (uuid) DO UPDATE SET
+                    title = excluded.title, creator = excluded.creator, created = excluded.created,
+                    created_ts = excluded.created_ts, created_utc = excluded.created_utc,
+                    created_day = excluded.created_day,
+                    type = excluded.type, preview = excluded.preview, mtime = excluded.mtime
                 """,
-                [meta["uuid"], meta["title"], meta["creator"], meta["date"], meta["type"], preview, now.timestamp()],
+                [meta["uuid"], meta["title"], meta["creator"], meta["date"], createdTs, createdUtc, createdDay,
+                 meta["type"], preview, now.timestamp()],
             )
         connection.commit()
-        print(f"Imported: {connection.total_changes}")
+        # total_changes would also count the reads_stats trigger writes
+        print(f"Imported: {len(changed)}")
+        ReadsAPI._changed(changed)
         return True
 
     @staticmethod
-    @lru_cache(maxsize=512)
-
     def read(uuid: str) -> Optional[Dict[str, Any]]: # complete
+        ReadsAPI.generation()  # drops the cache if another worker changed reads
+        cached = _readCache.get(uuid)
+        if cached is not None:
+            return cached
+        return _flights.do(("read", uuid), lambda: ReadsAPI._loadRead(uuid))
+
+    @staticmethod
+    def _loadRead(uuid: str) -> Optional[Dict[str, Any]]:
         connection = DButils.connect()
         cursor = connection.execute(
             "SELECT * FROM reads WHERE uuid = ?",
@@ -236,20 +502,79 @@ class ReadsAPI: # complete
         )
         row = cursor.fetchone()
         if row:
-            md_path = Path(PAGEDIR) / datetime.fromisoformat(row['created'].replace("\'","")).strftime("%Y/%m/%d") / f"{uuid}.md"
-            if md_path.exists():
-                content = md_path.read_text(encoding="utf-8")
-            else:
-                content = row.get('preview', '')
-            return {**dict(row), "content": content}
+            with tracing.span("store.get", "io", uuid=uuid):
+                try:
+                    content = getStore().get(connection, uuid, row['created_day'])
+                except ValueError:
+                    # no day to locate the body by (as in related._refreshTerms): show the preview
+                    content = None
+            if content is None:
+                content = row['preview'] or ''
+            article = {**dict(row), "content": content}
+            _readCache.set(uuid, article)
+            return article
         return None
 
+    @staticmethod
+    def suggest(query: str, limit: int = 8) -> List[Dict[str, Any]]: # complete
+        """Title/creator typeahead served from memory, newest first."""
+        ReadsAPI.generation()  # marks the index unbuilt if another worker changed reads
+        index = getSuggest()
+        if not index.built:
+            with index.lock:
+                if not index.built:
+                    rows = DButils.connect().execute("SELECT uuid, title, creator, created_utc, created_ts FROM reads").fetchall()
+                    index.build(dict(row) for row in rows)
+        return index.query(query, limit)
+
+    @staticmethod
+    def related(uuid: str, limit: Optional[int] = None) -> List[Dict[str, Any]]: # complete
+        """Precomputed nearest articles, one indexed query."""
+        return getRelated().lookup(DButils.connect(), uuid, limit)
+
+    @staticmethod
+    def _refreshRelated(uuids: List[str]) -> None:
+        getRelated().update(DButils.connect(), uuids)
+
+    @staticmethod
+    def _refreshSuggest(uuids: List[str]) -> None:
+        index = getSuggest()
+        if not index.built:
+            return
+        connection = DButils.connect()
+        for i in range(0, len(uuids), 500):
+            chunk = uuids[i:i + 500]
+            rows = connection.execute(
+                f"SELECT uuid, title, creator, created_utc, created_ts FROM reads WHERE uuid IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found = {row["uuid"]: dict(row) for row in rows}
+            for uid in chunk:
+                if uid in found:
+                    index.upsert(found[uid])
+                else:
+                    index.remove(uid)
+
     @staticmethod
     def clearCache() -> None: # unused
-        if hasattr(ReadsAPI, '_cache'):
-            ReadsAPI._cache.clear() # type: ignore
+        _listCache.clear()
+        _readCache.clear()
         print("Cache cleared.")
 
+    @staticmethod
+    def cacheStats() -> Dict[str, Any]:
+        index = _state.metaIndex
+        meta = {"generation": index.generation, "records": len(index), "bytes": sizeOf(index)} if index else None
+        return {"read": _readCache.stats(), "lists": _listCache.stats(), "flights": _flights.stats(), "meta": meta}
+
+    @staticmethod
+    def cacheKeys(limit: Optional[int] = None) -> List[str]:
+        """Uuids in the read cache, hottest first."""
+        return _readCache.keys(limit)
+
+ReadsAPI.subscribe(ReadsAPI._refreshSuggest)
+ReadsAPI.subscribe(ReadsAPI._refreshRelated)
+ReadsAPI.subscribe(ReadsAPI._rebuildMeta)
+
 class UserAPI: # complete
     @staticmethod
     def _hashPassword(password: str) -> str: # complete
@@ -257,19 +582,20 @@ class UserAPI: # complete
 
     @staticmethod
     def _loadJSON() -> Dict[str, Dict[str, Any]]: # complete
-        if not LOGINJSON.exists():
+        path = sites.current().loginJSON
+        if not path.exists():
             return {}
         try:
-            with LOGINJSON.open("r", encoding="utf-8") as f:
+            with path.open("r", encoding="utf-8") as f:
                 return json.load(f)
         except Exception:
             return {}
 
     @staticmethod
     def _writeJSON(allUsers: Dict[str, Dict[str, Any]]) -> None: # complete
-        LOGINJSON.parent.mkdir(exist_ok=True)
-        with LOGINJSON.open("w", encoding="utf-8") as f:
-            json.dump(allUsers, f, indent=2)
+        path = sites.current().loginJSON
+        path.parent.mkdir(exist_ok=True)
+        atomicWrite(path, json.dumps(allUsers, indent=2))
 
     @staticmethod
     def add(username: str, password: str, role: str = "user") -> str: # complete
@@ -277,10 +603,7 @@ class UserAPI: # complete
         hashed = UserAPI._hashPassword(password)
 
         # DB insert
-        conn = sqlite3.connect(DB_FILE)
-        conn.execute(
-            "CREATE TABLE IF NOT EXISTS users (id TEXT PRIMARY KEY, username TEXT UNIQUE, password TEXT, role TEXT)"
-        )
+        conn = sqlite3.connect(sites.current().dbFile)
         conn.execute(
             "INSERT INTO users (id, username, password, role) VALUES (?, ?, ?, ?)",
             (uid, username, hashed, role)
@@ -296,7 +619,7 @@ class UserAPI: # complete
 
     @staticmethod
     def log(username: str, password: str) -> bool: # complete
-        conn = sqlite3.connect(DB_FILE)
+        conn = sqlite3.connect(sites.current().dbFile)
         cursor = conn.execute("SELECT password FROM users WHERE username = ?", (username,))
         row = cursor.fetchone()
         return bool(row and UserAPI._hashPassword(password) == row[0])
@@ -313,7 +636,7 @@ class UserAPI: # complete
 
     @staticmethod
     def update(userId: str, username = None, password= None, role = None) -> bool: # complete
-        conn = sqlite3.connect(DB_FILE)
+        conn = sqlite3.connect(sites.current().dbFile)
         fields, values = [], []
 
         if username:
@@ -348,7 +671,7 @@ class UserAPI: # complete
 
     @staticmethod
     def delete(userId: str) -> bool: # complete
-        conn = sqlite3.connect(DB_FILE)
+        conn = sqlite3.connect(sites.current().dbFile)
         cursor = conn.execute("DELETE FROM users WHERE id = ?", (userId,))
         conn.commit()
 
@@ -374,55 +697,40 @@ class UserAPI: # complete
     @staticmethod
     def sync(): # complete
         """
-        Synchronize DB and JSON.
-        Updates older data with newer data; does not delete anything.
+        Synchronize DB and JSON through the changelog: only users changed on
+        either side since the last sync are touched. Newer data wins; users
+        deleted in the DB are dropped from the JSON mirror.
         """
-        allUsersJSON = UserAPI._loadJSON()
-
-        # Load DB users
-        conn = sqlite3.connect(DB_FILE)
-        conn.execute("CREATE TABLE IF NOT EXISTS users (id TEXT PRIMARY KEY, username TEXT UNIQUE, password TEXT, role TEXT)")
-        cursor = conn.execute("SELECT id, username, password, role, rowid FROM users")
-        dbUsers = {row[0]: {"id": row[0], "username": row[1], "password": row[2], "role": row[3], "db_rowid": row[4]} for row in cursor.fetchall()}
-
-        # JSON -> DB
-        for uid, jData in allUsersJSON.items():
-            dbData = dbUsers.get(uid)
-            jsonTime = jData.get("_mtime", 0)
-            dbTime = dbData.get("db_rowid", 0) if dbData else 0
-            if not dbData:
-                conn = sqlite3.connect(DB_FILE)
-                conn.execute(
-                    "INSERT INTO users (id, username, password, role) VALUES (?, ?, ?, ?)",
-                    (uid, jData["username"], jData["password"], jData["role"])
-                )
-                conn.commit()
-            elif jsonTime > dbTime:
-                conn = sqlite3.connect(DB_FILE)
-                conn.execute(
-                    "UPDATE users SET username=?, password=?, role=? WHERE id=?",
-                    (jData["username"], jData["password"], jData["role"], uid)
-                )
-                conn.commit()
+        conn = sqlite3.connect(sites.current().dbFile, timeout=30)
+        try:
+            applied, changed = deltaSync(
+                conn, "users", ("username", "password", "role"),
+                load=UserAPI._loadJSON,
+                write=UserAPI._writeJSON,
+                stamp=UserAPI._jsonStamp,
+                toRow=lambda rec: (rec.get("username"), rec.get("password"), rec.get("role", "user")),
+                toRecord=lambda row, at: {"id": row[0], "username": row[1], "password": row[2], "role": row[3], "_mtime": at},
+            )
+        finally:
+            conn.close()
+        print(f"Imported: {applied + len(changed)}")
 
-        # DB -> JSON
-        for uid, dbData in dbUsers.items():
-            jData = allUsersJSON.get(uid)
-            dbTime = time.time()
-            jsonTime = jData.get("_mtime", 0) if jData else 0
-            if not jData or dbTime > jsonTime:
-                allUsersJSON[uid] = {"id": dbData["id"], "username": dbData["username"], "password": dbData["password"], "role": dbData["role"], "_mtime": time.time()}
-        
-        print(f"Imported: {conn.total_changes}")
-        UserAPI._writeJSON(allUsersJSON)
+    @staticmethod
+    def _jsonStamp() -> Optional[tuple]:
+        try:
+            st = sites.current().loginJSON.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
 
 class TeacherAPI: # complete
     @staticmethod
     def _load_json() -> Dict[str, Dict[str, Any]]: # complete
-        if not TEACHERJSON.exists():
+        path = sites.current().teacherJSON
+        if not path.exists():
             return {}
         try:
-            with TEACHERJSON.open("r", encoding="utf-8") as f:
+            with path.open("r", encoding="utf-8") as f:
                 data = json.load(f)
                 if isinstance(data, dict):
                     return data
@@ -432,9 +740,37 @@ class TeacherAPI: # complete
 
     @staticmethod
     def _write_json(all_teachers: Dict[str, Dict[str, Any]]) -> None: # complete
-        TEACHERJSON.parent.mkdir(parents=True, exist_ok=True)
-        with TEACHERJSON.open("w", encoding="utf-8") as f:
-            json.dump(all_teachers, f, indent=2, ensure_ascii=False)
+        path = sites.current().teacherJSON
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomicWrite(path, json.dumps(all_teachers, indent=2, ensure_ascii=False))
+        # callers patch the index themselves, so it now matches the file on disk
+        _state.teacherStamp = TeacherAPI._json_stamp()
+
+    @staticmethod
+    def _json_stamp() -> Optional[tuple]:
+        try:
+            st = sites.current().teacherJSON.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def _index() -> TextIndex:
+        """Search index over teachers.json, rebuilt only when the file changed behind our back."""
+        stamp = TeacherAPI._json_stamp()
+        index = _teacherIndex.instance()
+        with index.lock:
+            if stamp != _state.teacherStamp:
+                index.clear()
+                for tid, t in TeacherAPI._load_json().items():
+                    if isinstance(t, dict):
+                        index.add(tid, t, float(t.get("_mtime", 0) or 0))
+                _state.teacherStamp = stamp
+        return index
+
+    @staticmethod
+    def _index_put(tid: str, record: Dict[str, Any]) -> None:
+        _teacherIndex.add(tid, dict(record), float(record.get("_mtime", 0) or 0))
 
     @staticmethod
     def _preview_text(text: Optional[str], words: int = PREVIEWWORD) -> str: # complete
@@ -445,9 +781,10 @@ class TeacherAPI: # complete
 
     @staticmethod
     def add(name: str, subject: str = "", bio: str = "", role: str = "teacher") -> str: # complete
+        TeacherAPI._index()
         tid = str(uuid.uuid4())
         mtime = time.time()
-        conn = sqlite3.connect(DB_FILE)
+        conn = sqlite3.connect(sites.current().dbFile)
         conn.execute(
             "INSERT INTO teachers (id, name, subject, bio, role, mtime) VALUES (?, ?, ?, ?, ?, ?)",
             (tid, name, subject, bio, role, mtime),
@@ -464,18 +801,18 @@ class TeacherAPI: # complete
             "_mtime": mtime,
         }
         TeacherAPI._write_json(all_teachers)
+        TeacherAPI._index_put(tid, all_teachers[tid])
 
         return tid
 
     @staticmethod
     def get(teacherId: str) -> Optional[Dict[str, Any]]: # complete
-        all_teachers = TeacherAPI._load_json()
-        t = all_teachers.get(teacherId)
+        t = TeacherAPI._index().records.get(teacherId)
         if t:
-            return t
+            return dict(t)
 
 
-        conn = sqlite3.connect(DB_FILE)
+        conn = sqlite3.connect(sites.current().dbFile)
         cursor = conn.execute(
             "SELECT id, name, subject, bio, role, mtime FROM teachers WHERE id = ?",
             (teacherId,),
@@ -494,16 +831,15 @@ class TeacherAPI: # complete
 
     @staticmethod
     def list(offset: int = 0, limit: int = 10) -> List[Dict[str, Any]]: # complete
-        all_teachers = list(TeacherAPI._load_json().values())
-        all_teachers.sort(key=lambda x: x.get("_mtime", 0), reverse=True)
-        return all_teachers[offset : offset + limit]
+        index = TeacherAPI._index()
+        return [dict(index.records[tid]) for tid in index.ordered()[offset : offset + limit]]
 
     @staticmethod
     def update(teacherId: str, name: Optional[str] = None, subject: Optional[str] = None, bio: Optional[str] = None, role: Optional[str] = None) -> bool: # complete
         if name is None and subject is None and bio is None and role is None:
             return False
 
-
+        TeacherAPI._index()
         fields = []
         values = []
         if name is not None:
@@ -524,7 +860,7 @@ class TeacherAPI: # complete
         values.append(mtime)
 
         values.append(teacherId)
-        conn = sqlite3.connect(DB_FILE)
+        conn = sqlite3.connect(sites.current().dbFile)
         conn.execute(f"UPDATE teachers SET {', '.join(fields)} WHERE id = ?", values)
         conn.commit()
 
@@ -540,19 +876,21 @@ class TeacherAPI: # complete
                 all_teachers[teacherId]["role"] = role
             all_teachers[teacherId]["_mtime"] = mtime
             TeacherAPI._write_json(all_teachers)
+            TeacherAPI._index_put(teacherId, all_teachers[teacherId])
         else:
             row = TeacherAPI.get(teacherId)
             if row:
                 row["_mtime"] = mtime
                 all_teachers[teacherId] = row
                 TeacherAPI._write_json(all_teachers)
+                TeacherAPI._index_put(teacherId, row)
 
         return True
 
     @staticmethod
     def delete(teacherId: str) -> bool: # complete
-
-        conn = sqlite3.connect(DB_FILE)
+        TeacherAPI._index()
+        conn = sqlite3.connect(sites.current().dbFile)
         cursor = conn.execute("DELETE FROM teachers WHERE id = ?", (teacherId,))
         conn.commit()
 
@@ -560,34 +898,32 @@ class TeacherAPI: # complete
         removed = all_teachers.pop(teacherId, None)
         if removed is not None:
             TeacherAPI._write_json(all_teachers)
+            _teacherIndex.remove(teacherId)
         return cursor.rowcount > 0
 
     @staticmethod
     def search(query: str, offset: int = 0, limit: int = 10) -> List[Dict[str, Any]]: # complete
-        q = (query or "").strip().lower()
+        q = (query or "").strip()
         if not q:
             return TeacherAPI.list(offset=offset, limit=limit)
-        results = []
-        for t in TeacherAPI._load_json().values():
-            if (
-                q in (t.get("name") or "").lower()
-                or q in (t.get("subject") or "").lower()
-                or q in (t.get("bio") or "").lower()
-                or q in (t.get("role") or "").lower()
-            ):
-                results.append(t)
-        results.sort(key=lambda x: x.get("_mtime", 0), reverse=True)
-        return results[offset : offset + limit]
+        index = TeacherAPI._index()
+        return [dict(index.records[tid]) for tid in index.search(q)[offset : offset + limit]]
+
+    @staticmethod
+    def suggest(prefix: str, limit: int = 8) -> List[Dict[str, Any]]: # complete
+        """Typeahead over teacher words, best field (name > subject > role > bio) first."""
+        index = TeacherAPI._index()
+        out = []
+        for tid, score in index.complete(prefix, limit):
+            t = index.records[tid]
+            out.append({"id": tid, "name": t.get("name", ""), "subject": t.get("subject", ""), "role": t.get("role", ""), "score": score})
+        return out
 
     @staticmethod
     def exists_by_name(name: str) -> bool: # complete
         if not name:
             return False
-        name_l = name.lower()
-        for t in TeacherAPI._load_json().values():
-            if (t.get("name") or "").lower() == name_l:
-                return True
-        return False
+        return bool(TeacherAPI._index().exact("name", name))
 
     @staticmethod
     def preview(teacherId: str) -> Optional[Dict[str, Any]]: # complete
@@ -608,7 +944,7 @@ class TeacherAPI: # complete
         Import teachers from a JSON file (single-file layout described above).
         Returns number of imported/merged records.
         """
-        src = Path(file_path) if file_path else TEACHERJSON
+        src = Path(file_path) if file_path else sites.current().teacherJSON
         if not src.exists():
             return 0
         try:
@@ -619,10 +955,11 @@ class TeacherAPI: # complete
         except Exception:
             return 0
 
+        TeacherAPI._index()
         all_main = TeacherAPI._load_json()
         imported = 0
 
-        conn = sqlite3.connect(DB_FILE)
+        conn = sqlite3.connect(sites.current().dbFile)
         for tid, rec in data.items():
             if not isinstance(rec, dict):
                 continue
@@ -649,11 +986,14 @@ class TeacherAPI: # complete
             imported += 1
         conn.commit()
         TeacherAPI._write_json(all_main)
+        for tid in data:
+            if tid in all_main:
+                TeacherAPI._index_put(tid, all_main[tid])
         return imported
 
     @staticmethod
     def export_to_json(file_path: Optional[Path] = None) -> Path: # complete
-        dst = Path(file_path) if file_path else TEACHERJSON.parent / "teachers_export.json"
+        dst = Path(file_path) if file_path else sites.current().teacherJSON.parent / "teachers_export.json"
         all_teachers = TeacherAPI._load_json()
         dst.parent.mkdir(parents=True, exist_ok=True)
         with dst.open("w", encoding="utf-8") as f:
@@ -662,52 +1002,23 @@ class TeacherAPI: # complete
 
     @staticmethod
     def sync() -> None: # complete
-
-        all_json = TeacherAPI._load_json()
-
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.execute("SELECT id, name, subject, bio, role, mtime FROM teachers")
-        db_map: Dict[str, Dict[str, Any]] = {}
-        for row in cursor.fetchall():
-            db_map[row[0]] = {
-                "id": row[0],
-                "name": row[1],
-                "subject": row[2],
-                "bio": row[3],
-                "role": row[4],
-                "mtime": row[5] or 0,
-            }
-
-        conn = sqlite3.connect(DB_FILE)
-        for tid, jrec in all_json.items():
-            j_mtime = float(jrec.get("_mtime", 0))
-            dbrec = db_map.get(tid)
-            if not dbrec:
-                conn.execute(
-                    "INSERT OR IGNORE INTO teachers (id, name, subject, bio, role, mtime) VALUES (?, ?, ?, ?, ?, ?)",
-                    (tid, jrec.get("name", ""), jrec.get("subject", ""), jrec.get("bio", ""), jrec.get("role", "teacher"), j_mtime),
-                )
-            elif j_mtime > (dbrec.get("mtime", 0) or 0):
-                conn.execute(
-                    "UPDATE teachers SET name=?, subject=?, bio=?, role=?, mtime=? WHERE id=?",
-                    (jrec.get("name", ""), jrec.get("subject", ""), jrec.get("bio", ""), jrec.get("role", "teacher"), j_mtime, tid),
-                )
-        conn.commit()
-
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.execute("SELECT id, name, subject, bio, role, mtime FROM teachers")
-        for row in cursor.fetchall():
-            tid = row[0]
-            db_mtime = float(row[5] or 0)
-            jrec = all_json.get(tid)
-            if not jrec or db_mtime > float(jrec.get("_mtime", 0)):
-                all_json[tid] = {
-                    "id": tid,
-                    "name": row[1],
-                    "subject": row[2],
-                    "bio": row[3],
-                    "role": row[4],
-                    "_mtime": db_mtime if db_mtime > 0 else time.time(),
-                }
-        print(f"Imported: {conn.total_changes}")
-        TeacherAPI._write_json(all_json)
\ No newline at end of file
+        """Changelog-driven sync of teachers with teachers.json; see UserAPI.sync."""
+        TeacherAPI._index()
+        conn = sqlite3.connect(sites.current().dbFile, timeout=30)
+        try:
+            applied, changed = deltaSync(
+                conn, "teachers", ("name", "subject", "bio", "role", "mtime"),
+                load=TeacherAPI._load_json,
+                write=TeacherAPI._write_json,
+                stamp=TeacherAPI._json_stamp,
+                toRow=lambda rec: (rec.get("name", ""), rec.get("subject", ""), rec.get("bio", ""), rec.get("role", "teacher"), float(rec.get("_mtime", 0) or 0)),
+                toRecord=lambda row, at: {"id": row[0], "name": row[1], "subject": row[2], "bio": row[3], "role": row[4], "_mtime": float(row[5] or at)},
+            )
+        finally:
+            conn.close()
+        for tid, rec in changed.items():
+            if rec is None:
+                _teacherIndex.remove(tid)
+            else:
+                TeacherAPI._index_put(tid, rec)
+        print(f"Imported: {applied + len(changed)}")
@@ -0,0 +1,107 @@
+import sqlite3
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+# Seconds since the epoch as REAL, usable inside triggers (unixepoch('subsec') needs SQLite 3.42)
+NOW_SQL = "((julianday('now') - 2440587.5) * 86400.0)"
+
+Record = Dict[str, Any]
+
+
+def _same(a: Optional[Record], b: Optional[Record]) -> bool:
+    if a is None or b is None:
+        return a is b
+    strip = lambda r: {k: v for k, v in r.items() if k != "_mtime"}
+    return strip(a) == strip(b)
+
+
+def deltaSync(
+    connection: sqlite3.Connection,
+    table: str,
+    columns: Sequence[str],
+    load: Callable[[], Dict[str, Record]],
+    write: Callable[[Dict[str, Record]], None],
+    stamp: Callable[[], Optional[tuple]],
+    toRow: Callable[[Record], Tuple[Any, ...]],
+    toRecord: Callable[[sqlite3.Row, float], Record],
+) -> Tuple[int, Dict[str, Optional[Record]]]:
+    """
+    Two-way sync between `table` and its JSON mirror, driven by the changelog.
+
+    DB side: only keys logged by the changelog triggers since this table's
+    cursor are read back. JSON side: the file is only parsed when its stamp
+    moved (or DB rows need mirroring), and only records newer than the last
+    sync are upserted. On a conflict the newer timestamp wins. Everything runs
+    in one transaction; the JSON file is rewritten only when a record differs.
+
+    Returns (rows written to the DB, {key: new JSON record or None if removed}).
+    """
+    current = stamp()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        row = connection.execute("SELECT seq, stamp, synced FROM sync_cursor WHERE name = ?", (table,)).fetchone()
+        seq, lastStamp, synced = row if row else (0, None, 0.0)
+        pending: Dict[str, float] = dict(connection.execute(
+            "SELECT key, MAX(at) FROM changelog WHERE tbl = ? AND seq > ? GROUP BY key", (table, seq)
+        ).fetchall())
+        jsonMoved = str(current) != lastStamp
+        if not pending and not jsonMoved:
+            connection.rollback()
+            return 0, {}
+
+        data = load()
+        applied = 0
+        if jsonMoved:
+            cols = ", ".join(columns)
+            marks = ", ".join("?" * (len(columns) + 1))
+            sets = ", ".join(f"{c} = excluded.{c}" for c in columns)
+            differs = " OR ".join(f"{table}.{c} IS NOT excluded.{c}" for c in columns)
+            sql = (
+                f"INSERT INTO {table} (id, {cols}) VALUES ({marks}) "
+                f"ON CONFLICT(id) DO UPDATE SET {sets} WHERE {differs}"
+            )
+            for key, rec in data.items():
+                if not isinstance(rec, dict):
+                    continue
+                at = float(rec.get("_mtime", 0) or 0)
+                if at and at <= synced:
+                    continue
+                if pending.get(key, -1.0) >= at:
+                    # changed in the DB after this JSON edit; the DB copy wins below
+                    continue
+                try:
+                    applied += connection.execute(sql, (key, *toRow(rec))).rowcount
+                except sqlite3.IntegrityError as e:
+                    print(f"[Sync] {table} {key} skipped: {e}")
+
+        changed: Dict[str, Optional[Record]] = {}
+        keys = list(pending)
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            found = {}
+            for r in connection.execute(
+                f"SELECT id, {', '.join(columns)} FROM {table} WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ):
+                found[r[0]] = r
+            for key in chunk:
+                rec = toRecord(found[key], pending[key]) if key in found else None
+                if not _same(rec, data.get(key)):
+                    if rec is None:
+                        data.pop(key, None)
+                    else:
+                        data[key] = rec
+                    changed[key] = rec
+
+        if changed:
+            write(data)
+            current = stamp()
+        top = connection.execute("SELECT MAX(seq) FROM changelog WHERE tbl = ?", (table,)).fetchone()[0] or seq
+        connection.execute(
+            f"INSERT OR REPLACE INTO sync_cursor (name, seq, stamp, synced) VALUES (?, ?, ?, {NOW_SQL})",
+            (table, top, str(current)),
+        )
+        connection.execute("DELETE FROM changelog WHERE tbl = ? AND seq <= ?", (table, top))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    return applied, changed
@@ -0,0 +1,193 @@
+import hashlib
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from flask import url_for
+
+from bytecache import ByteLRU
+from config import FEED_ITEMS, FEEDCACHE_BYTES, SITEMAP_SHARD_SIZE
+from dbapi import DButils, ReadsAPI
+import sites
+
+SITE_TITLE = "SMAN 2 Cikarang Pusat"
+SITE_DESC = "Berita, pengumuman, dan artikel SMAN 2 Cikarang Pusat"
+
+feedCache = sites.local(lambda site: ByteLRU(site.budget(FEEDCACHE_BYTES), name="feeds"))
+
+_lock = threading.Lock()
+# per site: (generation, per-shard signatures of the created-ordered reads index)
+_shards = sites.local(lambda site: sites.State(value=(-1, [])))
+
+
+def _date(ts: Optional[int]) -> Optional[datetime]:
+    return datetime.fromtimestamp(ts, timezone.utc) if ts is not None else None
+
+
+def _link(uid: str) -> str:
+    return url_for("site.read", uuid=uid.replace("-", ""), _external=True)
+
+
+def etagOf(body: bytes) -> str:
+    return hashlib.sha1(body).hexdigest()
+
+
+# --- feeds ---
+
+def _latest() -> List[Dict[str, Any]]:
+    rows = DButils.connect().execute(
+        "SELECT uuid, title, creator, created_ts, preview FROM reads ORDER BY created_ts DESC, uuid DESC LIMIT ?", (FEED_ITEMS,)
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def rss(host: str) -> bytes:
+    key = ("rss", host, ReadsAPI.generation())
+    body = feedCache.get(key)
+    if body is not None:
+        return body
+    items = []
+    for r in _latest():
+        dt = _date(r["created_ts"])
+        items.append(
+            "<item>"
+            f"<title>{escape(r['title'] or '')}</title>"
+            f"<link>{escape(_link(r['uuid']))}</link>"
+            f"<guid isPermaLink=\"false\">{escape(r['uuid'])}</guid>"
+            f"<author>{escape(r['creator'] or '')}</author>"
+            + (f"<pubDate>{dt.strftime('%a, %d %b %Y %H:%M:%S %z')}</pubDate>" if dt else "")
+            + f"<description>{escape(r['preview'] or '')}</description>"
+            "</item>"
+        )
+    body = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0"><channel>'
+        f"<title>{escape(SITE_TITLE)}</title>"
+        f"<link>{escape(url_for('site.home', _external=True))}</link>"
+        f"<description>{escape(SITE_DESC)}</description>"
+        + "".join(items)
+        + "</channel></rss>\n"
+    ).encode("utf-8")
+    feedCache.set(key, body)
+    return body
+
+
+def atom(host: str) -> bytes:
+    key = ("atom", host, ReadsAPI.generation())
+    body = feedCache.get(key)
+    if body is not None:
+        return body
+    rows = _latest()
+    dates = [d for d in (_date(r["created_ts"]) for r in rows) if d]
+    updated = max(dates) if dates else datetime.now(timezone.utc)
+    entries = []
+    for r in rows:
+        dt = _date(r["created_ts"]) or updated
+        entries.append(
+            "<entry>"
+            f"<title>{escape(r['title'] or '')}</title>"
+            f"<link href=\"{escape(_link(r['uuid']))}\"/>"
+            f"<id>urn:uuid:{escape(r['uuid'])}</id>"
+            f"<updated>{dt.isoformat()}</updated>"
+            f"<author><name>{escape(r['creator'] or '')}</name></author>"
+            f"<summary>{escape(r['preview'] or '')}</summary>"
+            "</entry>"
+        )
+    body = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom">'
+        f"<title>{escape(SITE_TITLE)}</title>"
+        f"<link href=\"{escape(url_for('site.home', _external=True))}\"/>"
+        f"<link rel=\"self\" href=\"{escape(url_for('site.atom', _external=True))}\"/>"
+        f"<id>{escape(url_for('site.home', _external=True))}</id>"
+        f"<updated>{updated.isoformat()}</updated>"
+        + "".join(entries)
+        + "</feed>\n"
+    ).encode("utf-8")
+    feedCache.set(key, body)
+    return body
+
+
+# --- sitemaps ---
+
+def shards() -> List[str]:
+    """
+    Signature per sitemap shard (SITEMAP_SHARD_SIZE reads each, oldest first).
+    Recomputed once per content generation from a two-column scan; a shard is
+    regenerated only when its signature differs from the cached body's.
+    """
+    gen = ReadsAPI.generation()
+    state = _shards.instance()
+    if state.value[0] == gen:
+        return state.value[1]
+    with _lock:
+        if state.value[0] == gen:
+            return state.value[1]
+        sigs: List[str] = []
+        h = hashlib.sha1()
+        count = 0
+        cursor = DButils.connect().execute("SELECT uuid, created_utc FROM reads ORDER BY created_ts, uuid")
+        for uid, created in cursor:
+            h.update(f"{uid}\0{created}\n".encode("utf-8"))
+            count += 1
+            if count % SITEMAP_SHARD_SIZE == 0:
+                sigs.append(h.hexdigest())
+                h = hashlib.sha1()
+        if count % SITEMAP_SHARD_SIZE or not sigs:
+            sigs.append(h.hexdigest())
+        state.value = (gen, sigs)
+        return sigs
+
+
+def sitemapIndex(host: str) -> bytes:
+    sigs = shards()
+    key = ("sitemapindex", host, tuple(sigs))
+    body = feedCache.get(key)
+    if body is not None:
+        return body
+    parts = "".join(
+        f"<sitemap><loc>{escape(url_for('site.sitemapShard', n=i, _external=True))}</loc></sitemap>"
+        for i in range(len(sigs))
+    )
+    body = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        + parts + "</sitemapindex>\n"
+    ).encode("utf-8")
+    feedCache.set(key, body)
+    return body
+
+
+def shardKey(host: str, n: int, sig: str) -> Tuple[str, str, int, str]:
+    return ("sitemap", host, n, sig)
+
+
+def streamShard(host: str, n: int, sig: str) -> Iterator[bytes]:
+    """Yield shard n in chunks, caching the full body once the stream completes."""
+    rows = DButils.connect().execute(
+        "SELECT uuid, created_utc FROM reads ORDER BY created_ts, uuid LIMIT ? OFFSET ?",
+        (SITEMAP_SHARD_SIZE, n * SITEMAP_SHARD_SIZE),
+    ).fetchall()
+    chunks = [b'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    yield chunks[0]
+    batch = []
+    for i, (uid, created) in enumerate(rows, 1):
+        batch.append(
+            f"<url><loc>{escape(_link(uid))}</loc>"
+            + (f"<lastmod>{created[:10]}</lastmod>" if created else "")
+            + "</url>"
+        )
+        if i % 500 == 0:
+            chunk = "".join(batch).encode("utf-8")
+            chunks.append(chunk)
+            yield chunk
+            batch = []
+    tail = ("".join(batch) + "</urlset>\n").encode("utf-8")
+    chunks.append(tail)
+    yield tail
+    feedCache.set(shardKey(host, n, sig), b"".join(chunks))
+
+
+def stats() -> Dict[str, Any]:
+    return feedCache.stats()
@@ -0,0 +1,253 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from flask import request
+
+from config import (MAINT_TICK_SECONDS, MAINT_IDLE_SECONDS, WAL_PASSIVE_BYTES,
+                    WAL_TRUNCATE_BYTES, OPTIMIZE_EVERY_SECONDS, VACUUM_FREE_RATIO, VACUUM_MIN_FREE_PAGES,
+                    VACUUM_STEP_PAGES, MAINT_HISTORY_KEEP)
+import backup
+import sites
+
+try:
+    import fcntl
+except ImportError:  # no cross-process lock: every worker may run its own pass
+    fcntl = None
+
+TASKS = ("checkpoint", "optimize", "vacuum", "backup")
+
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def footprint() -> Dict[str, int]:
+    dbFile = sites.current().dbFile
+    return {"db": _size(str(dbFile)), "wal": _size(f"{dbFile}-wal")}
+
+
+class Maintenance:
+    """
+    Background SQLite upkeep for one worker: WAL checkpoints sized by the -wal
+    file, a periodic PRAGMA optimize, incremental vacuum once free pages pass a
+    threshold, and a verified backup every BACKUP_INTERVAL_HOURS. A pass only
+    starts when no request has been in flight for MAINT_IDLE_SECONDS and this
+    worker holds the maintenance lock, so traffic and other workers never wait
+    on it. Every task run is logged to maintenance_log with its duration and
+    the bytes it gave back. A pass visits each site synced so far, one at a time.
+    """
+
+    def __init__(self, tick: float = MAINT_TICK_SECONDS):
+        self.tick = tick
+        self._active = 0
+        self._lastRequest = 0.0
+        self._lock = threading.Lock()
+        self._runLock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid: Optional[int] = None
+        # site name -> last PRAGMA optimize; the first is due OPTIMIZE_EVERY_SECONDS after startup
+        self._lastOptimize: Dict[str, float] = {}
+
+    # --- request tracking ---
+
+    def begin(self) -> None:
+        with self._lock:
+            self._active += 1
+        if self._pid != os.getpid():
+            self._start()
+
+    def end(self) -> None:
+        with self._lock:
+            self._active = max(0, self._active - 1)
+            self._lastRequest = time.time()
+
+    def idle(self) -> bool:
+        with self._lock:
+            return self._active == 0 and time.time() - self._lastRequest >= MAINT_IDLE_SECONDS
+
+    def kick(self) -> None:
+        """Check thresholds on the next idle moment instead of waiting a full tick (e.g. after an import)."""
+        self._wake.set()
+        if self._pid != os.getpid():
+            self._start()
+
+    # --- scheduling ---
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._loop, name="db-maintenance", daemon=True).start()
+
+    def _loop(self) -> None:
+        while True:
+            self._wake.wait(self.tick)
+            self._wake.clear()
+            while not self.idle():
+                time.sleep(MAINT_IDLE_SECONDS)
+            try:
+                self.runDue()
+            except Exception as e:
+                print(f"[Maintenance] pass failed: {e}")
+
+    def due(self, conn: sqlite3.Connection) -> List[str]:
+        tasks = []
+        if footprint()["wal"] >= WAL_PASSIVE_BYTES:
+            tasks.append("checkpoint")
+        if time.time() - self._lastOptimize.setdefault(sites.current().name, time.time()) >= OPTIMIZE_EVERY_SECONDS:
+            tasks.append("optimize")
+        pages = conn.execute("PRAGMA page_count").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if free >= VACUUM_MIN_FREE_PAGES and free >= pages * VACUUM_FREE_RATIO:
+            tasks.append("vacuum")
+        if backup.due():
+            tasks.append("backup")
+        return tasks
+
+    def runDue(self) -> List[Dict[str, Any]]:
+        done = []
+        for site in sites.synced():
+            with sites.using(site), self._exclusive() as conn:
+                if conn is not None:
+                    done.extend(self._run(conn, task) for task in self.due(conn))
+        return done
+
+    def run(self, task: str) -> Optional[Dict[str, Any]]:
+        """Run one task now for the current site (admin endpoint); None if another worker is busy with it."""
+        with self._exclusive() as conn:
+            if conn is None:
+                return None
+            return self._run(conn, task)
+
+    # --- tasks ---
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[Optional[sqlite3.Connection]]:
+        """This worker's run lock plus the site's cross-process lock file; yields None when either is taken."""
+        if not self._runLock.acquire(blocking=False):
+            yield None
+            return
+        site = sites.current()
+        fd = None
+        try:
+            if fcntl is not None:
+                fd = os.open(site.root / "maintenance.lock", os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    yield None
+                    return
+            conn = sqlite3.connect(site.dbFile, timeout=1, isolation_level=None)
+            try:
+                yield conn
+            finally:
+                conn.close()
+        finally:
+            if fd is not None:
+                os.close(fd)  # releases the flock
+            self._runLock.release()
+
+    def _run(self, conn: sqlite3.Connection, task: str) -> Dict[str, Any]:
+        before = footprint()
+        started = time.time()
+        t0 = time.perf_counter()
+        detail = getattr(self, f"_{task}")(conn)
+        duration = time.perf_counter() - t0
+        after = footprint()
+        reclaimed = (before["db"] + before["wal"]) - (after["db"] + after["wal"])
+        entry = {"task": task, "started": started, "duration": round(duration, 4), "reclaimed": reclaimed, "detail": detail}
+        with conn:
+            conn.execute(
+                "INSERT INTO maintenance_log (task, started, duration, reclaimed, detail) VALUES (?, ?, ?, ?, ?)",
+                (task, started, duration, reclaimed, detail),
+            )
+            conn.execute(
+                "DELETE FROM maintenance_log WHERE id <= (SELECT MAX(id) FROM maintenance_log) - ?", (MAINT_HISTORY_KEEP,)
+            )
+        print(f"[Maintenance] {sites.current().name} {task}: {duration:.3f}s, {reclaimed} bytes reclaimed ({detail})")
+        return entry
+
+    def _checkpoint(self, conn: sqlite3.Connection) -> str:
+        # PASSIVE never waits on readers or writers; TRUNCATE (shrinks the file)
+        # only once the WAL is large, and only for as long as busy_timeout allows
+        mode = "TRUNCATE" if footprint()["wal"] >= WAL_TRUNCATE_BYTES else "PASSIVE"
+        busy, log, done = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        return f"{mode.lower()} busy={busy} log={log} checkpointed={done}"
+
+    def _optimize(self, conn: sqlite3.Connection) -> str:
+        self._lastOptimize[sites.current().name] = time.time()
+        conn.execute("PRAGMA analysis_limit = 1000")
+        conn.execute("PRAGMA optimize")
+        return "optimize"
+
+    def _vacuum(self, conn: sqlite3.Connection) -> str:
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # incremental vacuum needs auto_vacuum=INCREMENTAL, which only a full
+            # VACUUM can switch on; done once, after that vacuums are incremental
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            detail = f"full vacuum (auto_vacuum -> incremental), {free} free pages"
+        else:
+            # execute() steps the pragma once (one page); executescript runs it to completion
+            conn.executescript(f"PRAGMA incremental_vacuum({int(VACUUM_STEP_PAGES)});")
+            left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            detail = f"incremental {free - left}/{free} pages"
+        # in WAL mode the file only shrinks once the truncated pages are checkpointed
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        return detail
+
+    def _backup(self, conn: sqlite3.Connection) -> str:
+        path = backup.create()
+        result = backup.verify(path)
+        if not result["ok"]:
+            print(f"[Maintenance] backup {path.name} failed verification: {result['problems']}")
+        return f"{path.name} {'verified' if result['ok'] else 'NOT verified: ' + '; '.join(result['problems'])}"
+
+
+scheduler = Maintenance()
+
+
+def history(connection: sqlite3.Connection, limit: int = 50) -> List[Dict[str, Any]]:
+    try:
+        rows = connection.execute(
+            "SELECT task, started, duration, reclaimed, detail FROM maintenance_log ORDER BY id DESC LIMIT ?", (limit,)
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    return [dict(zip(("task", "started", "duration", "reclaimed", "detail"), row)) for row in rows]
+
+
+def status(connection: sqlite3.Connection) -> Dict[str, Any]:
+    pages = connection.execute("PRAGMA page_count").fetchone()[0]
+    free = connection.execute("PRAGMA freelist_count").fetchone()[0]
+    return {
+        **footprint(),
+        "pages": pages,
+        "freePages": free,
+        "autoVacuum": {0: "none", 1: "full", 2: "incremental"}.get(connection.execute("PRAGMA auto_vacuum").fetchone()[0]),
+        "idle": scheduler.idle(),
+    }
+
+
+def init_app(app) -> None:
+    # a first sync leaves a large WAL and free pages behind
+    sites.onSynced(lambda app, site: scheduler.kick())
+
+    @app.before_request
+    def _maintenanceBegin():
+        if not request.headers.get("X-Warmup"):
+            scheduler.begin()
+
+    @app.teardown_request
+    def _maintenanceEnd(exc=None):
+        if not request.headers.get("X-Warmup"):
+            scheduler.end()
@@ -0,0 +1,212 @@
+"""
+Content-addressed media: uploads are stored once under their SHA-256.
+
+A file lives at <site>/media/ab/cd/<sha256>.<ext> and is served from
+/media/<sha256>.<ext>. The same bytes uploaded again (for another article,
+under another name) land on the same file and the same URL, so they cost no
+disk and stay in browser caches; that URL never changes content, so it is
+served as immutable. Metadata (type, size, dimensions, first name, upload
+count) is kept in the media table.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import struct
+import time
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from config import MEDIA_MAX_BYTES, MEDIA_CHUNK_BYTES
+import sites
+
+# sniffed type -> extension; anything else is refused (no SVG: it can carry script)
+TYPES = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "application/pdf": "pdf",
+}
+EXTENSIONS = {ext: mime for mime, ext in TYPES.items()}
+
+_NAME = re.compile(r"^([0-9a-f]{64})\.([a-z]+)$")
+FIELDS = ("sha256", "type", "ext", "bytes", "width", "height", "name", "uploads", "created", "last_upload")
+
+
+class MediaTooLarge(ValueError):
+    code = 413  # picked up by the generic error handler
+
+
+class MediaRejected(ValueError):
+    code = 415
+
+
+def sniff(head: bytes) -> Optional[str]:
+    """Media type from the first bytes; the client's Content-Type is not trusted."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head.startswith(b"%PDF-"):
+        return "application/pdf"
+    return None
+
+
+def dimensions(path: Path, mime: str) -> Tuple[Optional[int], Optional[int]]:
+    """(width, height) read from the image header, (None, None) if unknown."""
+    try:
+        with open(path, "rb") as f:
+            if mime == "image/png":
+                head = f.read(24)
+                return struct.unpack(">II", head[16:24])
+            if mime == "image/gif":
+                head = f.read(10)
+                return struct.unpack("<HH", head[6:10])
+            if mime == "image/webp":
+                return _webpSize(f.read(30))
+            if mime == "image/jpeg":
+                return _jpegSize(f)
+    except (OSError, struct.error):
+        pass
+    return None, None
+
+
+def _webpSize(head: bytes) -> Tuple[Optional[int], Optional[int]]:
+    chunk = head[12:16]
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+        w, h = struct.unpack("<HH", head[26:30])
+        return w & 0x3FFF, h & 0x3FFF
+    if chunk == b"VP8L" and head[20:21] == b"\x2f":
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    return None, None
+
+
+def _jpegSize(f: BinaryIO) -> Tuple[Optional[int], Optional[int]]:
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None, None
+        kind = marker[1]
+        if kind == 0xFF:  # fill byte
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if kind in (0xD8, 0x01) or 0xD0 <= kind <= 0xD7:  # no length field
+            continue
+        length = struct.unpack(">H", f.read(2))[0]
+        # SOF0..SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= kind <= 0xCF and kind not in (0xC4, 0xC8, 0xCC):
+            h, w = struct.unpack(">xHH", f.read(5))
+            return w, h
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+class MediaStore:
+    """Files under root/ab/cd/<sha256>.<ext>, written once and never modified."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def path(self, digest: str, ext: str) -> Path:
+        return self.root / digest[:2] / digest[2:4] / f"{digest}.{ext}"
+
+    def resolve(self, name: str) -> Optional[Tuple[Path, str]]:
+        """(file, media type) for a served name like '<sha256>.png', None if there is no such file."""
+        m = _NAME.match(name)
+        if not m or m.group(2) not in EXTENSIONS:
+            return None
+        fpath = self.path(m.group(1), m.group(2))
+        if not fpath.is_file():
+            return None
+        return fpath, EXTENSIONS[m.group(2)]
+
+    def save(self, connection: sqlite3.Connection, stream: BinaryIO, name: str = "",
+             maxBytes: int = MEDIA_MAX_BYTES) -> Dict[str, Any]:
+        """
+        Copy `stream` to a temp file MEDIA_CHUNK_BYTES at a time, hashing as it
+        goes, then move it into place unless that content is already stored.
+        Returns the media record plus "duplicate".
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f".upload-{os.getpid()}-{os.urandom(6).hex()}.tmp"
+        h = hashlib.sha256()
+        size = 0
+        head = b""
+        try:
+            with open(tmp, "wb") as out:
+                while True:
+                    chunk = stream.read(MEDIA_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > maxBytes:
+                        raise MediaTooLarge(f"berkas lebih dari {maxBytes} byte")
+                    if len(head) < 32:
+                        head += chunk[:32 - len(head)]
+                    h.update(chunk)
+                    out.write(chunk)
+            mime = sniff(head)
+            if mime is None:
+                raise MediaRejected("jenis berkas tidak didukung")
+            digest, ext = h.hexdigest(), TYPES[mime]
+            final = self.path(digest, ext)
+            duplicate = final.exists()
+            if duplicate:
+                width, height = self._stored(connection, digest) or dimensions(final, mime)
+            else:
+                width, height = dimensions(tmp, mime)
+                final.parent.mkdir(parents=True, exist_ok=True)
+                os.chmod(tmp, 0o644)
+                os.replace(tmp, final)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+        now = time.time()
+        connection.execute(
+            """
+            INSERT INTO media (sha256, type, ext, bytes, width, height, name, uploads, created, last_upload)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?, ?)
+            ON CONFLICT (sha256) DO UPDATE SET uploads = uploads + 1, last_upload = excluded.last_upload
+            """,
+            (digest, mime, ext, size, width, height, name[:200], now, now),
+        )
+        connection.commit()
+        return {**self.get(connection, digest), "duplicate": duplicate}
+
+    @staticmethod
+    def _stored(connection: sqlite3.Connection, digest: str) -> Optional[Tuple[Optional[int], Optional[int]]]:
+        row = connection.execute("SELECT width, height FROM media WHERE sha256 = ?", (digest,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def get(self, connection: sqlite3.Connection, digest: str) -> Optional[Dict[str, Any]]:
+        row = connection.execute(f"SELECT {', '.join(FIELDS)} FROM media WHERE sha256 = ?", (digest,)).fetchone()
+        return _record(row) if row else None
+
+    def listing(self, connection: sqlite3.Connection, offset: int = 0, limit: int = 50) -> Dict[str, Any]:
+        rows = connection.execute(
+            f"SELECT {', '.join(FIELDS)} FROM media ORDER BY created DESC LIMIT ? OFFSET ?", (limit, offset)
+        ).fetchall()
+        total, stored = connection.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM media").fetchone()
+        # bytes the uploads would have taken without deduplication
+        uploaded = connection.execute("SELECT COALESCE(SUM(bytes * uploads), 0) FROM media").fetchone()[0]
+        return {"items": [_record(r) for r in rows], "total": total, "bytes": stored, "uploadedBytes": uploaded}
+
+
+def _record(row) -> Dict[str, Any]:
+    item = dict(zip(FIELDS, row))
+    item["url"] = f"/media/{item['sha256']}.{item['ext']}"
+    return item
+
+
+_media = sites.local(lambda site: MediaStore(site.mediaDir))
+
+def getMedia() -> MediaStore:
+    return _media.instance()
@@ -0,0 +1,109 @@
+import sqlite3
+import sys
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from utils import monthOf
+
+# reads columns a listing item carries, in both the MetaIndex and the SQL path of pageList
+FIELDS = ("uuid", "title", "creator", "created", "created_ts", "created_utc", "type", "preview", "mtime")
+
+
+class Meta:
+    """One reads row as listed on the home page; attribute and item access both work."""
+    __slots__ = ("uuid", "title", "creator", "created", "created_ts", "created_utc", "type", "preview", "mtime", "month")
+
+    def __init__(self, uuid, title, creator, created, created_ts, created_utc, type_, preview, mtime):
+        self.uuid = uuid
+        self.title = title
+        self.creator = creator
+        self.created = created
+        self.created_ts = created_ts
+        self.created_utc = created_utc
+        self.type = type_
+        self.preview = preview
+        self.mtime = mtime
+        # same month as _MONTH_SQL in dbapi (WIB), worked out once per build
+        self.month = sys.intern(monthOf(created_ts))
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.__slots__
+
+    def asDict(self) -> Dict[str, object]:
+        """The same dict the SQL path of pageList returns for this row."""
+        return {f: getattr(self, f) for f in FIELDS}
+
+
+class MetaIndex:
+    """
+    Immutable snapshot of listing metadata, newest first (ORDER BY created_ts DESC, uuid DESC).
+
+    Built once per content generation and never mutated afterwards, so readers
+    need no locks: a rebuild creates a new instance and the reference is
+    swapped. Per-type and per-month position tuples make filtered pages a slice.
+    """
+    __slots__ = ("generation", "records", "byType", "byMonth")
+
+    def __init__(self, generation: int, records: Sequence[Meta]):
+        self.generation = generation
+        self.records: Tuple[Meta, ...] = tuple(records)
+        byType: Dict[str, List[Meta]] = {}
+        byMonth: Dict[str, List[Meta]] = {}
+        for m in self.records:
+            byType.setdefault(m.type or "", []).append(m)
+            byMonth.setdefault(m.month, []).append(m)
+        self.byType: Dict[str, Tuple[Meta, ...]] = {k: tuple(v) for k, v in byType.items()}
+        self.byMonth: Dict[str, Tuple[Meta, ...]] = {k: tuple(v) for k, v in byMonth.items()}
+
+    @classmethod
+    def build(cls, connection: sqlite3.Connection, generation: int) -> "MetaIndex":
+        intern = sys.intern
+        rows = connection.execute(
+            f"SELECT {', '.join(FIELDS)} FROM reads ORDER BY created_ts DESC, uuid DESC"
+        ).fetchall()
+        records = [
+            Meta(uid, title, intern(creator or ""), created, ts, utc, intern(type_ or ""), preview, mtime)
+            for uid, title, creator, created, ts, utc, type_, preview, mtime in rows
+        ]
+        return cls(generation, records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _select(self, type_: str, month: str) -> Sequence[Meta]:
+        if type_ and month:
+            base = self.byType.get(type_, ())
+            return tuple(m for m in base if m.month == month)
+        if type_:
+            return self.byType.get(type_, ())
+        if month:
+            return self.byMonth.get(month, ())
+        return self.records
+
+    def page(self, offset: int, limit: int, type_: str = "", month: str = "") -> Tuple[Sequence[Meta], int]:
+        """(records for the page, total matching) without touching the database."""
+        selected = self._select(type_, month)
+        return selected[offset:offset + limit], len(selected)
+
+    def __iter__(self) -> Iterator[Meta]:
+        return iter(self.records)
+
+
+def sizeOf(index: Optional[MetaIndex]) -> int:
+    """Rough bytes held by an index (records plus their strings)."""
+    if index is None:
+        return 0
+    total = sys.getsizeof(index.records)
+    for m in index.records:
+        total += sys.getsizeof(m)
+        for attr in ("uuid", "title", "created", "created_utc", "preview", "month"):
+            total += sys.getsizeof(getattr(m, attr) or "")
+    return total
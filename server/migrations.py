@@ -0,0 +1,304 @@
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Tuple, Union
+
+from deltasync import NOW_SQL
+from utils import normalizeDate, storeDay
+
+# Schema history. Each entry runs once, in order, inside its own transaction;
+# the applied version is recorded in schema_version. Never edit a shipped
+# migration: append a new one instead. A migration that rebuilds users or
+# teachers must recreate their changelog triggers.
+
+BASELINE = """
+CREATE TABLE IF NOT EXISTS reads (
+    uuid TEXT PRIMARY KEY,
+    title TEXT,
+    creator TEXT,
+    created TEXT,
+    type TEXT,
+    preview TEXT,
+    mtime REAL
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    username TEXT,
+    password TEXT,
+    role TEXT
+);
+
+CREATE TABLE IF NOT EXISTS teachers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    subject TEXT,
+    bio TEXT,
+    role TEXT,
+    mtime REAL
+);
+"""
+
+# users.username was only UNIQUE when UserAPI.add created the table first;
+# keep the most recent row per username and enforce it with an index
+USERS_UNIQUE = """
+CREATE TABLE users_new (
+    id TEXT PRIMARY KEY,
+    username TEXT,
+    password TEXT,
+    role TEXT
+);
+INSERT INTO users_new (id, username, password, role)
+    SELECT id, username, password, role FROM users
+    WHERE rowid IN (SELECT MAX(rowid) FROM users GROUP BY username);
+DROP TABLE users;
+ALTER TABLE users_new RENAME TO users;
+CREATE UNIQUE INDEX IF NOT EXISTS users_username ON users(username);
+"""
+
+# teachers.id is a UUID string everywhere in TeacherAPI
+TEACHERS_TEXT_ID = """
+CREATE TABLE teachers_new (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    subject TEXT,
+    bio TEXT,
+    role TEXT,
+    mtime REAL
+);
+INSERT INTO teachers_new (id, name, subject, bio, role, mtime)
+    SELECT CAST(id AS TEXT), name, subject, bio, role, mtime FROM teachers;
+DROP TABLE teachers;
+ALTER TABLE teachers_new RENAME TO teachers;
+"""
+
+# listing order, type filter + order, teacher recency
+HOT_INDEXES = """
+CREATE INDEX IF NOT EXISTS reads_created ON reads(created);
+CREATE INDEX IF NOT EXISTS reads_type_created ON reads(type, created);
+CREATE INDEX IF NOT EXISTS teachers_mtime ON teachers(mtime);
+"""
+
+# row-level change log for the tables mirrored to JSON, consumed by deltasync
+def _changelogTriggers(table: str) -> str:
+    now = NOW_SQL
+    return f"""
+CREATE TRIGGER IF NOT EXISTS {table}_log_ai AFTER INSERT ON {table} BEGIN
+    INSERT INTO changelog (tbl, key, op, at) VALUES ('{table}', NEW.id, 'upsert', {now});
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_log_au AFTER UPDATE ON {table} BEGIN
+    INSERT INTO changelog (tbl, key, op, at) SELECT '{table}', OLD.id, 'delete', {now} WHERE OLD.id IS NOT NEW.id;
+    INSERT INTO changelog (tbl, key, op, at) VALUES ('{table}', NEW.id, 'upsert', {now});
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_log_ad AFTER DELETE ON {table} BEGIN
+    INSERT INTO changelog (tbl, key, op, at) VALUES ('{table}', OLD.id, 'delete', {now});
+END;
+INSERT INTO changelog (tbl, key, op, at) SELECT '{table}', id, 'upsert', {now} FROM {table};
+"""
+
+CHANGELOG = """
+CREATE TABLE IF NOT EXISTS changelog (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    tbl TEXT NOT NULL,
+    key TEXT NOT NULL,
+    op TEXT NOT NULL,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changelog_tbl_seq ON changelog(tbl, seq);
+CREATE TABLE IF NOT EXISTS sync_cursor (
+    name TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL DEFAULT 0,
+    stamp TEXT,
+    synced REAL NOT NULL DEFAULT 0
+);
+""" + _changelogTriggers("users") + _changelogTriggers("teachers")
+
+# per-hour view buckets, lifetime totals and the rankings precomputed from them (views.py)
+VIEWS = """
+CREATE TABLE IF NOT EXISTS read_views (
+    uuid TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (uuid, hour)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS read_views_hour ON read_views(hour);
+CREATE TABLE IF NOT EXISTS read_totals (
+    uuid TEXT PRIMARY KEY,
+    views INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS most_read (
+    period TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    uuid TEXT NOT NULL,
+    views INTEGER NOT NULL,
+    PRIMARY KEY (period, rank)
+) WITHOUT ROWID;
+"""
+
+MAINTENANCE_LOG = """
+CREATE TABLE IF NOT EXISTS maintenance_log (
+    id INTEGER PRIMARY KEY,
+    task TEXT NOT NULL,
+    started REAL NOT NULL,
+    duration REAL NOT NULL,
+    reclaimed INTEGER NOT NULL DEFAULT 0,
+    detail TEXT
+);
+"""
+
+# content-addressed uploads (media.py); the file is media/ab/cd/<sha256>.<ext>
+MEDIA = """
+CREATE TABLE IF NOT EXISTS media (
+    sha256 TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    name TEXT,
+    uploads INTEGER NOT NULL DEFAULT 1,
+    created REAL NOT NULL,
+    last_upload REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS media_created ON media(created);
+"""
+
+# content generation shared by every worker: bumped by any write to reads, whichever
+# process made it, so each worker can tell its caches are out of date (ReadsAPI.generation)
+CONTENT_GENERATION = """
+CREATE TABLE IF NOT EXISTS content_generation (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    generation INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO content_generation (id, generation) VALUES (1, 0);
+CREATE TRIGGER IF NOT EXISTS reads_generation_ai AFTER INSERT ON reads BEGIN
+    UPDATE content_generation SET generation = generation + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS reads_generation_ad AFTER DELETE ON reads BEGIN
+    UPDATE content_generation SET generation = generation + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS reads_generation_au AFTER UPDATE ON reads BEGIN
+    UPDATE content_generation SET generation = generation + 1 WHERE id = 1;
+END;
+"""
+
+# reads.created is frontmatter text in mixed formats; add its epoch seconds and a
+# canonical UTC ISO string, backfilled here and set by every import from now on.
+# Listings order by (created_ts, uuid) descending, sitemaps ascending: one index
+# serves both directions. The reads_stats triggers group months by created_ts, so
+# they are dropped here along with their counts and recreated by DButils.init_db.
+def _normalizeCreated(connection: sqlite3.Connection) -> None:
+    connection.execute("ALTER TABLE reads ADD COLUMN created_ts INTEGER")
+    connection.execute("ALTER TABLE reads ADD COLUMN created_utc TEXT")
+    rows = connection.execute("SELECT uuid, created, mtime FROM reads").fetchall()
+    updates = []
+    for uid, created, mtime in rows:
+        # unparseable dates fall back to when the row was imported
+        fallback = datetime.fromtimestamp(mtime or time.time(), timezone.utc)
+        updates.append((*normalizeDate(created, fallback), uid))
+    connection.executemany("UPDATE reads SET created_ts = ?, created_utc = ? WHERE uuid = ?", updates)
+    for stmt in _statements(CREATED_TS):
+        connection.execute(stmt)
+
+
+CREATED_TS = """
+DROP INDEX IF EXISTS reads_created;
+DROP INDEX IF EXISTS reads_type_created;
+CREATE INDEX IF NOT EXISTS reads_created_ts ON reads(created_ts, uuid);
+CREATE INDEX IF NOT EXISTS reads_type_created_ts ON reads(type, created_ts, uuid);
+DROP TRIGGER IF EXISTS reads_stats_ai;
+DROP TRIGGER IF EXISTS reads_stats_ad;
+DROP TRIGGER IF EXISTS reads_stats_au;
+DROP TABLE IF EXISTS reads_stats;
+"""
+
+# the YYYY-MM-DD folder DirStore files a body under, so reads never derive it from the raw
+# created text; backfilled from that text (else created_ts), corrected by the next import
+# to wherever the file actually is
+def _createdDay(connection: sqlite3.Connection) -> None:
+    connection.execute("ALTER TABLE reads ADD COLUMN created_day TEXT")
+    rows = connection.execute("SELECT uuid, created, created_ts FROM reads").fetchall()
+    connection.executemany(
+        "UPDATE reads SET created_day = ? WHERE uuid = ?",
+        [(storeDay(created, ts) or None, uid) for uid, created, ts in rows],
+    )
+
+
+Migration = Tuple[int, str, Union[str, Callable[[sqlite3.Connection], None]]]
+
+MIGRATIONS: List[Migration] = [
+    (1, "baseline", BASELINE),
+    (2, "users username unique", USERS_UNIQUE),
+    (3, "teachers text id", TEACHERS_TEXT_ID),
+    (4, "hot query indexes", HOT_INDEXES),
+    (5, "changelog for json mirrors", CHANGELOG),
+    (6, "view counters", VIEWS),
+    (7, "maintenance history", MAINTENANCE_LOG),
+    (8, "media store", MEDIA),
+    (9, "normalized created dates", _normalizeCreated),
+    (10, "shared content generation", CONTENT_GENERATION),
+    (11, "stored body day", _createdDay),
+]
+
+
+def _statements(script: str) -> List[str]:
+    """Split a migration script into statements; trigger bodies stay whole."""
+    out, buf = [], ""
+    for part in script.split(";"):
+        buf += part + ";"
+        if sqlite3.complete_statement(buf):
+            if buf.strip(" \n;"):
+                out.append(buf.strip())
+            buf = ""
+    return out
+
+
+def version(connection: sqlite3.Connection) -> int:
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, name TEXT, applied REAL)"
+    )
+    row = connection.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(connection: sqlite3.Connection) -> List[int]:
+    """
+    Bring the database up to the latest schema. Each migration is applied in a
+    short IMMEDIATE transaction so WAL readers keep going while it runs.
+    Returns the versions that were applied.
+    """
+    current = version(connection)
+    connection.commit()
+    applied = []
+    for num, name, step in MIGRATIONS:
+        if num <= current:
+            continue
+        started = time.perf_counter()
+        connection.execute("BEGIN IMMEDIATE")
+        # another worker may have applied it while this one waited for the write lock
+        if version(connection) >= num:
+            connection.execute("ROLLBACK")
+            continue
+        try:
+            if callable(step):
+                step(connection)
+            else:
+                for stmt in _statements(step):
+                    connection.execute(stmt)
+            connection.execute(
+                "INSERT INTO schema_version (version, name, applied) VALUES (?, ?, ?)", (num, name, time.time())
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        applied.append(num)
+        print(f"[Migrate] {num:03d} {name} ({time.perf_counter() - started:.2f}s)")
+
+    if applied:
+        # fresh statistics for the new indexes; bounded so it stays cheap on big tables
+        connection.execute("PRAGMA analysis_limit = 1000")
+        connection.execute("ANALYZE")
+    connection.execute("PRAGMA optimize")
+    connection.commit()
+    return applied
@@ -0,0 +1,162 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from flask import current_app, g, request
+
+from config import PROFILE_DIR, PROFILE_KEEP, PROFILE_TOP
+from utils import isAdmin
+
+JOBS = ("sync", "import")
+SORTS = ("cumulative", "tottime", "calls")
+
+# cProfile cannot nest; the request or job that started profiling owns this thread
+_local = threading.local()
+
+
+def _busy() -> bool:
+    return getattr(_local, "profiling", False)
+
+
+def _start() -> Optional[cProfile.Profile]:
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # 3.12+: only one profiler per process at a time
+        return None
+    _local.profiling = True
+    return profiler
+
+
+def _fileName(label: str) -> str:
+    slug = re.sub(r"[^\w.-]+", "_", label)[:60]
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{os.getpid()}-{slug}.prof"
+
+
+def save(profiler: cProfile.Profile, label: str) -> Optional[str]:
+    try:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        name = _fileName(label)
+        tmp = PROFILE_DIR / f".{name}.tmp"
+        profiler.dump_stats(tmp)
+        os.replace(tmp, PROFILE_DIR / name)
+    except OSError as e:
+        print(f"[Profile] could not save {label}: {e}")
+        return None
+    for old in sorted(PROFILE_DIR.glob("*.prof"))[:-PROFILE_KEEP]:
+        old.unlink(missing_ok=True)
+    return name
+
+
+def report(source: Any, sort: str = "cumulative", top: int = PROFILE_TOP) -> str:
+    """pstats text for a Profile object or a saved .prof path."""
+    out = io.StringIO()
+    stats = pstats.Stats(source if isinstance(source, cProfile.Profile) else str(source), stream=out)
+    stats.strip_dirs().sort_stats(sort if sort in SORTS else "cumulative").print_stats(top)
+    return out.getvalue()
+
+
+def listing() -> List[Dict[str, Any]]:
+    if not PROFILE_DIR.exists():
+        return []
+    out = []
+    for path in sorted(PROFILE_DIR.glob("*.prof"), reverse=True):
+        st = path.stat()
+        out.append({"name": path.name, "bytes": st.st_size, "mtime": st.st_mtime})
+    return out
+
+
+# --- jobs (syncAll / importFromDir) ---
+
+def _flag(job: str):
+    return PROFILE_DIR / f"armed-{job}"
+
+
+def arm(job: str) -> None:
+    """Profile the next run of `job` in any worker; a flag file, so it also survives a restart."""
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    _flag(job).touch()
+
+
+def armed() -> List[str]:
+    return [job for job in JOBS if _flag(job).exists()]
+
+
+@contextmanager
+def job(name: str) -> Iterator[Optional[cProfile.Profile]]:
+    """Profile this run of `name` if it was armed; the first worker to claim the flag gets it."""
+    if _busy():
+        yield None
+        return
+    try:
+        _flag(name).unlink()
+    except OSError:
+        yield None
+        return
+    profiler = _start()
+    if profiler is None:
+        yield None
+        return
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        _local.profiling = False
+        saved = save(profiler, name)
+        print(f"[Profile] {name} -> {saved}")
+
+
+# --- requests ---
+
+def _requested() -> Optional[str]:
+    """'save' or 'text' when an admin asked to profile this request (?_profile= or X-Profile:)."""
+    mode = request.args.get("_profile") or request.headers.get("X-Profile")
+    if not mode or not isAdmin():
+        return None
+    return "text" if mode == "text" else "save"
+
+
+def _begin() -> None:
+    mode = _requested()
+    if mode is None or _busy():
+        return
+    profiler = _start()
+    if profiler is not None:
+        g._profile = (profiler, mode)
+
+
+def _end(response):
+    state = g.pop("_profile", None)
+    if state is None:
+        return response
+    profiler, mode = state
+    profiler.disable()
+    _local.profiling = False
+    name = save(profiler, f"{request.method} {request.path}")
+    if mode == "text":
+        sort = request.args.get("_sort", "cumulative")
+        response = current_app.response_class(report(profiler, sort), mimetype="text/plain")
+    if name:
+        response.headers["X-Profile-Id"] = name
+    return response
+
+
+def _teardown(exc=None) -> None:
+    # after_request did not run (unhandled error): still stop the profiler
+    state = g.pop("_profile", None)
+    if state is not None:
+        state[0].disable()
+        _local.profiling = False
+
+
+def init_app(app) -> None:
+    app.before_request(_begin)
+    app.after_request(_end)
+    app.teardown_request(_teardown)
@@ -0,0 +1,257 @@
+import hashlib
+import json
+import math
+import sqlite3
+import time
+from collections import Counter
+from typing import Dict, List, Any, Iterable, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # related reads are optional; the read path just shows none
+    np = None
+
+from config import RELATED_TOPK, RELATED_MAX_TERMS, RELATED_REBUILD_DRIFT
+from contentstore import getStore
+from textindex import normalize, tokens
+import sites
+
+RELATEDSCHEMA = """
+CREATE TABLE IF NOT EXISTS related_terms (
+    uuid TEXT PRIMARY KEY,
+    digest TEXT,
+    terms TEXT
+);
+
+CREATE TABLE IF NOT EXISTS related (
+    uuid TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    other TEXT NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (uuid, rank)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS related_meta (
+    key TEXT PRIMARY KEY,
+    value REAL
+);
+"""
+
+STOPWORDS = frozenset("""
+yang dan di ke dari untuk dengan pada ini itu dalam tidak akan juga atau ada karena oleh sebagai
+adalah bisa telah sudah para kami kita mereka saya anda dia nya lebih agar serta bagi hal
+the and for with that this from are was were have has had not but you your our their its
+""".split())
+
+
+def termCounts(title: str, body: str) -> Dict[str, int]:
+    """Most frequent content words of an article; the title counts double."""
+    words = tokens(normalize(title)) * 2 + tokens(normalize(body))
+    counts = Counter(w for w in words if len(w) > 2 and not w.isdigit() and w not in STOPWORDS)
+    return dict(counts.most_common(RELATED_MAX_TERMS))
+
+
+class RelatedIndex:
+    """
+    TF-IDF neighbours for reads, precomputed into the `related` table.
+
+    Term counts per article are cached in related_terms (with a content digest),
+    so an import only re-tokenizes articles whose body actually changed. Cosine
+    scores are computed with NumPy over term posting arrays: one pass per changed
+    article gives its own top-k and patches the lists of every article it now
+    outranks. A full rebuild happens when the corpus drifted enough to skew IDF.
+    """
+
+    def __init__(self, topk: int = RELATED_TOPK):
+        self.topk = topk
+
+    def initSchema(self, connection: sqlite3.Connection) -> None:
+        connection.executescript(RELATEDSCHEMA)
+
+    # --- term extraction ---
+
+    def _refreshTerms(self, connection: sqlite3.Connection, uuids: Iterable[str]) -> Set[str]:
+        """Re-tokenize the given reads; returns the uuids whose content really changed."""
+        store = getStore()
+        changed = set()
+        uuids = list(uuids)
+        for i in range(0, len(uuids), 500):
+            chunk = uuids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            rows = connection.execute(
+                f"SELECT uuid, title, created_day, preview FROM reads WHERE uuid IN ({marks})", chunk
+            ).fetchall()
+            known = {r[0]: r[1] for r in connection.execute(
+                f"SELECT uuid, digest FROM related_terms WHERE uuid IN ({marks})", chunk
+            )}
+            found = set()
+            for uid, title, day, preview in rows:
+                found.add(uid)
+                try:
+                    body = store.get(connection, uid, day)
+                except ValueError:
+                    body = None
+                body = body if body is not None else (preview or "")
+                digest = hashlib.sha1(f"{title}\0{body}".encode("utf-8")).hexdigest()
+                if known.get(uid) == digest:
+                    continue
+                connection.execute(
+                    "INSERT OR REPLACE INTO related_terms (uuid, digest, terms) VALUES (?, ?, ?)",
+                    (uid, digest, json.dumps(termCounts(title or "", body), ensure_ascii=False)),
+                )
+                changed.add(uid)
+            for uid in set(chunk) - found:
+                # deleted from reads
+                if connection.execute("DELETE FROM related_terms WHERE uuid = ?", (uid,)).rowcount:
+                    connection.execute("DELETE FROM related WHERE uuid = ? OR other = ?", (uid, uid))
+                    changed.add(uid)
+        return changed
+
+    # --- vectors ---
+
+    def _load(self, connection: sqlite3.Connection):
+        """Build L2-normalized TF-IDF vectors as per-term posting arrays."""
+        ids: List[str] = []
+        docTerms: List[Dict[str, int]] = []
+        for uid, terms in connection.execute("SELECT uuid, terms FROM related_terms"):
+            ids.append(uid)
+            docTerms.append(json.loads(terms))
+        n = len(ids)
+        df: Counter = Counter()
+        for terms in docTerms:
+            df.update(terms.keys())
+        idf = {t: math.log((1 + n) / (1 + c)) + 1.0 for t, c in df.items()}
+
+        docVecs: List[Tuple[List[str], "np.ndarray"]] = []
+        postingDocs: Dict[str, List[int]] = {}
+        postingW: Dict[str, List[float]] = {}
+        for i, terms in enumerate(docTerms):
+            keys = list(terms.keys())
+            w = np.array([(1.0 + math.log(terms[t])) * idf[t] for t in keys], dtype=np.float32)
+            norm = float(np.linalg.norm(w))
+            if norm:
+                w /= norm
+            docVecs.append((keys, w))
+            for t, wt in zip(keys, w.tolist()):
+                postingDocs.setdefault(t, []).append(i)
+                postingW.setdefault(t, []).append(wt)
+        postings = {
+            t: (np.array(postingDocs[t], dtype=np.int32), np.array(postingW[t], dtype=np.float32))
+            for t in postingDocs
+        }
+        return ids, docVecs, postings
+
+    @staticmethod
+    def _scores(i: int, n: int, docVecs, postings) -> "np.ndarray":
+        scores = np.zeros(n, dtype=np.float32)
+        keys, w = docVecs[i]
+        for t, wt in zip(keys, w.tolist()):
+            docs, pw = postings[t]
+            # doc indices are unique within a posting list, so fancy += is safe
+            scores[docs] += wt * pw
+        scores[i] = 0.0
+        return scores
+
+    def _top(self, scores: "np.ndarray") -> List[Tuple[int, float]]:
+        k = min(self.topk, len(scores))
+        if k <= 0:
+            return []
+        idx = np.argpartition(-scores, k - 1)[:k]
+        idx = idx[np.argsort(-scores[idx], kind="stable")]
+        return [(int(j), float(scores[j])) for j in idx if scores[j] > 0]
+
+    # --- maintenance ---
+
+    def update(self, connection: sqlite3.Connection, uuids: Iterable[str]) -> Dict[str, Any]:
+        if np is None:
+            return {"status": "skipped", "reason": "numpy not installed"}
+        started = time.perf_counter()
+        self.initSchema(connection)
+        changed = self._refreshTerms(connection, uuids)
+
+        meta = dict(connection.execute("SELECT key, value FROM related_meta").fetchall())
+        total = connection.execute("SELECT COUNT(*) FROM related_terms").fetchone()[0]
+        builtFor = meta.get("built_docs") or 0
+        full = not builtFor or abs(total - builtFor) / builtFor > RELATED_REBUILD_DRIFT
+        if not changed and not full:
+            connection.commit()
+            return {"status": "unchanged"}
+
+        ids, docVecs, postings = self._load(connection)
+        n = len(ids)
+        pos = {uid: i for i, uid in enumerate(ids)}
+
+        lists: Dict[int, List[Tuple[int, float]]] = {}
+        dirty: Set[int] = set()
+        if full:
+            for i in range(n):
+                lists[i] = self._top(self._scores(i, n, docVecs, postings))
+            connection.execute("DELETE FROM related")
+            dirty = set(lists)
+        else:
+            for uid, rank, other, score in connection.execute("SELECT uuid, rank, other, score FROM related ORDER BY uuid, rank"):
+                if uid in pos and other in pos:
+                    lists.setdefault(pos[uid], []).append((pos[other], score))
+            recompute: Set[int] = set()
+            for uid in changed:
+                i = pos.get(uid)
+                if i is None:
+                    continue
+                scores = self._scores(i, n, docVecs, postings)
+                lists[i] = self._top(scores)
+                dirty.add(i)
+                # patch every other list the changed article enters, leaves or moves in
+                holders = {j for j, l in lists.items() if any(o == i for o, _ in l)}
+                for j in holders.union(np.nonzero(scores)[0].tolist()):
+                    if j == i or j in recompute:
+                        continue
+                    old = lists.get(j, [])
+                    oldScore = next((s for o, s in old if o == i), None)
+                    s = float(scores[j])
+                    if oldScore is not None and s < oldScore and len(old) >= self.topk:
+                        # it moved down a full list; someone unlisted may now outrank it
+                        recompute.add(j)
+                        continue
+                    current = [(o, x) for o, x in old if o != i]
+                    if s > 0:
+                        current.append((i, s))
+                    current.sort(key=lambda x: -x[1])
+                    lists[j] = current[:self.topk]
+                    dirty.add(j)
+            for j in recompute:
+                lists[j] = self._top(self._scores(j, n, docVecs, postings))
+                dirty.add(j)
+
+        rows = []
+        for i in dirty:
+            connection.execute("DELETE FROM related WHERE uuid = ?", (ids[i],))
+            rows.extend((ids[i], rank, ids[o], s) for rank, (o, s) in enumerate(lists.get(i, [])))
+        connection.executemany("INSERT INTO related (uuid, rank, other, score) VALUES (?, ?, ?, ?)", rows)
+        if full:
+            connection.execute("INSERT OR REPLACE INTO related_meta (key, value) VALUES ('built_docs', ?)", (n,))
+        connection.commit()
+        took = time.perf_counter() - started
+        print(f"[Related] {'rebuilt' if full else 'updated'} {len(dirty)} lists for {len(changed)} changed in {took:.2f}s")
+        return {"status": "rebuilt" if full else "updated", "lists": len(dirty), "changed": len(changed), "seconds": round(took, 3)}
+
+    def lookup(self, connection: sqlite3.Connection, uid: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        try:
+            rows = connection.execute(
+                """
+                SELECT r.uuid, r.title, r.creator, r.created_utc, r.created_ts, r.type, rel.score
+                FROM related rel JOIN reads r ON r.uuid = rel.other
+                WHERE rel.uuid = ?
+                ORDER BY rel.rank LIMIT ?
+                """,
+                (uid, limit or self.topk),
+            ).fetchall()
+        except sqlite3.OperationalError:
+            # table not built yet (numpy missing or first import still pending)
+            return []
+        return [dict(zip(("uuid", "title", "creator", "created_utc", "created_ts", "type", "score"), row)) for row in rows]
+
+
+_related = sites.local(lambda site: RelatedIndex())
+
+def getRelated() -> RelatedIndex:
+    return _related.instance()
@@ -0,0 +1,116 @@
+from functools import wraps
+from typing import Any, Callable, Dict, Tuple
+
+from flask import request, session, current_app, g
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from bytecache import ByteLRU
+from config import PAGECACHE_BYTES, FRAGMENTCACHE_BYTES
+from dbapi import ReadsAPI
+import sites
+
+# per site, each sized by its cacheShare
+pageCache = sites.local(lambda site: ByteLRU(site.budget(PAGECACHE_BYTES), name="page"))
+fragmentCache = sites.local(lambda site: ByteLRU(site.budget(FRAGMENTCACHE_BYTES), name="fragment"))
+
+
+def _anonymous() -> bool:
+    return not session and "Authorization" not in request.headers
+
+
+# the only query args the cached views read (with request.args.get, so the first value);
+# anything else is left out of the key, or ?x=1, ?x=2, ... could evict every hot page
+KEY_ARGS = ("month", "page", "q", "type")
+
+
+def _normalizedQuery() -> Tuple[Tuple[str, str], ...]:
+    """Stripped KEY_ARGS with blanks dropped, so ?page=2&q= and ?q=&page=2&x=1 share an entry."""
+    pairs = []
+    for k in KEY_ARGS:
+        v = (request.args.get(k) or "").strip()
+        if k == "page":
+            # read with type=int and clamped to 1: ?page=02 is ?page=2, junk or ?page=1 is no page
+            n = request.args.get(k, 1, type=int) or 1
+            v = str(n) if n > 1 else ""
+        if v:
+            pairs.append((k, v))
+    return tuple(pairs)
+
+
+def cachedPage(view: Callable) -> Callable:
+    """
+    Full-page cache for anonymous GETs. Entries are keyed by endpoint, view args,
+    normalized query and the content generation, so any reads change retires them.
+    Only plain 200 HTML bodies are stored, and never ones rendered from stale
+    listings (see ReadsAPI.pageList).
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != "GET" or not _anonymous():
+            return view(*args, **kwargs)
+
+        key = (request.endpoint, tuple(sorted(kwargs.items())), _normalizedQuery(), ReadsAPI.generation())
+        body = pageCache.get(key)
+        if body is not None:
+            resp = current_app.response_class(body, mimetype="text/html")
+            resp.headers["X-Cache"] = "HIT"
+            return resp
+
+        rv = view(*args, **kwargs)
+        if isinstance(rv, str):
+            if not g.get("servedStale"):
+                pageCache.set(key, rv.encode("utf-8"))
+            resp = current_app.response_class(rv, mimetype="text/html")
+            resp.headers["X-Cache"] = "MISS"
+            return resp
+        return rv
+    return wrapper
+
+
+class FragmentCacheExtension(Extension):
+    """
+    {% cache "name", arg1, arg2 %} ... {% endcache %}
+
+    Caches the rendered block keyed by its name, the given arguments and the
+    content generation. Use for expensive blocks such as the article cards.
+    """
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_cache", [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _cache(self, parts, caller):
+        key = (tuple(str(p) for p in parts), ReadsAPI.generation())
+        body = fragmentCache.get(key)
+        if body is not None:
+            return Markup(body.decode("utf-8"))
+        rv = caller()
+        if not g.get("servedStale"):
+            fragmentCache.set(key, rv.encode("utf-8"))
+        return rv
+
+
+def clear() -> None:
+    pageCache.clear()
+    fragmentCache.clear()
+
+
+def stats() -> Dict[str, Any]:
+    return {"page": pageCache.stats(), "fragment": fragmentCache.stats()}
+
+
+def init_app(app) -> None:
+    app.jinja_env.add_extension(FragmentCacheExtension)
+
+
+# stale generations can never hit again; free their bytes right away
+ReadsAPI.subscribe(lambda uuids: clear())
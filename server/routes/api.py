@@ -1,7 +1,16 @@
-from flask import Blueprint, request, jsonify, render_template
+from flask import Blueprint, request, jsonify, render_template, send_from_directory
 from typing import Any
-from dbapi import ReadsAPI
+from dbapi import DButils, ReadsAPI, TeacherAPI
 from errors import register_error_handlers
+from utils import adminRequired
+from config import TRACE_SAMPLE, TRACE_DIR, PROFILE_DIR, MEDIA_MAX_BYTES
+from media import getMedia, MediaTooLarge, MediaRejected
+import maintenance
+import profiling
+import rendercache
+import sites
+import tracing
+import views
 
 bp = Blueprint('api', __name__)
 register_error_handlers(bp)
@@ -13,3 +22,149 @@ def error(code: int, message: str): # complete
 def readsImport():
     res = ReadsAPI.importFromDir
     return jsonify({"status": "berhasil"})
+
+@bp.route('/api/suggest') # complete
+def suggest():
+    q = (request.args.get('q', '') or '').strip()
+    limit = min(20, max(1, request.args.get('limit', 8, type=int) or 8))
+    if not q:
+        return jsonify({"items": []})
+    return jsonify({"items": ReadsAPI.suggest(q[:100], limit)})
+
+@bp.route('/api/facets') # complete
+def facets():
+    return jsonify(ReadsAPI.facets())
+
+@bp.route('/api/archive') # complete
+def archive():
+    months = ReadsAPI.facets()["month"]
+    return jsonify({"items": [{"month": m, "count": c} for m, c in months.items()]})
+
+@bp.route('/api/popular') # complete
+def popular():
+    period = request.args.get('period', 'week')
+    if period not in views.PERIODS:
+        return error(400, "period harus 'today' atau 'week'")
+    limit = min(50, max(1, request.args.get('limit', 10, type=int) or 10))
+    items = views.popular(DButils.connect(), period, limit)
+    for a in items:
+        a["uuid"] = a["uuid"].replace("-", "")
+    return jsonify({"period": period, "items": items})
+
+@bp.route('/api/cache/stats') # complete
+@adminRequired
+def cacheStats():
+    return jsonify({"site": sites.current().name, **_siteCacheStats()})
+
+def _siteCacheStats() -> dict:
+    return {**rendercache.stats(), **ReadsAPI.cacheStats(), "views": views.stats()}
+
+@bp.route('/api/cache/clear', methods=['POST']) # complete
+@adminRequired
+def cacheClear():
+    rendercache.clear()
+    return jsonify({"status": "berhasil"})
+
+@bp.route('/api/sites') # complete
+@adminRequired
+def siteList():
+    items = []
+    for site in sites.all():
+        item = {"name": site.name, "hosts": site.hosts, "root": str(site.root), "cacheShare": site.cacheShare, "synced": site.synced}
+        if site.synced:
+            with sites.using(site):
+                item["cache"] = _siteCacheStats()
+        items.append(item)
+    return jsonify({"current": sites.current().name, "items": items})
+
+@bp.route('/api/maintenance') # complete
+@adminRequired
+def maintenanceStatus():
+    connection = DButils.connect()
+    limit = min(500, max(1, request.args.get('limit', 50, type=int) or 50))
+    return jsonify({"status": maintenance.status(connection), "history": maintenance.history(connection, limit)})
+
+@bp.route('/api/maintenance/run', methods=['POST']) # complete
+@adminRequired
+def maintenanceRun():
+    task = request.args.get('task', '')
+    if task not in maintenance.TASKS:
+        return error(400, "task harus salah satu dari: " + ", ".join(maintenance.TASKS))
+    entry = maintenance.scheduler.run(task)
+    if entry is None:
+        return error(409, "pemeliharaan sedang berjalan")
+    return jsonify(entry)
+
+@bp.route('/api/traces') # complete
+@adminRequired
+def traces():
+    return jsonify({"sample": TRACE_SAMPLE, "items": tracing.listing()})
+
+@bp.route('/api/traces/<name>') # complete
+@adminRequired
+def traceFile(name: str):
+    if TRACE_DIR is None:
+        return error(404, "tracing tidak disimpan")
+    return send_from_directory(TRACE_DIR, name, mimetype="application/json", as_attachment=True)
+
+@bp.route('/api/profiles') # complete
+@adminRequired
+def profiles():
+    return jsonify({"armed": profiling.armed(), "items": profiling.listing()})
+
+@bp.route('/api/profiles/<name>') # complete
+@adminRequired
+def profileFile(name: str):
+    if request.args.get('download'):
+        return send_from_directory(PROFILE_DIR, name, as_attachment=True)
+    path = PROFILE_DIR / name
+    if name.startswith('.') or path.suffix != '.prof' or not path.is_file():
+        return error(404, "profil tidak ditemukan")
+    return profiling.report(path, request.args.get('sort', 'cumulative')), 200, {"Content-Type": "text/plain; charset=utf-8"}
+
+@bp.route('/api/profiles/arm', methods=['POST']) # complete
+@adminRequired
+def profileArm():
+    job = request.args.get('job', '')
+    if job not in profiling.JOBS:
+        return error(400, "job harus salah satu dari: " + ", ".join(profiling.JOBS))
+    profiling.arm(job)
+    return jsonify({"status": "berhasil", "armed": profiling.armed()})
+
+@bp.route('/api/media', methods=['GET']) # complete
+@adminRequired
+def mediaList():
+    page = max(1, request.args.get('page', 1, type=int) or 1)
+    limit = min(200, max(1, request.args.get('limit', 50, type=int) or 50))
+    return jsonify({**getMedia().listing(DButils.connect(), (page - 1) * limit, limit), "page": page})
+
+@bp.route('/api/media', methods=['POST']) # complete
+@adminRequired
+def mediaUpload():
+    # multipart field "file" (browser forms), or the file as the raw body with ?name=
+    request.max_content_length = MEDIA_MAX_BYTES + 64 * 1024
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            return error(400, "berkas 'file' tidak ada")
+        stream, name = upload.stream, upload.filename or ""
+    else:
+        stream, name = request.stream, request.args.get('name', '')
+    try:
+        item = getMedia().save(DButils.connect(), stream, name)
+    except (MediaTooLarge, MediaRejected) as e:
+        return error(e.code, str(e))
+    return jsonify(item), 200 if item["duplicate"] else 201
+
+@bp.route('/api/teachers/search') # complete
+def teachersSearch():
+    q = request.args.get('q', '') or ''
+    page = max(1, request.args.get('page', 1, type=int) or 1)
+    limit = min(50, max(1, request.args.get('limit', 10, type=int) or 10))
+    return jsonify({"items": TeacherAPI.search(q, (page - 1) * limit, limit), "page": page})
+
+@bp.route('/api/teachers/suggest') # complete
+def teachersSuggest():
+    q = request.args.get('q', '') or ''
+    limit = min(20, max(1, request.args.get('limit', 8, type=int) or 8))
+    return jsonify({"items": TeacherAPI.suggest(q, limit)})
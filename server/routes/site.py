@@ -1,32 +1,108 @@
-from flask import Blueprint, render_template, request
+from flask import Blueprint, render_template, request, abort, current_app, stream_with_context, send_file
+from uuid import UUID
 from dbapi import ReadsAPI
+from config import MEDIA_MAX_AGE
+from media import getMedia
+from rendercache import cachedPage
+import feeds
+from views import counted
 
 bp = Blueprint("site", __name__)
 
 @bp.route("/")
+@cachedPage
 def home():
     q = request.args.get('q', '') or ''
-    page = max(1, int(request.args.get('page',1)))
+    type_ = request.args.get('type', '') or ''
+    month = request.args.get('month', '') or ''
+    page = max(1, request.args.get('page', 1, type=int) or 1)
     limit = 10
     offset = (page - 1) * limit
-    data = ReadsAPI.pageList(offset,limit,q)
+    data = ReadsAPI.pageList(offset,limit,q,type_,month)
     items = data.get("items", [])
-    
-    for a in items:
-        if "uuid" in a:
-            a["uuid"] = a["uuid"].replace("-", "")
-    
+    total = data.get("total", 0)
+
     return render_template(
         "index.html",
         articles=items,
         page=page,
-        total=len(items),
+        total=total,
+        pages=max(1, -(-total // limit)),
         q=q,
+        type_=type_,
+        month=month,
+        facets=ReadsAPI.facets(),
         limit=limit,
     )
 
 
 @bp.route("/baca/<uuid>")
+@counted
+@cachedPage
 def read(uuid: str):
+    try:
+        # listing links drop the dashes; store keys keep them
+        uuid = str(UUID(uuid))
+    except ValueError:
+        abort(404)
     p = ReadsAPI.read(uuid)
-    return render_template("baca.html", article=p)
\ No newline at end of file
+    if p is None:
+        abort(404)
+    return render_template("baca.html", article=p, related=ReadsAPI.related(uuid))
+
+
+def _xml(body: bytes, mimetype: str = "application/xml"):
+    resp = current_app.response_class(body, mimetype=mimetype)
+    resp.set_etag(feeds.etagOf(body))
+    resp.headers["Cache-Control"] = "public, max-age=300"
+    return resp.make_conditional(request)
+
+
+@bp.route("/feed.xml")
+def feed():
+    return _xml(feeds.rss(request.host), "application/rss+xml")
+
+
+@bp.route("/atom.xml")
+def atom():
+    return _xml(feeds.atom(request.host), "application/atom+xml")
+
+
+@bp.route("/sitemap.xml")
+def sitemap():
+    return _xml(feeds.sitemapIndex(request.host))
+
+
+@bp.route("/sitemap-<int:n>.xml")
+def sitemapShard(n: int):
+    sigs = feeds.shards()
+    if n >= len(sigs):
+        abort(404)
+    sig = sigs[n]
+    if sig in request.if_none_match:
+        resp = current_app.response_class(status=304)
+        resp.set_etag(sig)
+        return resp
+    body = feeds.feedCache.get(feeds.shardKey(request.host, n, sig))
+    if body is None:
+        # first request after the shard changed: stream it out while it is built
+        body = stream_with_context(feeds.streamShard(request.host, n, sig))
+    resp = current_app.response_class(body, mimetype="application/xml")
+    resp.set_etag(sig)
+    resp.headers["Cache-Control"] = "public, max-age=3600"
+    return resp
+
+
+@bp.route("/media/<name>")
+def media(name: str):
+    # the name is the content hash, so a URL never changes content: cache it for good
+    found = getMedia().resolve(name)
+    if found is None:
+        abort(404)
+    path, mimetype = found
+    # conditional: If-None-Match / If-Modified-Since and Range (206) requests
+    resp = send_file(path, mimetype=mimetype, conditional=True, etag=name.split(".")[0], max_age=MEDIA_MAX_AGE)
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    resp.headers["X-Content-Type-Options"] = "nosniff"
+    return resp
@@ -0,0 +1,95 @@
+import contextvars
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class FlightTimeout(TimeoutError):
+    """Raised to callers that gave up waiting on someone else's computation."""
+    code = 503  # picked up by the generic error handler
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one execution.
+
+    The first caller runs `fn`; callers arriving while it runs wait (up to
+    `timeout` seconds) and receive the same result, or the same exception.
+    Nothing is cached here: once the call returns, the next caller runs again.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, name: str = "flight"):
+        self.timeout = timeout
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.shared = 0
+        self.timeouts = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.runs += 1
+            else:
+                call.waiters += 1
+                self.shared += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+            return call.result
+
+        if not call.done.wait(self.timeout if timeout is None else timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise FlightTimeout(f"{self.name}: timed out waiting for {key!r}")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def inFlight(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def spawn(self, key: Hashable, fn: Callable[[], Any]) -> bool:
+        """
+        Run `fn` under `key` on a daemon thread unless that key is already in flight.
+        The thread runs in a copy of the caller's context (current site, trace).
+        """
+        with self._lock:
+            if key in self._calls:
+                return False
+
+        def run():
+            try:
+                self.do(key, fn)
+            except Exception as e:
+                print(f"[SingleFlight] {self.name} background refresh of {key!r} failed: {e}")
+
+        ctx = contextvars.copy_context()
+        threading.Thread(target=ctx.run, args=(run,), name=f"{self.name}-refresh", daemon=True).start()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"name": self.name, "inFlight": len(self._calls), "runs": self.runs, "shared": self.shared, "timeouts": self.timeouts}
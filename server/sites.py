@@ -0,0 +1,197 @@
+"""
+Several school sites served by one process, picked by the request's Host header.
+
+Each site has its own content root laid out like USERDATA (data.db, login.json,
+teachers.json, pages/, packs/, media/, hotkeys.json) and its own caches and indexes,
+sized as its cacheShare of the global byte budgets. Code reaches per-site
+state in two ways:
+
+    sites.current().dbFile          paths and flags of the site being served
+    _cache = sites.local(factory)   a proxy that forwards to factory(site),
+                                    built the first time each site uses it
+
+The current site lives in a ContextVar: set per request from the Host header,
+by `using(site)` for jobs, and copied into threads started by SingleFlight.
+Outside both it is the first configured site, so tools keep working unchanged.
+"""
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from flask import abort, request
+
+from config import SITES, HOTKEYS_FILE, BACKUP_DIR
+
+
+class Site:
+    def __init__(self, name: str, root: Path, hosts: List[str], cacheShare: float = 1.0):
+        self.name = name
+        self.root = Path(root)
+        self.hosts = [h.lower() for h in hosts]
+        self.cacheShare = cacheShare
+        self.dbFile = self.root / "data.db"
+        self.loginJSON = self.root / "login.json"
+        self.teacherJSON = self.root / "teachers.json"
+        self.pageDir = self.root / "pages"
+        self.packDir = self.root / "packs"
+        self.mediaDir = self.root / "media"
+        self.hotkeysFile = None if HOTKEYS_FILE is None else self.root / "hotkeys.json"
+        self.backupDir = BACKUP_DIR if len(SITES) == 1 else BACKUP_DIR / name
+        # schema/migrations done (DButils.init_db) and data sources synced (DButils.syncAll)
+        self.ready = False
+        self.synced = False
+        self.lock = threading.Lock()
+
+    def budget(self, nbytes: int) -> int:
+        return int(nbytes * self.cacheShare)
+
+    def __repr__(self) -> str:
+        return f"<Site {self.name} {self.root}>"
+
+
+_sites: Dict[str, Site] = {
+    name: Site(name, spec["root"], spec.get("hosts", ["*"]), spec.get("cacheShare", 1.0))
+    for name, spec in SITES.items()
+}
+_byHost: Dict[str, Site] = {host: site for site in _sites.values() for host in site.hosts}
+_default = next(iter(_sites.values()))
+_current: ContextVar[Optional[Site]] = ContextVar("site", default=None)
+
+
+def current() -> Site:
+    return _current.get() or _default
+
+
+def get(name: str) -> Site:
+    return _sites[name]
+
+
+def all() -> List[Site]:
+    return list(_sites.values())
+
+
+def synced() -> List[Site]:
+    return [s for s in _sites.values() if s.synced]
+
+
+def single() -> bool:
+    return len(_sites) == 1
+
+
+def resolve(host: str) -> Optional[Site]:
+    """Site for a Host header (port ignored); '*' in a site's hosts makes it the fallback."""
+    name = (host or "").split(":")[0].lower()
+    return _byHost.get(name) or _byHost.get("*")
+
+
+@contextmanager
+def using(site: Site) -> Iterator[Site]:
+    token = _current.set(site)
+    try:
+        yield site
+    finally:
+        _current.reset(token)
+
+
+class SiteLocal:
+    """Forwards attribute access to this site's instance, created on first use by factory(site)."""
+
+    def __init__(self, factory: Callable[[Site], Any]):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instances", {})
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def instance(self, site: Optional[Site] = None) -> Any:
+        site = site or current()
+        inst = self._instances.get(site.name)
+        if inst is None:
+            with self._lock:
+                inst = self._instances.get(site.name)
+                if inst is None:
+                    inst = self._instances[site.name] = self._factory(site)
+        return inst
+
+    def each(self) -> List[Tuple[Site, Any]]:
+        """(site, instance) for every site that has built one."""
+        return [(_sites[name], inst) for name, inst in list(self._instances.items())]
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.instance(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self.instance(), name, value)
+
+    def __len__(self) -> int:
+        return len(self.instance())
+
+
+def local(factory: Callable[[Site], Any]) -> SiteLocal:
+    return SiteLocal(factory)
+
+
+class State:
+    """Plain attribute bag for per-site scalars, e.g. sites.local(lambda s: State(generation=0))."""
+
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+
+# --- flask wiring ---
+
+_app = None
+# called with (app, site) after a site's first sync (e.g. warm-up), on a thread of their own
+# unless the sync was waited for
+_onSynced: List[Callable[[Any, Site], None]] = []
+
+
+def onSynced(fn: Callable[[Any, Site], None]) -> Callable[[Any, Site], None]:
+    _onSynced.append(fn)
+    return fn
+
+
+def ensureSynced(site: Site, wait: bool = False) -> None:
+    """
+    Run the site's startup sync once, on whichever request reaches it first
+    (needs an app context). With wait, the onSynced hooks run before returning.
+    """
+    if site.synced:
+        return
+    from dbapi import DButils
+    with site.lock:
+        if site.synced:
+            return
+        with using(site):
+            DButils.syncAll()
+            DButils.close()
+        site.synced = True
+    for fn in _onSynced:
+        if wait:
+            fn(_app, site)
+        else:
+            threading.Thread(target=fn, args=(_app, site), name=f"site-{site.name}-synced", daemon=True).start()
+
+
+def _begin() -> None:
+    site = resolve(request.host)
+    if site is None:
+        abort(404)
+    request.environ["site.token"] = _current.set(site)
+    ensureSynced(site)
+
+
+def _teardown(exc=None) -> None:
+    token = request.environ.pop("site.token", None)
+    if token is not None:
+        try:
+            _current.reset(token)
+        except ValueError:
+            _current.set(None)
+
+
+def init_app(app) -> None:
+    global _app
+    _app = app
+    app.before_request(_begin)
+    app.teardown_request(_teardown)
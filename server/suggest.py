@@ -0,0 +1,114 @@
+import heapq
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, List, Tuple, Any, Iterable
+
+from textindex import normalize, tokens
+import sites
+
+
+class TitleSuggest:
+    """
+    Prefix index over the words of article titles and creators.
+
+    Distinct words live in a sorted array searched with bisect. Each word keeps a
+    posting list already ordered newest first, so the top-k for a prefix is a
+    lazy k-way merge over the matching words instead of a scan of all matches.
+    """
+
+    def __init__(self):
+        self._words: List[str] = []
+        self._postings: Dict[str, List[Tuple[float, str]]] = {}
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._docWords: Dict[str, Tuple[str, ...]] = {}
+        self.built = False
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def build(self, rows: Iterable[Dict[str, Any]]) -> None:
+        with self.lock:
+            self._words, self._postings, self._docs, self._docWords = [], {}, {}, {}
+            for row in rows:
+                self._index(row, bulk=True)
+            for posting in self._postings.values():
+                posting.sort()
+            self._words = sorted(self._postings)
+            self.built = True
+
+    def _index(self, row: Dict[str, Any], bulk: bool = False) -> None:
+        uid = row["uuid"]
+        key = (-(row.get("created_ts") or 0), uid)
+        words = tuple(dict.fromkeys(tokens(normalize(row.get("title"))) + tokens(normalize(row.get("creator")))))
+        self._docs[uid] = {"uuid": uid, "title": row.get("title"), "creator": row.get("creator"),
+                           "created_utc": row.get("created_utc"), "created_ts": row.get("created_ts")}
+        self._docWords[uid] = words
+        for w in words:
+            posting = self._postings.get(w)
+            if posting is None:
+                posting = self._postings[w] = []
+                if not bulk:
+                    insort(self._words, w)
+            if bulk:
+                posting.append(key)
+            else:
+                insort(posting, key)
+
+    def upsert(self, row: Dict[str, Any]) -> None:
+        with self.lock:
+            self.remove(row["uuid"])
+            self._index(row)
+
+    def remove(self, uid: str) -> None:
+        with self.lock:
+            doc = self._docs.pop(uid, None)
+            if doc is None:
+                return
+            key = (-(doc.get("created_ts") or 0), uid)
+            for w in self._docWords.pop(uid, ()):
+                posting = self._postings.get(w)
+                if posting is None:
+                    continue
+                i = bisect_left(posting, key)
+                if i < len(posting) and posting[i] == key:
+                    del posting[i]
+                if not posting:
+                    del self._postings[w]
+                    j = bisect_left(self._words, w)
+                    if j < len(self._words) and self._words[j] == w:
+                        del self._words[j]
+
+    def query(self, q: str, limit: int = 8, maxScan: int = 5000) -> List[Dict[str, Any]]:
+        """Newest articles where every word of `q` starts some word of the title or creator."""
+        words = tokens(normalize(q))
+        if not words:
+            return []
+        *full, last = words
+        with self.lock:
+            start = bisect_left(self._words, last)
+            runs = []
+            for i in range(start, len(self._words)):
+                if not self._words[i].startswith(last):
+                    break
+                runs.append(self._postings[self._words[i]])
+            out: List[Dict[str, Any]] = []
+            seen = set()
+            for scanned, (_, uid) in enumerate(heapq.merge(*runs)):
+                if scanned >= maxScan or len(out) >= limit:
+                    break
+                if uid in seen:
+                    continue
+                seen.add(uid)
+                if full:
+                    docWords = self._docWords[uid]
+                    if not all(any(d.startswith(f) for d in docWords) for f in full):
+                        continue
+                out.append(dict(self._docs[uid]))
+            return out
+
+
+_suggest = sites.local(lambda site: TitleSuggest())
+
+def getSuggest() -> TitleSuggest:
+    return _suggest.instance()
@@ -0,0 +1,188 @@
+import re
+import heapq
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, List, Set, Tuple, Any, Optional, Iterable
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text: Optional[str]) -> str:
+    """Casefold and strip diacritics so 'Sütomo' matches 'sutomo'."""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", str(text))
+    return "".join(c for c in text if not unicodedata.combining(c)).casefold()
+
+
+def tokens(text: str) -> List[str]:
+    return _WORD.findall(text)
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TextIndex:
+    """
+    In-memory inverted index over a few text fields of small records.
+
+    - word tokens (with the best field weight per document) for prefix autocomplete
+    - character trigrams of each field for substring search
+    - optional case-insensitive exact-value lookups (e.g. name uniqueness checks)
+
+    Documents are kept with a rank value (usually mtime) so results can be
+    returned newest first without re-sorting the whole collection.
+    """
+
+    def __init__(self, fields: Dict[str, float], exact: Iterable[str] = ()):
+        self.fields = fields
+        self.exactFields = tuple(exact)
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self._norm: Dict[str, Dict[str, str]] = {}
+        self._rank: Dict[str, float] = {}
+        self._tokens: Dict[str, Dict[str, float]] = {}
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._exact: Dict[Tuple[str, str], Set[str]] = {}
+        self._vocab: List[str] = []
+        self._ordered: Optional[List[str]] = None
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, docId: str) -> bool:
+        return docId in self.records
+
+    # --- maintenance ---
+
+    def add(self, docId: str, record: Dict[str, Any], rank: float = 0) -> None:
+        with self.lock:
+            if docId in self.records:
+                self.remove(docId)
+            norm = {f: normalize(record.get(f)) for f in self.fields}
+            self.records[docId] = record
+            self._norm[docId] = norm
+            self._rank[docId] = rank
+            for field, weight in self.fields.items():
+                for tok in tokens(norm[field]):
+                    posting = self._tokens.get(tok)
+                    if posting is None:
+                        posting = self._tokens[tok] = {}
+                        insort(self._vocab, tok)
+                    if posting.get(docId, 0) < weight:
+                        posting[docId] = weight
+                for tri in trigrams(norm[field]):
+                    self._trigrams.setdefault(tri, set()).add(docId)
+            for field in self.exactFields:
+                self._exact.setdefault(self._exactKey(field, record.get(field)), set()).add(docId)
+            self._ordered = None
+
+    def remove(self, docId: str) -> bool:
+        with self.lock:
+            norm = self._norm.pop(docId, None)
+            if norm is None:
+                return False
+            record = self.records.pop(docId)
+            self._rank.pop(docId, None)
+            for field in self.fields:
+                for tok in tokens(norm[field]):
+                    posting = self._tokens.get(tok)
+                    if posting is not None:
+                        posting.pop(docId, None)
+                        if not posting:
+                            del self._tokens[tok]
+                            i = bisect_left(self._vocab, tok)
+                            if i < len(self._vocab) and self._vocab[i] == tok:
+                                del self._vocab[i]
+                for tri in trigrams(norm[field]):
+                    posting = self._trigrams.get(tri)
+                    if posting is not None:
+                        posting.discard(docId)
+                        if not posting:
+                            del self._trigrams[tri]
+            for field in self.exactFields:
+                key = self._exactKey(field, record.get(field))
+                ids = self._exact.get(key)
+                if ids is not None:
+                    ids.discard(docId)
+                    if not ids:
+                        del self._exact[key]
+            self._ordered = None
+            return True
+
+    def clear(self) -> None:
+        with self.lock:
+            for store in (self.records, self._norm, self._rank, self._tokens, self._trigrams, self._exact):
+                store.clear()
+            self._vocab.clear()
+            self._ordered = None
+
+    @staticmethod
+    def _exactKey(field: str, value: Any) -> Tuple[str, str]:
+        return field, str(value or "").lower()
+
+    # --- queries ---
+
+    def ordered(self) -> List[str]:
+        """All document ids, highest rank first."""
+        with self.lock:
+            if self._ordered is None:
+                self._ordered = sorted(self._rank, key=self._rank.__getitem__, reverse=True)
+            return self._ordered
+
+    def search(self, query: str) -> List[str]:
+        """Ids whose fields contain `query` as a substring, highest rank first."""
+        q = normalize(query).strip()
+        if not q:
+            return list(self.ordered())
+        with self.lock:
+            grams = trigrams(q)
+            if grams:
+                postings = sorted((self._trigrams.get(g, set()) for g in grams), key=len)
+                candidates = set(postings[0])
+                for p in postings[1:]:
+                    if not candidates:
+                        break
+                    candidates &= p
+            else:
+                candidates = set(self._norm)
+            hits = [d for d in candidates if any(q in v for v in self._norm[d].values())]
+            hits.sort(key=self._rank.__getitem__, reverse=True)
+            return hits
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """
+        Prefix autocomplete over word tokens. Every word of the prefix must match;
+        the last one may be partial. Ranked by the best field weight, then by rank.
+        """
+        words = tokens(normalize(prefix))
+        if not words:
+            return []
+        with self.lock:
+            scores: Optional[Dict[str, float]] = None
+            for i, word in enumerate(words):
+                partial = i == len(words) - 1
+                matched: Dict[str, float] = {}
+                if partial:
+                    j = bisect_left(self._vocab, word)
+                    while j < len(self._vocab) and self._vocab[j].startswith(word):
+                        for d, w in self._tokens[self._vocab[j]].items():
+                            if w > matched.get(d, 0):
+                                matched[d] = w
+                        j += 1
+                else:
+                    matched = dict(self._tokens.get(word, {}))
+                if scores is None:
+                    scores = matched
+                else:
+                    scores = {d: max(s, matched[d]) for d, s in scores.items() if d in matched}
+                if not scores:
+                    return []
+            assert scores is not None
+            return heapq.nlargest(limit, scores.items(), key=lambda kv: (kv[1], self._rank[kv[0]]))
+
+    def exact(self, field: str, value: str) -> Set[str]:
+        with self.lock:
+            return set(self._exact.get(self._exactKey(field, value), ()))
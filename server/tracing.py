@@ -0,0 +1,248 @@
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from flask import before_render_template, template_rendered, g, request
+
+from config import TRACE_SAMPLE, TRACE_DIR, TRACE_KEEP, TRACE_MAX_EVENTS
+from utils import isAdmin
+
+# the trace collecting spans in this context; None (the common case) makes every span a no-op
+_current: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+
+
+class Trace:
+    """Complete ("X") events for one request or job, in Chrome trace-event format."""
+
+    def __init__(self, name: str, **meta):
+        self.name = name
+        self.meta = meta
+        self.events: List[Dict[str, Any]] = []
+        self.dropped = 0
+        self.threads: Dict[int, str] = {}
+        self.pid = os.getpid()
+        self.started = time.time()
+
+    def add(self, name: str, cat: str, start: float, end: float, args: Optional[Dict[str, Any]] = None) -> None:
+        if len(self.events) >= TRACE_MAX_EVENTS:
+            self.dropped += 1
+            return
+        tid = threading.get_ident()
+        if tid not in self.threads:
+            self.threads[tid] = threading.current_thread().name
+        event = {"name": name, "cat": cat, "ph": "X", "ts": start * 1e6, "dur": (end - start) * 1e6,
+                 "pid": self.pid, "tid": tid}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def export(self) -> Dict[str, Any]:
+        meta = {**self.meta, "name": self.name, "started": self.started, "dropped": self.dropped}
+        names = [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": tname}}
+                 for tid, tname in self.threads.items()]
+        return {"traceEvents": names + self.events, "displayTimeUnit": "ms", "otherData": meta}
+
+
+class _Span:
+    __slots__ = ("trace", "name", "cat", "args", "start")
+
+    def __init__(self, trace: Trace, name: str, cat: str, args: Optional[Dict[str, Any]]):
+        self.trace = trace
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self) -> "_Span":
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.trace.add(self.name, self.cat, self.start, time.time(), self.args)
+
+    def note(self, **args) -> None:
+        self.args = {**(self.args or {}), **args}
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def note(self, **args) -> None:
+        pass
+
+
+_NOSPAN = _NoSpan()
+
+
+def active() -> bool:
+    return _current.get() is not None
+
+
+def span(name: str, cat: str = "app", **args):
+    """`with span("read", "io", uuid=uid):` -- a shared no-op object when nothing is being traced."""
+    trace = _current.get()
+    if trace is None:
+        return _NOSPAN
+    return _Span(trace, name, cat, args or None)
+
+
+def spanned(items: Iterable, name: str, cat: str = "app") -> Iterator:
+    """Yield from `items`, timing each step of the iterator as its own span (e.g. file reads in a generator)."""
+    if _current.get() is None:
+        yield from items
+        return
+    it = iter(items)
+    while True:
+        with span(name, cat) as s:
+            try:
+                item = next(it)
+            except StopIteration:
+                s.note(end=True)
+                return
+        yield item
+
+
+@contextmanager
+def trace(name: str, enabled: bool = True, **meta) -> Iterator[Optional[Trace]]:
+    """Collect spans for a job outside a request (e.g. syncAll) and save it on exit."""
+    if not enabled or _current.get() is not None:
+        yield _current.get()
+        return
+    t = Trace(name, **meta)
+    token = _current.set(t)
+    try:
+        with span(name, "job"):
+            yield t
+    finally:
+        _current.reset(token)
+        save(t)
+
+
+class Connection(sqlite3.Connection):
+    """sqlite3 connection factory that records each statement as a span while a trace is active."""
+
+    def execute(self, sql, *params):
+        if _current.get() is None:
+            return super().execute(sql, *params)
+        with span("sql", "sql", sql=_squash(sql)):
+            return super().execute(sql, *params)
+
+    def executemany(self, sql, *params):
+        if _current.get() is None:
+            return super().executemany(sql, *params)
+        with span("sql", "sql", sql=_squash(sql), many=True):
+            return super().executemany(sql, *params)
+
+
+def _squash(sql: str) -> str:
+    return re.sub(r"\s+", " ", sql).strip()[:500]
+
+
+# --- storage ---
+
+def _fileName(t: Trace) -> str:
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(t.started))
+    slug = re.sub(r"[^\w.-]+", "_", t.name)[:60]
+    return f"{stamp}-{int(t.started * 1000) % 1000:03d}-{t.pid}-{slug}.json"
+
+
+def save(t: Trace) -> Optional[str]:
+    if TRACE_DIR is None:
+        return None
+    try:
+        TRACE_DIR.mkdir(parents=True, exist_ok=True)
+        name = _fileName(t)
+        tmp = TRACE_DIR / f".{name}.tmp"
+        tmp.write_text(json.dumps(t.export()), encoding="utf-8")
+        os.replace(tmp, TRACE_DIR / name)
+        _prune()
+        return name
+    except OSError as e:
+        print(f"[Trace] could not save {t.name}: {e}")
+        return None
+
+
+def _prune() -> None:
+    files = sorted(TRACE_DIR.glob("*.json"))
+    for old in files[:-TRACE_KEEP] if TRACE_KEEP else []:
+        old.unlink(missing_ok=True)
+
+
+def listing() -> List[Dict[str, Any]]:
+    if TRACE_DIR is None or not TRACE_DIR.exists():
+        return []
+    out = []
+    for path in sorted(TRACE_DIR.glob("*.json"), reverse=True):
+        st = path.stat()
+        out.append({"name": path.name, "bytes": st.st_size, "mtime": st.st_mtime})
+    return out
+
+
+# --- flask wiring ---
+
+def _wanted() -> bool:
+    if request.headers.get("X-Trace") and isAdmin():
+        return True
+    return TRACE_SAMPLE > 0 and random.random() < TRACE_SAMPLE
+
+
+def _begin() -> None:
+    if not _wanted():
+        return
+    t = Trace(f"{request.method} {request.path}", endpoint=request.endpoint, url=request.full_path)
+    g._trace = (t, _current.set(t), time.time(), [])
+
+
+def _renderStart(sender, template, context, **extra) -> None:
+    state = g.get("_trace")
+    if state is not None:
+        state[3].append(time.time())
+
+
+def _renderEnd(sender, template, context, **extra) -> None:
+    state = g.get("_trace")
+    if state is not None and state[3]:
+        state[0].add(f"render {template.name}", "template", state[3].pop(), time.time())
+
+
+def _end(response):
+    state = g.get("_trace")
+    if state is not None:
+        state[0].meta["status"] = response.status_code
+        # the file itself is written at teardown, once the body is done
+        response.headers["X-Trace-Id"] = _fileName(state[0])
+    return response
+
+
+def _teardown(exc=None) -> None:
+    state = g.pop("_trace", None)
+    if state is None:
+        return
+    t, token, started, _ = state
+    t.add(t.name, "request", started, time.time(), {"endpoint": t.meta.get("endpoint")})
+    try:
+        _current.reset(token)
+    except ValueError:
+        _current.set(None)  # teardown ran in a different context than before_request
+    save(t)
+
+
+def init_app(app) -> None:
+    app.before_request(_begin)
+    app.after_request(_end)
+    app.teardown_request(_teardown)
+    before_render_template.connect(_renderStart, app)
+    template_rendered.connect(_renderEnd, app)
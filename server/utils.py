@@ -1,6 +1,13 @@
+import os
 import re
 import hashlib
+import hmac
 from datetime import datetime, timezone
+from typing import Any, Optional, Tuple
+from functools import wraps
+from pathlib import Path
+from flask import session, request, abort
+from config import ADMIN_API_TOKEN, UTC, WIB, NAIVE_TZ
 
 
 def slugify(s: str) -> str:
@@ -43,5 +50,126 @@ def parseMD(raw):
     return meta, body
 
 
+def atomicWrite(path: Path, text: str) -> None:
+    """
+    Write via a temp file and rename: readers never see a half-written file, and
+    the old inode is left untouched, so hard-linked backup snapshots stay frozen.
+    """
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+# --- dates ---
+# reads.created keeps the frontmatter text as written; created_ts (epoch seconds),
+# created_utc and created_day (the body's folder) are derived from it once, at import,
+# and everything else uses those.
+
+_DAY = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_MONTHS_ID = ("Jan", "Feb", "Mar", "Apr", "Mei", "Jun", "Jul", "Agu", "Sep", "Okt", "Nov", "Des")
+
+
+def parseDate(value: Any) -> Optional[datetime]:
+    """
+    Frontmatter or ISO date text as an aware UTC datetime: quoted or not, 'T' or
+    a space, with or without seconds or a zone ('Z' too), or a date alone.
+    Values without a zone are taken as NAIVE_TZ. None if it does not parse.
+    """
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        text = str(value or "").strip().strip("'\"").strip()
+        if text.endswith(("Z", "z")):
+            text = text[:-1] + "+00:00"
+        try:
+            dt = datetime.fromisoformat(text)
+        except ValueError:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=NAIVE_TZ)
+    return dt.astimezone(UTC)
+
+
+def isoUTC(dt: datetime) -> str:
+    """Canonical form stored in reads.created_utc, e.g. 2025-07-30T03:00:00Z."""
+    return dt.astimezone(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def normalizeDate(value: Any, fallback: Optional[datetime] = None) -> Tuple[int, str]:
+    """(created_ts, created_utc) for a frontmatter date; `fallback` (default: now) when it does not parse."""
+    dt = parseDate(value) or fallback or datetime.now(UTC)
+    return int(dt.timestamp()), isoUTC(dt)
+
+
+def storeDay(created: Any, ts: Optional[int] = None) -> str:
+    """
+    YYYY-MM-DD an article body is filed under (reads.created_day): the day as written
+    in the frontmatter, not converted to any zone, else the UTC day of `ts`.
+    """
+    day = str(created or "").strip().lstrip("'\"")[:10]
+    if _DAY.match(day):
+        return day
+    if ts is None:
+        return ""
+    return datetime.fromtimestamp(ts, UTC).strftime("%Y-%m-%d")
+
+
+def monthOf(ts: Optional[int]) -> str:
+    """YYYY-MM of an epoch timestamp in WIB; the archive and month filter group by it."""
+    if ts is None:
+        return ""
+    return datetime.fromtimestamp(ts, WIB).strftime("%Y-%m")
+
+
+def normalizeMonth(month: str) -> str:
+    """'2025-7' -> '2025-07', the key the facet counts and MetaIndex use; malformed input is returned as is."""
+    try:
+        return datetime.strptime(month, "%Y-%m").strftime("%Y-%m")
+    except ValueError:
+        return month
+
+
+def monthRange(month: str) -> Optional[Tuple[int, int]]:
+    """[start, end) epoch seconds of a YYYY-MM month in WIB, None if malformed."""
+    try:
+        start = datetime.strptime(month, "%Y-%m").replace(tzinfo=WIB)
+    except ValueError:
+        return None
+    end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return int(start.timestamp()), int(end.timestamp())
+
+
+def wib(ts: Optional[int], time: bool = True) -> str:
+    """Jinja filter `wib`: epoch seconds as '30 Jul 2025, 10:00 WIB' (or the date alone)."""
+    if ts is None or ts == "":
+        return ""
+    d = datetime.fromtimestamp(int(ts), WIB)
+    day = f"{d.day} {_MONTHS_ID[d.month - 1]} {d.year}"
+    return f"{day}, {d:%H:%M} WIB" if time else day
+
+
 def _sha256(s: str) -> str:
-    return hashlib.sha256(s.encode("utf-8")).hexdigest()
\ No newline at end of file
+    return hashlib.sha256(s.encode("utf-8")).hexdigest()
+
+
+def isAdmin() -> bool:
+    """Admin session, or the X-Admin-Token header matching ADMIN_API_TOKEN when one is configured."""
+    if session.get("role") == "admin":
+        return True
+    token = request.headers.get("X-Admin-Token")
+    return bool(ADMIN_API_TOKEN and token) and hmac.compare_digest(token.encode(), ADMIN_API_TOKEN.encode())
+
+
+def adminRequired(view):
+    """Allow admins only (see isAdmin)."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not isAdmin():
+            abort(401)
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,183 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID
+
+from flask import request
+
+import sites
+from config import WIB, VIEWS_FLUSH_SECONDS, VIEWS_KEEP_DAYS, POPULAR_LIMIT
+
+PERIODS = ("today", "week")
+
+
+class ViewCounter:
+    """
+    Per-worker view counts, aggregated in memory as (uuid, hour) -> n and
+    flushed in one transaction every VIEWS_FLUSH_SECONDS by a daemon thread.
+    Each flush also recomputes the most_read rankings, so readers of the
+    rankings never aggregate and page views never open a write transaction.
+    The windows ('today', the rolling week) move on hour boundaries, so a flush
+    with nothing pending still reranks once the hour has changed.
+    """
+
+    def __init__(self, dbFile, interval: float = VIEWS_FLUSH_SECONDS):
+        self.dbFile = dbFile
+        self.interval = interval
+        self._pending: Counter = Counter()
+        self._lock = threading.Lock()
+        self._flushLock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._rankedHour: Optional[int] = None
+        self.flushed = 0
+
+    def hit(self, uid: str) -> None:
+        hour = int(time.time() // 3600)
+        with self._lock:
+            self._pending[(uid, hour)] += 1
+        self.ensureRunning()
+
+    def ensureRunning(self) -> None:
+        if self._pid != os.getpid():
+            self._start()
+
+    def _start(self) -> None:
+        # started lazily so each forked worker gets its own flusher
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, name=f"view-flush-{self.dbFile.parent.name}", daemon=True)
+            self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[Views] flush failed: {e}")
+
+    def flush(self) -> int:
+        with self._lock:
+            batch, self._pending = self._pending, Counter()
+        hour = int(time.time() // 3600)
+        if not batch and self._rankedHour == hour:
+            return 0
+        with self._flushLock:
+            conn = sqlite3.connect(self.dbFile, timeout=30)
+            try:
+                totals: Counter = Counter()
+                for (uid, _), n in batch.items():
+                    totals[uid] += n
+                with conn:
+                    if batch:
+                        conn.executemany(
+                            "INSERT INTO read_views (uuid, hour, count) VALUES (?, ?, ?) "
+                            "ON CONFLICT (uuid, hour) DO UPDATE SET count = count + excluded.count",
+                            [(uid, h, n) for (uid, h), n in batch.items()],
+                        )
+                        conn.executemany(
+                            "INSERT INTO read_totals (uuid, views) VALUES (?, ?) "
+                            "ON CONFLICT (uuid) DO UPDATE SET views = views + excluded.views",
+                            totals.items(),
+                        )
+                    self._rank(conn)
+            except sqlite3.Error:
+                # put the batch back so the next interval retries it
+                with self._lock:
+                    self._pending.update(batch)
+                raise
+            finally:
+                conn.close()
+            self._rankedHour = hour
+        self.flushed += sum(batch.values())
+        return len(batch)
+
+    @staticmethod
+    def _since(period: str, now: Optional[float] = None) -> int:
+        """First hour bucket of a period; 'today' starts at midnight WIB."""
+        now = now or time.time()
+        if period == "today":
+            midnight = datetime.fromtimestamp(now, WIB).replace(hour=0, minute=0, second=0, microsecond=0)
+            return int(midnight.timestamp() // 3600)
+        return int(now // 3600) - 7 * 24 + 1
+
+    def _rank(self, conn: sqlite3.Connection) -> None:
+        for period in PERIODS:
+            conn.execute("DELETE FROM most_read WHERE period = ?", (period,))
+            conn.execute(
+                """
+                INSERT INTO most_read (period, rank, uuid, views)
+                SELECT ?, ROW_NUMBER() OVER (ORDER BY SUM(count) DESC, uuid), uuid, SUM(count)
+                FROM read_views WHERE hour >= ?
+                GROUP BY uuid
+                ORDER BY SUM(count) DESC, uuid
+                LIMIT ?
+                """,
+                (period, self._since(period), POPULAR_LIMIT * 5),
+            )
+        conn.execute("DELETE FROM read_views WHERE hour < ?", (int(time.time() // 3600) - VIEWS_KEEP_DAYS * 24,))
+
+
+# one counter (and flusher thread) per site
+counter = sites.local(lambda site: ViewCounter(site.dbFile))
+
+
+def counted(view: Callable) -> Callable:
+    """Count successful article views; sits outside cachedPage so cache hits count too."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        rv = view(*args, **kwargs)
+        if request.method == "GET" and not request.headers.get("X-Warmup"):
+            status = getattr(rv, "status_code", 200)
+            if status == 200:
+                try:
+                    counter.hit(str(UUID(kwargs.get("uuid", ""))))
+                except ValueError:
+                    pass
+        return rv
+    return wrapper
+
+
+def popular(connection: sqlite3.Connection, period: str = "week", limit: int = POPULAR_LIMIT) -> List[Dict[str, Any]]:
+    # the flusher also keeps the rankings current when nothing has been viewed since the restart
+    counter.ensureRunning()
+    try:
+        rows = connection.execute(
+            """
+            SELECT r.uuid, r.title, r.creator, r.created_utc, r.created_ts, r.type, m.views
+            FROM most_read m JOIN reads r ON r.uuid = m.uuid
+            WHERE m.period = ?
+            ORDER BY m.rank LIMIT ?
+            """,
+            (period, limit),
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    return [dict(zip(("uuid", "title", "creator", "created_utc", "created_ts", "type", "views"), row)) for row in rows]
+
+
+def stats() -> Dict[str, Any]:
+    mine = counter.instance()
+    with mine._lock:
+        pending = sum(mine._pending.values())
+    return {"pending": pending, "flushed": mine.flushed, "interval": mine.interval}
+
+
+def _finalFlush() -> None:
+    for site, mine in counter.each():
+        try:
+            mine.flush()
+        except Exception as e:
+            print(f"[Views] final flush for {site.name} failed: {e}")
+
+
+atexit.register(_finalFlush)
@@ -0,0 +1,118 @@
+import atexit
+import json
+import os
+import time
+from typing import List, Optional
+
+from flask import url_for
+
+from config import HOTKEYS_FILE, WARMUP_PAGES, WARMUP_READS, WARMUP_SNAPSHOT_KEYS
+from dbapi import DButils, ReadsAPI
+import rendercache
+import sites
+import views
+
+_app = None
+
+
+def _defaultUrls() -> List[str]:
+    urls = ["/"] + [f"/?page={p}" for p in range(2, WARMUP_PAGES + 1)]
+    connection = DButils.connect()
+    uids = [r["uuid"] for r in views.popular(connection, "week", WARMUP_READS)]
+    if len(uids) < WARMUP_READS:
+        # top up with the newest articles
+        rows = connection.execute("SELECT uuid FROM reads ORDER BY created_ts DESC, uuid DESC LIMIT ?", (WARMUP_READS,)).fetchall()
+        uids += [r[0] for r in rows if r[0] not in uids][:WARMUP_READS - len(uids)]
+    urls += [f"/baca/{uid.replace('-', '')}" for uid in uids]
+    return urls
+
+
+def _loadSnapshot() -> List[str]:
+    path = sites.current().hotkeysFile
+    if path is None:
+        return []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            urls = json.load(f).get("urls", [])
+    except (OSError, ValueError, AttributeError):
+        return []
+    return [u for u in urls if isinstance(u, str) and u.startswith("/")]
+
+
+def hotUrls(limit: int = WARMUP_SNAPSHOT_KEYS) -> List[str]:
+    """The current site's most recently used page-cache entries (then read-cache articles) as URLs."""
+    urls: List[str] = []
+    seen = set()
+    with _app.test_request_context():
+        for endpoint, kwargs, query, _ in rendercache.pageCache.keys(limit):
+            try:
+                url = url_for(endpoint, **dict(kwargs), **dict(query))
+            except Exception:
+                continue
+            if url not in seen:
+                seen.add(url)
+                urls.append(url)
+    for uid in ReadsAPI.cacheKeys(limit):
+        url = f"/baca/{uid.replace('-', '')}"
+        if url not in seen:
+            seen.add(url)
+            urls.append(url)
+    return urls[:limit]
+
+
+def snapshot(path: Optional[str] = None) -> int:
+    """Write the current site's hot URLs to its hotkeys.json."""
+    path = path or sites.current().hotkeysFile
+    if _app is None or path is None:
+        return 0
+    urls = hotUrls()
+    if not urls:
+        return 0
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"saved": time.time(), "urls": urls}, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[Warmup] snapshot failed: {e}")
+        return 0
+    return len(urls)
+
+
+def _snapshotAll() -> None:
+    for site in sites.synced():
+        with sites.using(site):
+            snapshot()
+
+
+def run(app, site: Optional[sites.Site] = None) -> int:
+    """
+    Render the hot URLs once so the first visitors hit warm caches: the last
+    snapshot if there is one, otherwise the first listing pages and the most
+    read articles of the week. Warm-up requests are not counted as views.
+    """
+    site = site or sites.current()
+    started = time.perf_counter()
+    with app.app_context(), sites.using(site):
+        urls = _loadSnapshot() or _defaultUrls()
+        DButils.close()
+    # requests are routed by Host, so send them as one of the site's own hosts
+    host = next((h for h in site.hosts if h != "*"), "localhost")
+    client = app.test_client()
+    ok = 0
+    for url in urls:
+        try:
+            ok += client.get(url, base_url=f"http://{host}", headers={"X-Warmup": "1"}).status_code == 200
+        except Exception as e:
+            print(f"[Warmup] {url} failed: {e}")
+    print(f"[Warmup] {site.name}: {ok}/{len(urls)} urls in {time.perf_counter() - started:.2f}s")
+    return ok
+
+
+def init_app(app) -> None:
+    global _app
+    _app = app
+    # sites synced after startup (on their first request) are warmed up right after
+    sites.onSynced(run)
+    if HOTKEYS_FILE is not None:
+        atexit.register(_snapshotAll)
@@ -1,3 +1,45 @@
 // minimal progressive enhancement: fetch next page via API if desired
 // placeholder for future interactive features
 console.log("SMAN2Cikpus frontend loaded");
+
+// live title suggestions for the navbar search box
+document.addEventListener("DOMContentLoaded", () => {
+  const input = document.querySelector("input[data-suggest-url]");
+  const list = document.getElementById("searchSuggest");
+  if (!input || !list) return;
+
+  const cache = new Map();
+  let timer = null;
+  let controller = null;
+
+  const render = (items) => {
+    list.innerHTML = "";
+    items.forEach(item => {
+      const opt = document.createElement("option");
+      opt.value = item.title;
+      opt.label = item.creator ? `${item.title} — ${item.creator}` : item.title;
+      list.appendChild(opt);
+    });
+  };
+
+  input.addEventListener("input", () => {
+    const q = input.value.trim();
+    clearTimeout(timer);
+    if (q.length < 2) { render([]); return; }
+    if (cache.has(q)) { render(cache.get(q)); return; }
+
+    timer = setTimeout(async () => {
+      if (controller) controller.abort();
+      controller = new AbortController();
+      try {
+        const res = await fetch(`${input.dataset.suggestUrl}?q=${encodeURIComponent(q)}`, { signal: controller.signal });
+        if (!res.ok) return;
+        const data = await res.json();
+        cache.set(q, data.items);
+        if (input.value.trim() === q) render(data.items);
+      } catch (e) {
+        // aborted or offline; keep the last suggestions
+      }
+    }, 120);
+  });
+});
@@ -0,0 +1,87 @@
+# backup.py
+# Online backups of the database, JSON mirrors and article files (see server/backup.py).
+# The running app also takes one every BACKUP_INTERVAL_HOURS from its maintenance scheduler.
+#
+#   python tools/backup.py create              take a backup now, then verify it and prune old ones
+#   python tools/backup.py list                finished backups, newest first
+#   python tools/backup.py verify [NAME]       integrity/manifest/body checks (default: newest)
+#   python tools/backup.py prune [--keep N]    delete all but the newest N
+#   python tools/backup.py restore NAME DIR    verify, then copy into an empty DIR laid out like USERDATA
+#
+# With several SITES, --site NAME picks the site (default: the first one).
+import sys, json, argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "server"))
+
+from config import BACKUP_KEEP
+import backup
+import sites
+
+
+def pick(name):
+    found = backup.backups()
+    if not found:
+        sys.exit("| no backups in " + str(sites.current().backupDir))
+    if name is None:
+        return found[0]
+    for path in found:
+        if path.name == name:
+            return path
+    sys.exit(f"| no backup named {name}")
+
+
+def report(result):
+    print(f"| {result['name']}: {'ok' if result['ok'] else 'FAILED'}  {json.dumps(result['counts'])}")
+    for problem in result["problems"]:
+        print(f"|   {problem}")
+    return 0 if result["ok"] else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Online backups of the content directory")
+    parser.add_argument("command", choices=["create", "list", "verify", "prune", "restore"])
+    parser.add_argument("name", nargs="?", help="backup name (verify, restore)")
+    parser.add_argument("target", nargs="?", help="empty directory to restore into")
+    parser.add_argument("--keep", type=int, default=BACKUP_KEEP, help="backups kept by prune")
+    parser.add_argument("--site", help="site name from SITES (default: the first)")
+    args = parser.parse_args()
+
+    if args.site:
+        try:
+            site = sites.get(args.site)
+        except KeyError:
+            parser.error(f"unknown site {args.site}; configured: {', '.join(s.name for s in sites.all())}")
+        with sites.using(site):
+            return run(parser, args)
+    return run(parser, args)
+
+
+def run(parser, args):
+
+    if args.command == "create":
+        path = backup.create()
+        return report(backup.verify(path))
+    if args.command == "list":
+        for path in backup.backups():
+            m = json.loads((path / "manifest.json").read_text(encoding="utf-8"))
+            files = m["pages"]["files"] + m["packs"]["files"]
+            print(f"| {m['name']}  db {m['db']['bytes']:>12}  files {files:>7}  {m['seconds']:>7}s")
+        return 0
+    if args.command == "verify":
+        return report(backup.verify(pick(args.name)))
+    if args.command == "prune":
+        removed = backup.prune(keep=args.keep)
+        print(f"| {len(removed)} removed" + (f": {', '.join(removed)}" if removed else ""))
+        return 0
+    if args.command == "restore":
+        if not args.name or not args.target:
+            parser.error("restore needs NAME and DIR")
+        result = backup.restore(pick(args.name), Path(args.target))
+        report(result)
+        print(f"| restored into {args.target}")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""
+Bundle, minify and split critical CSS for the two public front ends.
+
+    python tools/buildassets.py            # both
+    python tools/buildassets.py baimsman2  # Flask app only
+
+baim (static site): writes a deployable copy to baim/dist/ whose pages inline
+their above-the-fold CSS, load the full stylesheet without blocking render and
+defer the script. Sources are left untouched.
+
+baimsman2 (Flask): writes hashed bundles and manifest.json to static/dist/;
+assets.py reads the manifest and emits the same markup from base.html.
+
+Standard library only, so the minifiers are deliberately conservative: CSS is
+whitespace/comment stripped, JS only loses comments, indentation and blank lines.
+"""
+import argparse
+import hashlib
+import json
+import re
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+BAIM = ROOT / "baim"
+SMAN2 = BAIM / "baimsman2"
+
+# how much of a page counts as "above the fold" when nothing better marks it
+FOLD_CHARS = 4000
+
+
+# --- minifiers ---
+
+# string literals are matched first so a "/*" inside one (e.g. accept="image/*") is kept
+_STRING = r"""("(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)"""
+_COMMENT = re.compile(_STRING + r"|/\*.*?\*/", re.S)
+# innermost {...}: declaration blocks, never selectors or at-rule preludes
+_DECLS = re.compile(r"\{[^{}]*\}")
+
+
+def stripComments(text: str) -> str:
+    """Remove /* */ comments; one spanning lines leaves a newline, an inline one a space."""
+    def sub(m):
+        if m.group(1) is not None:
+            return m.group(1)
+        return "\n" if "\n" in m.group(0) else " "
+    return _COMMENT.sub(sub, text)
+
+
+def minifyCSS(css: str) -> str:
+    css = stripComments(css)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    # only inside declarations: in a selector "a :hover" is not "a:hover"
+    css = _DECLS.sub(lambda m: re.sub(r"\s*:\s*", ":", m.group(0)), css)
+    css = css.replace(";}", "}")
+    return css.strip()
+
+
+def minifyJS(js: str) -> str:
+    out = []
+    for line in stripComments(js).splitlines():
+        s = line.strip()
+        if not s or s.startswith("//"):
+            continue
+        out.append(s)
+    # keep line breaks: no semicolon insertion surprises
+    return "\n".join(out) + "\n"
+
+
+# --- critical CSS ---
+
+def parseRules(css: str) -> List[Tuple[str, str]]:
+    """Top-level (prelude, body) pairs; at-rule bodies are returned raw."""
+    rules = []
+    i, n = 0, len(css)
+    while i < n:
+        start = css.find("{", i)
+        if start < 0:
+            break
+        prelude = css[i:start].strip()
+        depth, j = 1, start + 1
+        while j < n and depth:
+            if css[j] == "{":
+                depth += 1
+            elif css[j] == "}":
+                depth -= 1
+            j += 1
+        rules.append((prelude, css[start + 1:j - 1]))
+        i = j
+    return rules
+
+
+_PSEUDO = re.compile(r"::?[\w-]+(\([^)]*\))?|\[[^\]]*\]")
+
+
+def selectorMatches(selector: str, classes: Set[str], ids: Set[str], tags: Set[str]) -> bool:
+    sel = _PSEUDO.sub("", selector)
+    if not all(c in classes for c in re.findall(r"\.([\w-]+)", sel)):
+        return False
+    if not all(i in ids for i in re.findall(r"#([\w-]+)", sel)):
+        return False
+    return all(t.lower() in tags for t in re.findall(r"(?:^|[\s>+~])([a-zA-Z][\w-]*)", sel))
+
+
+def critical(css: str, classes: Set[str], ids: Set[str], tags: Set[str]) -> str:
+    kept: List[str] = []
+    keyframes: Dict[str, str] = {}
+    for prelude, body in parseRules(minifyCSS(css)):
+        if prelude.startswith("@keyframes"):
+            keyframes[prelude.split()[1]] = f"{prelude}{{{body}}}"
+        elif prelude.startswith("@media"):
+            inner = critical(body, classes, ids, tags)
+            if inner:
+                kept.append(f"{prelude}{{{inner}}}")
+        elif prelude.startswith("@"):
+            kept.append(f"{prelude}{{{body}}}")
+        elif any(selectorMatches(s, classes, ids, tags) for s in prelude.split(",")):
+            kept.append(f"{prelude}{{{body}}}")
+    out = "".join(kept)
+    out += "".join(rule for name, rule in keyframes.items() if name in out)
+    return out
+
+
+def tokens(html: str, js: str) -> Tuple[Set[str], Set[str], Set[str]]:
+    """Classes, ids and tag names used in an HTML fragment (plus classes the script toggles)."""
+    classes: Set[str] = set()
+    for value in re.findall(r"(?:class|cls)\s*=\s*[\"']([^\"']*)[\"']", html):
+        classes.update(c for c in value.split() if "{" not in c and "}" not in c)
+    classes.update(re.findall(r"classList\.(?:add|toggle|remove)\(\s*['\"]([\w-]+)['\"]", js))
+    ids = set(re.findall(r"\bid\s*=\s*[\"']([\w-]+)[\"']", html))
+    tags = {t.lower() for t in re.findall(r"<([a-zA-Z][\w-]*)", html)} | {"html", "body"}
+    return classes, ids, tags
+
+
+def aboveFold(html: str) -> str:
+    """Everything up to the end of the first section inside <main> (or FOLD_CHARS into it)."""
+    main = html.find("<main")
+    if main < 0:
+        return html[:FOLD_CHARS * 2]
+    end = html.find("</section>", main)
+    limit = main + FOLD_CHARS
+    return html[:min(end + 10, limit) if end >= 0 else limit]
+
+
+# --- bundles ---
+
+def digest(data: str) -> str:
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()[:10]
+
+
+def writeBundle(outDir: Path, stem: str, ext: str, content: str) -> str:
+    outDir.mkdir(parents=True, exist_ok=True)
+    for old in outDir.glob(f"{stem}.*.{ext}"):
+        old.unlink()
+    name = f"{stem}.{digest(content)}.{ext}"
+    (outDir / name).write_text(content, encoding="utf-8")
+    return name
+
+
+def bundle(files: Iterable[Path], minify) -> str:
+    return "\n".join(minify(f.read_text(encoding="utf-8")) for f in files)
+
+
+def report(label: str, before: int, after: int) -> None:
+    print(f"| {label:<28} {before:>8} -> {after:>8} bytes")
+
+
+# --- targets ---
+
+def buildBaim() -> Dict:
+    src_css = [BAIM / "assets/css/style.css"]
+    src_js = [BAIM / "assets/js/main.js"]
+    dist = BAIM / "dist"
+    if dist.exists():
+        shutil.rmtree(dist)
+    css = bundle(src_css, minifyCSS)
+    js = bundle(src_js, minifyJS)
+    rawJS = "".join(f.read_text(encoding="utf-8") for f in src_js)
+    cssName = writeBundle(dist / "assets", "app", "css", css)
+    jsName = writeBundle(dist / "assets", "app", "js", js)
+    report("baim css", sum(f.stat().st_size for f in src_css), len(css))
+    report("baim js", sum(f.stat().st_size for f in src_js), len(js))
+
+    for sub in ("assets/img", "data"):
+        if (BAIM / sub).exists():
+            shutil.copytree(BAIM / sub, dist / sub)
+
+    manifest = {"css": f"assets/{cssName}", "js": f"assets/{jsName}", "critical": {}}
+    for page in sorted(BAIM.glob("*.html")):
+        html = page.read_text(encoding="utf-8")
+        crit = critical(css, *tokens(aboveFold(html), rawJS))
+        manifest["critical"][page.name] = len(crit)
+        styles = (
+            f"<style>{crit}</style>\n"
+            f"<link rel=\"preload\" href=\"{manifest['css']}\" as=\"style\" onload=\"this.onload=null;this.rel='stylesheet'\">\n"
+            f"<noscript><link rel=\"stylesheet\" href=\"{manifest['css']}\"></noscript>"
+        )
+        html = re.sub(r'<link rel="stylesheet" href="assets/css/style\.css">', lambda m: styles, html)
+        html = re.sub(r'<script src="assets/js/main\.js"></script>', f'<script defer src="{manifest["js"]}"></script>', html)
+        (dist / page.name).write_text(html, encoding="utf-8")
+    (dist / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    print(f"| baim: {len(manifest['critical'])} pages -> {dist.relative_to(ROOT)}")
+    return manifest
+
+
+def _jinjaFold(template: str, base: str, partials: Dict[str, str]) -> str:
+    """Header part of base.html plus the top of the template's content block (and the macros it imports)."""
+    head = base.split("{% block content %}")[0]
+    m = re.search(r"{%\s*block content\s*%}(.*?){%\s*endblock", template, re.S)
+    body = m.group(1) if m else template
+    macros = "".join(partials.get(name, "") for name in re.findall(r"{%\s*from\s+[\"']([^\"']+)[\"']\s+import", template))
+    return head + aboveFold("<main>" + body) + macros
+
+
+def buildSman2() -> Dict:
+    static = SMAN2 / "static"
+    src_css = [static / "css/style.css"]
+    src_js = [static / "js/main.js"]
+    dist = static / "dist"
+    css = bundle(src_css, minifyCSS)
+    js = bundle(src_js, minifyJS)
+    rawJS = "".join(f.read_text(encoding="utf-8") for f in src_js)
+    manifest = {
+        "css": f"dist/{writeBundle(dist, 'app', 'css', css)}",
+        "js": f"dist/{writeBundle(dist, 'app', 'js', js)}",
+        "critical": {},
+    }
+    report("baimsman2 css", sum(f.stat().st_size for f in src_css), len(css))
+    report("baimsman2 js", sum(f.stat().st_size for f in src_js), len(js))
+
+    base = (SMAN2 / "templates/base.html").read_text(encoding="utf-8")
+    partials = {p.name: p.read_text(encoding="utf-8") for p in (SMAN2 / "templates").glob("_*.html")}
+    for tpl in sorted((SMAN2 / "templates").glob("*.html")):
+        if tpl.name == "base.html" or tpl.name in partials:
+            continue
+        fold = _jinjaFold(tpl.read_text(encoding="utf-8"), base, partials)
+        manifest["critical"][tpl.name] = critical(css, *tokens(fold, rawJS))
+    (dist / "manifest.json").write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+    sizes = ", ".join(f"{k} {len(v)}" for k, v in manifest["critical"].items())
+    print(f"| baimsman2 critical css: {sizes}")
+    return manifest
+
+
+TARGETS = {"baim": buildBaim, "baimsman2": buildSman2}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build minified bundles and critical CSS for the baim front ends")
+    parser.add_argument("targets", nargs="*", metavar="target", help=f"any of: {', '.join(TARGETS)} (default: all)")
+    args = parser.parse_args()
+    unknown = set(args.targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown target(s): {', '.join(sorted(unknown))}")
+    for name in args.targets or TARGETS:
+        TARGETS[name]()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Replay a traffic mix against a running site and report throughput, latency
+percentiles and error rates per concurrency step.
+
+    python tools/loadtest.py --url http://127.0.0.1:3293 --steps 1,8,32,64 --duration 20 --out run.json
+
+Only the standard library is used: each virtual user is an asyncio task with
+its own keep-alive connection.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+DEFAULT_MIX = "home=35,deep=10,search=15,read=35,static=5"
+STATIC = ["/static/css/style.css", "/static/js/app.js", "/static/images/logo.png", "/static/css/bootstrap.min.css"]
+
+
+class Conn:
+    """Minimal HTTP/1.1 GET client over one reusable connection."""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host, self.port, self.timeout = host, port, timeout
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def get(self, path: str) -> Tuple[int, int]:
+        return await asyncio.wait_for(self._get(path), self.timeout)
+
+    async def _get(self, path: str) -> Tuple[int, int]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nAccept-Encoding: identity\r\n"
+            f"User-Agent: smandacikpus-loadtest\r\n\r\n".encode("latin-1")
+        )
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed")
+        status = int(status_line.split()[1])
+        headers: Dict[str, str] = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = line.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+
+        size = 0
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                n = int((await self.reader.readline()).split(b";")[0], 16)
+                if n == 0:
+                    await self.reader.readline()
+                    break
+                size += len(await self.reader.readexactly(n + 2)) - 2
+        elif "content-length" in headers:
+            size = len(await self.reader.readexactly(int(headers["content-length"])))
+        elif status not in (204, 304):
+            size = len(await self.reader.read())
+            headers["connection"] = "close"
+
+        if headers.get("connection", "").lower() == "close" or status_line.startswith(b"HTTP/1.0"):
+            await self.close()
+        return status, size
+
+
+def parseMix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"home", "deep", "search", "read", "static"}
+    if unknown:
+        raise SystemExit(f"unknown traffic kinds: {', '.join(sorted(unknown))}")
+    return mix
+
+
+async def discover(conn: Conn) -> Tuple[List[str], List[str]]:
+    """Article paths from the sitemaps and search terms from the feed titles."""
+    reads: List[str] = []
+    try:
+        index = await fetchText(conn, "/sitemap.xml")
+        for loc in re.findall(r"<loc>([^<]+)</loc>", index):
+            body = await fetchText(conn, urlsplit(loc).path)
+            reads += [urlsplit(u).path for u in re.findall(r"<loc>([^<]+)</loc>", body)]
+    except (OSError, ValueError, asyncio.TimeoutError):
+        pass
+    # sitemaps list oldest first; read picks favour the front of the list
+    reads.reverse()
+    if not reads:
+        reads = sorted(set(re.findall(r'href="(/baca/[0-9a-fA-F-]+)"', await fetchText(conn, "/"))))
+    words = re.findall(r"<title>([^<]+)</title>", await fetchText(conn, "/feed.xml"))[1:]
+    terms = sorted({w for t in words for w in t.split() if len(w) > 3}) or ["sekolah", "guru", "siswa"]
+    return reads, terms
+
+
+async def fetchText(conn: Conn, path: str) -> str:
+    """One-off HTTP/1.0 GET returning the body; used only during discovery."""
+    reader, writer = await asyncio.open_connection(conn.host, conn.port)
+    writer.write(f"GET {path} HTTP/1.0\r\nHost: {conn.host}:{conn.port}\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    _, _, body = data.partition(b"\r\n\r\n")
+    return body.decode("utf-8", "replace")
+
+
+def pickPath(kind: str, rng: random.Random, reads: List[str], terms: List[str], maxPage: int) -> str:
+    if kind == "home":
+        return "/"
+    if kind == "deep":
+        return f"/?page={rng.randint(2, maxPage)}"
+    if kind == "search":
+        return f"/?q={quote(rng.choice(terms))}"
+    if kind == "read":
+        # skewed towards the newest articles, like real traffic
+        return reads[min(int(rng.expovariate(1 / max(1, len(reads) / 10))), len(reads) - 1)] if reads else "/"
+    return rng.choice(STATIC)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(p / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def summarize(samples: List[Tuple[str, float, int]], seconds: float) -> Dict:
+    def block(rows):
+        lat = sorted(r[1] * 1000 for r in rows)
+        errors = sum(1 for r in rows if r[2] == 0 or r[2] >= 500)
+        return {
+            "requests": len(rows),
+            "rps": round(len(rows) / seconds, 1) if seconds else 0.0,
+            "errors": errors,
+            "errorRate": round(errors / len(rows), 4) if rows else 0.0,
+            "p50": round(percentile(lat, 50), 2),
+            "p90": round(percentile(lat, 90), 2),
+            "p99": round(percentile(lat, 99), 2),
+            "max": round(lat[-1], 2) if lat else 0.0,
+        }
+    out = block(samples)
+    out["kinds"] = {k: block([s for s in samples if s[0] == k]) for k in sorted({s[0] for s in samples})}
+    return out
+
+
+async def runStep(args, users: int, mix: Dict[str, float], reads: List[str], terms: List[str]) -> Dict:
+    host, port = args.host, args.port
+    kinds, weights = list(mix), list(mix.values())
+    samples: List[Tuple[str, float, int]] = []
+    start = time.perf_counter()
+    warmEnd = start + args.warmup
+    deadline = warmEnd + args.duration
+
+    async def user(seed: int):
+        rng = random.Random(seed)
+        conn = Conn(host, port, args.timeout)
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            kind = rng.choices(kinds, weights)[0]
+            path = pickPath(kind, rng, reads, terms, args.max_page)
+            t0 = time.perf_counter()
+            try:
+                status, _ = await conn.get(path)
+            except (OSError, ValueError, IndexError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                status = 0
+                await conn.close()
+            if t0 >= warmEnd:
+                samples.append((kind, time.perf_counter() - t0, status))
+        await conn.close()
+
+    await asyncio.gather(*(user(args.seed * 1000 + i) for i in range(users)))
+    return {"users": users, **summarize(samples, time.perf_counter() - warmEnd)}
+
+
+async def main_async(args) -> Dict:
+    mix = parseMix(args.mix)
+    reads, terms = await discover(Conn(args.host, args.port, args.timeout))
+    print(f"| target {args.url}  reads {len(reads)}  terms {len(terms)}  mix {args.mix}")
+    steps = []
+    for users in args.steps:
+        res = await runStep(args, users, mix, reads, terms)
+        steps.append(res)
+        print(
+            f"| c={users:<4} {res['rps']:>8.1f} req/s  p50 {res['p50']:>7.1f}ms  p90 {res['p90']:>7.1f}ms  "
+            f"p99 {res['p99']:>7.1f}ms  err {res['errorRate'] * 100:5.2f}%"
+        )
+    return {
+        "url": args.url,
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "mix": mix,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "steps": steps,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test a running instance with a mixed traffic profile")
+    parser.add_argument("--url", default="http://127.0.0.1:3293")
+    parser.add_argument("--steps", default="1,4,16,64", help="comma separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=15.0, help="measured seconds per step")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each step")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weights for home, deep, search, read, static")
+    parser.add_argument("--max-page", type=int, default=30, help="deepest listing page requested")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args()
+
+    target = urlsplit(args.url)
+    if target.scheme != "http":
+        raise SystemExit("only plain http targets are supported")
+    args.host, args.port = target.hostname, target.port or 80
+    args.steps = [int(s) for s in args.steps.split(",") if s.strip()]
+    if args.max_page < 2 and parseMix(args.mix).get("deep"):
+        # deep pages are 2..max-page; page 1 is "home"
+        raise SystemExit("--max-page must be at least 2 when the mix includes deep")
+
+    report = asyncio.run(main_async(args))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"| report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
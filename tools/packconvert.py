@@ -0,0 +1,86 @@
+# packconvert.py
+# Convert article bodies between the directory layout (PAGEDIR/YYYY/MM/DD/<uuid>.md)
+# and the packed store (PACKDIR/pack-NNNNNN.dat + packindex table), and run pack maintenance.
+#
+#   python tools/packconvert.py topack      copy every .md file into pack files
+#   python tools/packconvert.py todir       write every packed article back out as .md files
+#   python tools/packconvert.py compact     rewrite packs that carry dead records
+#   python tools/packconvert.py reindex     rebuild packindex by scanning the pack files
+#   python tools/packconvert.py stats       live / on-disk bytes per pack
+import sys, sqlite3, argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "server"))
+
+from config import DB_FILE, PAGEDIR, PACKDIR
+from contentstore import DirStore, PackStore
+from dbapi import ReadsAPI
+from migrations import migrate
+from utils import storeDay
+
+
+def connect():
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    migrate(conn)
+    return conn
+
+
+def toPack(conn, dirStore, packStore):
+    count = 0
+    for fileUid, text, _ in dirStore.changed(conn):
+        meta, _ = ReadsAPI.parseFront(text, fileUid)
+        packStore.put(conn, meta["uuid"], text)
+        count += 1
+    print(f"| {count} articles packed into {PACKDIR}")
+
+
+def toDir(conn, dirStore, packStore):
+    count = 0
+    # reads.created_day is where the site looks the body up, so write it there
+    rows = conn.execute(
+        "SELECT p.uuid, r.created_day FROM packindex p LEFT JOIN reads r ON r.uuid = p.uuid"
+    ).fetchall()
+    for uid, day in rows:
+        text = packStore.get(conn, uid)
+        if text is None:
+            print(f"| missing record for {uid}, skipped")
+            continue
+        meta, _ = ReadsAPI.parseFront(text, uid)
+        try:
+            dirStore.put(conn, uid, text, day or storeDay(meta["date"]))
+        except ValueError:
+            print(f"| no day for {uid}: {meta['date']!r}, skipped")
+            continue
+        count += 1
+    print(f"| {count} articles written to {PAGEDIR}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert between directory and packed content stores")
+    parser.add_argument("command", choices=["topack", "todir", "compact", "reindex", "stats"])
+    parser.add_argument("--dead-ratio", type=float, default=0.25, help="compact packs with at least this share of dead bytes")
+    args = parser.parse_args()
+
+    conn = connect()
+    dirStore, packStore = DirStore(), PackStore()
+    packStore.initSchema(conn)
+
+    if args.command == "topack":
+        toPack(conn, dirStore, packStore)
+    elif args.command == "todir":
+        toDir(conn, dirStore, packStore)
+    elif args.command == "compact":
+        res = packStore.compact(conn, minDeadRatio=args.dead_ratio)
+        print(f"| {res['packs']} packs compacted, {res['reclaimed']} bytes reclaimed")
+    elif args.command == "reindex":
+        print(f"| {packStore.rebuildIndex(conn)} records indexed")
+    elif args.command == "stats":
+        for num, s in packStore.stats(conn).items():
+            print(f"| pack-{num:06d}  size {s['size']:>12}  live {s['live']:>12}")
+
+    packStore.close()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()